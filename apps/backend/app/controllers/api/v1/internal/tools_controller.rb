@@ -10,13 +10,33 @@ module Api
           head :ok
         end
         def profile_update
-          account = Account.find(params.require(:account_id))
-          account.create_profile unless account.profile
-          profile_attrs = params.require(:profile).permit(:summary, target_industries: [], target_roles: [], target_locations: [], ideal_customer_profile: {}, questionnaire: {})
-          account.profile.update!(profile_attrs)
+          apply_profile_update(params)
           render json: { status: 'ok' }
         end
 
+      # POST /api/v1/internal/batch
+      # { operations: [{ op: 'chat_notify'|'profile_update'|'close_chat', params: {...} }, ...] }
+      # Applied in order; each op succeeds or fails on its own.
+      BATCH_OPS = %w[chat_notify profile_update close_chat].freeze
+
+      def batch
+        operations = params.require(:operations)
+        results = ActiveRecord::Base.transaction do
+          Array(operations).map do |operation|
+            op = operation[:op].to_s
+            next { op: op, status: 'error', error: 'unsupported_op' } unless BATCH_OPS.include?(op)
+
+            begin
+              ActiveRecord::Base.transaction(requires_new: true) { send("apply_#{op}", operation.require(:params)) }
+              { op: op, status: 'ok' }
+            rescue ActiveRecord::RecordNotFound, ActiveRecord::RecordInvalid, ActionController::ParameterMissing => e
+              { op: op, status: 'error', error: e.class.name.demodulize.underscore }
+            end
+          end
+        end
+        render json: { status: 'ok', results: results }
+      end
+
       def apollo_fetch
         account = Account.find(params.require(:account_id))
         filters = params.require(:filters).permit(:keywords, :role, :location, :limit).to_h.symbolize_keys
@@ -61,10 +81,7 @@ module Api
       # POST /api/v1/internal/chat_notify
       # params: { account_id, chat_session_id, content }
       def chat_notify
-        account = Account.find(params.require(:account_id))
-        session = account.chat_sessions.find(params.require(:chat_session_id))
-        content = params.require(:content)
-        msg = session.chat_messages.create!(sender_type: 'Assistant', content: content.to_s, sent_at: Time.current)
+        msg = apply_chat_notify(params)
         render json: { status: 'ok', message_id: msg.id }
       end
 
@@ -111,9 +128,7 @@ module Api
 
       # Mark a chat session as completed
       def close_chat
-        account = Account.find(params.require(:account_id))
-        session = account.chat_sessions.find(params.require(:chat_session_id))
-        session.update!(status: 'completed')
+        apply_close_chat(params)
         render json: { status: 'ok' }
       end
 
@@ -146,6 +161,27 @@ module Api
 
       private
 
+      # Shared by the single-op actions and #batch
+      def apply_profile_update(attrs)
+        account = Account.find(attrs.require(:account_id))
+        account.create_profile unless account.profile
+        profile_attrs = attrs.require(:profile).permit(:summary, target_industries: [], target_roles: [], target_locations: [], ideal_customer_profile: {}, questionnaire: {})
+        account.profile.update!(profile_attrs)
+      end
+
+      def apply_chat_notify(attrs)
+        account = Account.find(attrs.require(:account_id))
+        session = account.chat_sessions.find(attrs.require(:chat_session_id))
+        content = attrs.require(:content)
+        session.chat_messages.create!(sender_type: 'Assistant', content: content.to_s, sent_at: Time.current)
+      end
+
+      def apply_close_chat(attrs)
+        account = Account.find(attrs.require(:account_id))
+        session = account.chat_sessions.find(attrs.require(:chat_session_id))
+        session.update!(status: 'completed')
+      end
+
       def cancel_future_messages(campaign, lead)
         return unless campaign && lead
         campaign.email_messages.where(lead_id: lead.id, status: 'queued').find_each do |m|
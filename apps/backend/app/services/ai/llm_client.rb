@@ -12,10 +12,17 @@ module Ai
       end
     end
 
-    def initialize(base_url: ENV.fetch('LLM_SERVICE_URL', 'http://llm_service:8000'))
+    # Seconds kept back from our own timeout for the network hop and JSON parsing
+    DEADLINE_SLACK = 1.0
+
+    def initialize(base_url: ENV.fetch('LLM_SERVICE_URL', 'http://llm_service:8000'),
+                   timeout: ENV.fetch('LLM_SERVICE_TIMEOUT', '30').to_f)
+      @timeout = timeout
       @conn = Faraday.new(url: base_url) do |f|
         f.request :json
         f.response :json, content_type: /json/
+        f.options.timeout = timeout
+        f.options.open_timeout = [timeout, 5].min
         f.adapter Faraday.default_adapter
       end
     end
@@ -28,15 +35,21 @@ module Ai
         user_id: user_id,
         messages: messages.map { |m| { role: m[:role], content: m[:content].to_s } }
       }
-      resp = @conn.post('/chat/messages', payload) do |req|
-        # Propagate locale so the LLM service can localize replies
-        begin
-          req.headers['Accept-Language'] = I18n.locale.to_s
-        rescue StandardError
-          # ignore if I18n not available in context
-        end
+      # Delta mode: the service keeps the session history (including the
+      # chat_notify messages it posted), so send only the new user message. 409 means it lost that state (restart/eviction): re-send all.
+      base_seq = Rails.cache.read(seq_cache_key(session_id))
+      # One deadline for the whole call, so a 409 retry only gets what is left
+      deadline = Process.clock_gettime(Process::CLOCK_MONOTONIC) + @timeout
+      resp = nil
+      if base_seq && payload[:messages].any?
+        resp = post_chat(payload.merge(messages: payload[:messages].last(1), base_seq: base_seq), deadline)
+        resp = nil if resp.status == 409
+      end
+      resp ||= post_chat(payload, deadline)
+      if resp.success?
+        remember_seq(session_id, resp.body['seq'])
+        return resp.body.fetch('reply')
       end
-      return resp.body.fetch('reply') if resp.success?
 
       # Gracefully degrade on validation/422 or other non-200s
       detail = begin
@@ -56,6 +69,33 @@ module Ai
 
     private
 
+    def post_chat(payload, deadline)
+      @conn.post('/chat/messages', payload) do |req|
+        # The service stops its agent loop and finalizes in time to answer before we give up
+        left = deadline - Process.clock_gettime(Process::CLOCK_MONOTONIC) - DEADLINE_SLACK
+        req.headers['X-Request-Timeout-Ms'] = [(left * 1000).to_i, 1].max.to_s
+        req.options.timeout = [deadline - Process.clock_gettime(Process::CLOCK_MONOTONIC), 1].max
+        # Propagate locale so the LLM service can localize replies
+        begin
+          req.headers['Accept-Language'] = I18n.locale.to_s
+        rescue StandardError
+          # ignore if I18n not available in context
+        end
+      end
+    end
+
+    def seq_cache_key(session_id)
+      "llm_service:chat_seq:#{session_id}"
+    end
+
+    def remember_seq(session_id, seq)
+      if seq
+        Rails.cache.write(seq_cache_key(session_id), seq, expires_in: 1.hour)
+      else
+        Rails.cache.delete(seq_cache_key(session_id))
+      end
+    end
+
     def strict_mode?
       true
     end
@@ -100,6 +100,7 @@ Rails.application.routes.draw do
         post 'db_preview_leads', to: 'tools#db_preview_leads'
         post 'close_chat', to: 'tools#close_chat'
         post 'chat_notify', to: 'tools#chat_notify'
+        post 'batch', to: 'tools#batch'
         post 'email_event', to: 'tools#email_event'
         post 'lead_packs', to: 'tools#create_lead_pack'
         get  'lead_packs/:id/export', to: 'tools#export_lead_pack'
@@ -195,6 +196,7 @@ Rails.application.routes.draw do
         post 'db_preview_leads', to: 'tools#db_preview_leads'
         post 'close_chat', to: 'tools#close_chat'
         post 'chat_notify', to: 'tools#chat_notify'
+        post 'batch', to: 'tools#batch'
         post 'email_event', to: 'tools#email_event'
         post 'lead_packs', to: 'tools#create_lead_pack'
         get  'lead_packs/:id/export', to: 'tools#export_lead_pack'
@@ -66,4 +66,24 @@ RSpec.describe 'API V1 Internal Tools', type: :request do
     expect(response).to have_http_status(:ok)
     expect(session.chat_messages.where(sender_type: 'Assistant', content: 'Hello results').count).to eq(1)
   end
+
+  it 'applies batched writes in order and reports per-op results' do
+    session = account.chat_sessions.create!(status: 'active')
+    operations = [
+      { op: 'profile_update', params: { account_id: account.id, profile: { summary: 'batched' } } },
+      { op: 'chat_notify', params: { account_id: account.id, chat_session_id: session.id, content: 'First' } },
+      { op: 'chat_notify', params: { account_id: account.id, chat_session_id: 0, content: 'Missing' } },
+      { op: 'apollo_fetch', params: { account_id: account.id } },
+      { op: 'close_chat', params: { account_id: account.id, chat_session_id: session.id } }
+    ]
+    post '/api/v1/internal/batch', headers: { 'X-Internal-Token' => token }, params: { operations: operations }, as: :json
+    expect(response).to have_http_status(:ok)
+    results = JSON.parse(response.body)['results']
+    expect(results.map { |r| r['status'] }).to eq(%w[ok ok error error ok])
+    expect(results[2]['error']).to eq('record_not_found')
+    expect(results[3]['error']).to eq('unsupported_op')
+    expect(account.reload.profile.summary).to eq('batched')
+    expect(session.chat_messages.where(sender_type: 'Assistant').pluck(:content)).to eq(['First'])
+    expect(session.reload.status).to eq('completed')
+  end
 end
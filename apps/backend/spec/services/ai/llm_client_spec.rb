@@ -22,5 +22,44 @@ RSpec.describe Ai::LlmClient do
       client.reply(session_id: 1, account_id: 1, user_id: 1, messages: [])
     }.to raise_error(Ai::LlmClient::StrictError)
   end
-end
 
+  it 'sends only the new message when the service holds the session, re-sending all on 409' do
+    client = described_class.new(base_url: 'http://example.test')
+    fake = instance_double(Faraday::Connection)
+    client.instance_variable_set(:@conn, fake)
+    allow(Rails.cache).to receive(:read).with('llm_service:chat_seq:7').and_return(4)
+    allow(Rails.cache).to receive(:write)
+    sent = []
+    allow(fake).to receive(:post) do |_path, payload|
+      sent << payload
+      if payload[:base_seq]
+        double(success?: false, status: 409, body: { 'detail' => { 'error' => 'history_required' } })
+      else
+        double(success?: true, status: 200, body: { 'reply' => 'ok', 'seq' => 2 })
+      end
+    end
+    messages = [{ role: 'assistant', content: 'Hello' }, { role: 'user', content: 'Find CTOs' }]
+    expect(client.reply(session_id: 7, account_id: 1, user_id: 1, messages: messages)).to eq('ok')
+    expect(sent.first[:messages]).to eq([{ role: 'user', content: 'Find CTOs' }])
+    expect(sent.first[:base_seq]).to eq(4)
+    expect(sent.last[:messages].size).to eq(2)
+    expect(sent.last).not_to have_key(:base_seq)
+    expect(Rails.cache).to have_received(:write).with('llm_service:chat_seq:7', 2, expires_in: 1.hour)
+  end
+
+  it 'sends the remaining time budget so the service answers before the read timeout' do
+    client = described_class.new(base_url: 'http://example.test', timeout: 10)
+    fake = instance_double(Faraday::Connection)
+    client.instance_variable_set(:@conn, fake)
+    allow(Rails.cache).to receive(:read).and_return(nil)
+    allow(Rails.cache).to receive(:delete)
+    request = Struct.new(:headers, :options).new({}, Faraday::RequestOptions.new)
+    allow(fake).to receive(:post) do |_path, _payload, &block|
+      block.call(request)
+      double(success?: true, status: 200, body: { 'reply' => 'ok' })
+    end
+    expect(client.reply(session_id: 8, account_id: 1, user_id: 1, messages: [{ role: 'user', content: 'Hi' }])).to eq('ok')
+    expect(request.headers['X-Request-Timeout-Ms'].to_i).to be_between(8_000, 9_000)
+    expect(request.options.timeout).to be <= 10
+  end
+end
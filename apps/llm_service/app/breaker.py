@@ -0,0 +1,147 @@
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from .env import env_bool, env_float, env_int
+
+
+# Per-path circuit breakers and adaptive timeouts for backend calls -------------
+#
+# Each internal path gets a breaker: after `failure_threshold` consecutive failed
+# calls (connection errors, timeouts, 5xx/429) it opens and calls fail fast for
+# `reset_seconds`; then one half-open trial call decides whether it closes
+# again or re-opens. Timeouts follow the path's observed latency: a multiple of
+# the recent p99, clamped between a floor and the configured client timeout.
+# Timed-out calls count as samples of the time they waited, so the bound can
+# grow back when the backend slows down; the half-open trial is not bounded.
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+        self._trial_in_flight = False
+
+    def allow(self, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        if self.state == OPEN and now - self.opened_at >= self.reset_seconds:
+            self.state = HALF_OPEN
+            self._trial_in_flight = False
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def retry_after(self, now: Optional[float] = None) -> float:
+        if self.state != OPEN:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.reset_seconds - (now - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self, now: Optional[float] = None) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.opened += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic() if now is None else now
+            self._trial_in_flight = False
+
+    def release(self) -> None:
+        # Call ended without a verdict (e.g. only token rejections)
+        self._trial_in_flight = False
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 3),
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class AdaptiveTimeout:
+    """Timeout from the recent latency distribution of completed and timed-out calls."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20, factor: float = 3.0, floor: float = 0.5):
+        self._samples: Deque[float] = deque(maxlen=max(1, window))
+        self.min_samples = min_samples
+        self.factor = factor
+        self.floor = floor
+
+    def observe(self, seconds: float) -> None:
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        if len(self._samples) < self.min_samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def p99(self) -> Optional[float]:
+        return self.quantile(0.99)
+
+    def timeout(self, ceiling: float) -> Optional[float]:
+        """Seconds to allow, or None while there are too few samples (use the client default)."""
+        p99 = self.p99()
+        if p99 is None:
+            return None
+        return min(ceiling, max(self.floor, p99 * self.factor))
+
+
+class BackendGuards:
+    """Breaker + adaptive timeout per internal path, created on first use."""
+
+    def __init__(self, failure_threshold: Optional[int] = None, reset_seconds: Optional[float] = None,
+                 adaptive: Optional[bool] = None, timeout_factor: Optional[float] = None,
+                 timeout_floor: Optional[float] = None):
+        self.failure_threshold = failure_threshold if failure_threshold is not None else env_int("BACKEND_BREAKER_FAILURES", 5)
+        self.reset_seconds = reset_seconds if reset_seconds is not None else env_float("BACKEND_BREAKER_RESET_SECONDS", 30.0)
+        if adaptive is None:
+            adaptive = env_bool("BACKEND_ADAPTIVE_TIMEOUT", True)
+        self.adaptive = adaptive
+        self.timeout_factor = timeout_factor if timeout_factor is not None else env_float("BACKEND_TIMEOUT_P99_FACTOR", 3.0)
+        self.timeout_floor = timeout_floor if timeout_floor is not None else env_float("BACKEND_TIMEOUT_MIN_SECONDS", 0.5)
+        self.reset()
+
+    def reset(self) -> None:
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._timeouts: Dict[str, AdaptiveTimeout] = {}
+
+    def breaker(self, path: str) -> CircuitBreaker:
+        b = self._breakers.get(path)
+        if b is None:
+            b = self._breakers[path] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return b
+
+    def latency(self, path: str) -> AdaptiveTimeout:
+        t = self._timeouts.get(path)
+        if t is None:
+            t = self._timeouts[path] = AdaptiveTimeout(factor=self.timeout_factor, floor=self.timeout_floor)
+        return t
+
+    def timeout(self, path: str, ceiling: float) -> Optional[float]:
+        return self.latency(path).timeout(ceiling) if self.adaptive else None
+
+    def snapshot(self) -> Dict[str, Dict]:
+        out = {}
+        for path, b in self._breakers.items():
+            p99 = self.latency(path).p99()
+            out[path] = {**b.snapshot(), "p99_ms": round(p99 * 1000, 1) if p99 is not None else None}
+        return out
@@ -0,0 +1,242 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+
+# Record/replay of model traffic -----------------------------------------------
+#
+# LLM_CASSETTE_MODE=record wraps the real model and appends every call (tool
+# calls, usage, elapsed time) to LLM_CASSETTE_PATH as one compact JSON line
+# (gzip when the path ends in .gz). LLM_CASSETTE_MODE=replay serves those
+# responses back without a model or network, sleeping the recorded time
+# (LLM_REPLAY_TIMING=original) or not at all (zero).
+#
+# Calls are matched on the exact request first. Tool results carry live backend
+# data, so a replay whose tool results differ falls back to the same step of
+# the same user turn (conversation up to the last user message + number of
+# model calls since). Repeated matches cycle through the recorded responses.
+
+class CassetteMiss(RuntimeError):
+    pass
+
+
+def _message_dict(m) -> Dict:
+    content = m.content if isinstance(m.content, str) else json.dumps(m.content, sort_keys=True)
+    out: Dict = {"type": getattr(m, "type", type(m).__name__), "content": content}
+    calls = getattr(m, "tool_calls", None)
+    if calls:
+        # Call ids are minted by the provider per run; names and args are what matter
+        out["tool_calls"] = [{"name": c.get("name"), "args": c.get("args")} for c in calls]
+    return out
+
+
+def _digest(label: str, items: List[Dict]) -> str:
+    raw = json.dumps([label, items], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def request_keys(label: str, msgs) -> tuple[str, str]:
+    """Return (exact key, turn key) for a model call."""
+    items = [_message_dict(m) for m in msgs]
+    last_user = max((i for i, m in enumerate(items) if m["type"] == "human"), default=-1)
+    step = sum(1 for m in items[last_user + 1:] if m["type"] == "ai")
+    prefix = [m for m in items[:last_user + 1] if m["type"] != "tool"]
+    return _digest(label, items), _digest(f"{label}#{step}", prefix)
+
+
+def _response_dict(res) -> Dict:
+    out: Dict = {"content": res.content if isinstance(res.content, str) else json.dumps(res.content)}
+    calls = getattr(res, "tool_calls", None)
+    if calls:
+        out["tool_calls"] = [{"name": c.get("name"), "args": c.get("args"), "id": c.get("id")} for c in calls]
+    usage = getattr(res, "usage_metadata", None)
+    if usage:
+        out["usage"] = dict(usage)
+    meta = getattr(res, "response_metadata", None) or {}
+    kept = {k: meta[k] for k in ("model_name", "finish_reason") if meta.get(k)}
+    if kept:
+        out["meta"] = kept
+    return out
+
+
+def _tool_calls(data: Dict) -> List[Dict]:
+    return [
+        {"name": c["name"], "args": c.get("args") or {}, "id": c.get("id") or f"replay_{i}"}
+        for i, c in enumerate(data.get("tool_calls") or [])
+    ]
+
+
+def _to_message(data: Dict):
+    from langchain.schema import AIMessage
+
+    return AIMessage(
+        content=data.get("content", ""),
+        tool_calls=_tool_calls(data),
+        usage_metadata=data.get("usage"),
+        response_metadata=data.get("meta") or {},
+    )
+
+
+def _to_chunk(data: Dict):
+    from langchain_core.messages import AIMessageChunk
+
+    return AIMessageChunk(
+        content=data.get("content", ""),
+        tool_call_chunks=[
+            {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+            for i, c in enumerate(_tool_calls(data))
+        ],
+        usage_metadata=data.get("usage"),
+        response_metadata=data.get("meta") or {},
+    )
+
+
+class Cassette:
+    """JSONL file of recorded model calls, indexed by exact and turn key."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._exact: Dict[str, Deque[Dict]] = {}
+        self._turn: Dict[str, Deque[Dict]] = {}
+        self.recorded = 0
+        self.hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        if os.path.exists(path):
+            with self._open("rt") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _open(self, mode: str):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _index(self, entry: Dict) -> None:
+        self._exact.setdefault(entry["key"], deque()).append(entry)
+        self._turn.setdefault(entry["turn"], deque()).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._exact.values())
+
+    def record(self, key: str, turn: str, response: Dict, elapsed: float) -> None:
+        entry = {"key": key, "turn": turn, "elapsed_ms": round(elapsed * 1000, 1), "response": response}
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            with self._open("at") as f:
+                f.write(line)
+            self._index(entry)
+            self.recorded += 1
+
+    def find(self, key: str, turn: str) -> Optional[Dict]:
+        with self._lock:
+            queue = self._exact.get(key)
+            if queue:
+                self.hits += 1
+            else:
+                queue = self._turn.get(turn)
+                if not queue:
+                    self.misses += 1
+                    return None
+                self.fuzzy_hits += 1
+            entry = queue[0]
+            queue.rotate(-1)
+            return entry
+
+    def stats(self) -> Dict:
+        return {
+            "path": self.path,
+            "entries": len(self),
+            "recorded": self.recorded,
+            "hits": self.hits,
+            "fuzzy_hits": self.fuzzy_hits,
+            "misses": self.misses,
+        }
+
+
+class CassetteModel:
+    """Stand-in for the chat model that records to or replays from a cassette.
+
+    ``inner`` is the real model (required to record, unused in replay), so
+    replay works with no OpenAI key configured.
+    """
+
+    def __init__(self, inner, cassette: Cassette, mode: str, timing: str = "original"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs a model")
+        self.inner = inner
+        self.cassette = cassette
+        self.mode = mode
+        self.timing = timing
+        self.model_name = getattr(inner, "model_name", None) or "cassette"
+
+    def bind_tools(self, tools, tool_choice=None):
+        bound = None
+        if self.mode == "record":
+            bound = self.inner.bind_tools(tools, tool_choice=tool_choice) if tool_choice else self.inner.bind_tools(tools)
+        return _Bound(self, bound, f"tools:{tool_choice or 'auto'}")
+
+    async def ainvoke(self, msgs):
+        return await self._ainvoke(self.inner, "plain", msgs)
+
+    async def _replay(self, label: str, msgs) -> Dict:
+        entry = self.cassette.find(*request_keys(label, msgs))
+        if entry is None:
+            raise CassetteMiss(f"no recorded response for this {label} call")
+        if self.timing == "original":
+            await asyncio.sleep(entry["elapsed_ms"] / 1000)
+        return entry["response"]
+
+    async def _ainvoke(self, runnable, label: str, msgs):
+        if self.mode == "replay":
+            return _to_message(await self._replay(label, msgs))
+        started = time.monotonic()
+        res = await runnable.ainvoke(msgs)
+        self.cassette.record(*request_keys(label, msgs), _response_dict(res), time.monotonic() - started)
+        return res
+
+    async def _astream(self, runnable, label: str, msgs):
+        if self.mode == "replay":
+            # The whole reply arrives as one chunk after the recorded time
+            yield _to_chunk(await self._replay(label, msgs))
+            return
+        started = time.monotonic()
+        res = None
+        async for chunk in runnable.astream(msgs):
+            res = chunk if res is None else res + chunk
+            yield chunk
+        if res is not None:
+            self.cassette.record(*request_keys(label, msgs), _response_dict(res), time.monotonic() - started)
+
+
+class _Bound:
+    def __init__(self, owner: CassetteModel, runnable, label: str):
+        self._owner = owner
+        self._runnable = runnable
+        self._label = label
+
+    async def ainvoke(self, msgs):
+        return await self._owner._ainvoke(self._runnable, self._label, msgs)
+
+    def astream(self, msgs):
+        return self._owner._astream(self._runnable, self._label, msgs)
+
+
+def wrap_from_env(model):
+    """Wrap ``model`` per LLM_CASSETTE_MODE; returns it unchanged when unset."""
+    mode = (os.getenv("LLM_CASSETTE_MODE") or "").strip().lower()
+    if mode not in ("record", "replay") or (mode == "record" and model is None):
+        return model
+    cassette = Cassette(os.getenv("LLM_CASSETTE_PATH") or "llm_cassette.jsonl.gz")
+    timing = (os.getenv("LLM_REPLAY_TIMING") or "original").strip().lower()
+    return CassetteModel(model, cassette, mode, timing)
@@ -0,0 +1,145 @@
+import hashlib
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from .cache import TTLCache
+from .schemas import Message
+
+
+# Token counting ---------------------------------------------------------------
+
+_PER_MESSAGE_OVERHEAD = 4
+_encoders: dict = {}
+
+
+def _approx_tokens(text: str) -> int:
+    # ~4 characters per token for English; good enough when tiktoken is absent
+    return len(text) // 4 + 1
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    if not text:
+        return 0
+    enc = _encoders.get(model)
+    if enc is None:
+        try:
+            import tiktoken
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken missing or its BPE files cannot be fetched (offline)
+            enc = False
+        _encoders[model] = enc
+    if enc is False:
+        return _approx_tokens(text)
+    return len(enc.encode(text))
+
+
+def extractive_summary(previous: Optional[str], dropped: Sequence[Message], max_chars: int = 800) -> str:
+    """Fallback summary when the model is unavailable: keep what the user asked for."""
+    lines = [previous] if previous else []
+    lines += [f"{m.role}: {' '.join(m.content.split())}" for m in dropped if m.role == "user"]
+    text = "\n".join(lines)
+    return text[-max_chars:]
+
+
+def _digest(m: Message) -> bytes:
+    return hashlib.sha1(m.role.encode() + b"\0" + m.content.encode("utf-8")).digest()
+
+
+def _shift(old: Sequence[bytes], new: Sequence[bytes]) -> Optional[int]:
+    """Smallest ``o`` such that ``old[o:]`` is a non-empty prefix of ``new``.
+
+    Callers that send a sliding window drop messages from the front and append
+    at the end, so ``o`` is how many messages fell off since the last call.
+    """
+    if not new:
+        return None
+    for o in range(len(old)):
+        if old[o] == new[0] and list(old[o:o + len(new)]) == list(new[:len(old) - o]):
+            return o
+    return None
+
+
+Summarizer = Callable[[Optional[str], List[Message]], Awaitable[str]]
+
+
+class ConversationWindow:
+    """Keeps the prompt within a token budget for arbitrarily long sessions.
+
+    The system prompt, an optional rolling summary and the most recent turns
+    must fit in ``budget`` tokens. When they do not, the oldest turns are folded
+    into the summary until the recent turns fit ``low_watermark * budget``; the
+    slack means the (model-backed) summarizer runs every few turns rather than
+    on every one. Summaries are cached per session with per-message digests of
+    the history they were computed for, so they are still found when the caller
+    sends a sliding window (oldest messages dropped) rather than the full log;
+    turns the caller drops before they were summarized are not recovered.
+    """
+
+    def __init__(
+        self,
+        budget: int,
+        min_recent: int = 4,
+        low_watermark: float = 0.6,
+        counter: Callable[[str], int] = count_tokens,
+        max_sessions: int = 1000,
+        ttl: float = 3600.0,
+    ):
+        self.budget = budget
+        self.min_recent = min_recent
+        self.low_watermark = low_watermark
+        self._count = counter
+        self._summaries = TTLCache(maxsize=max_sessions, ttl=ttl)
+
+    def _cost(self, m: Message) -> int:
+        return self._count(m.content) + _PER_MESSAGE_OVERHEAD
+
+    async def apply(
+        self, session_id: str, system_text: str, history: Sequence[Message], summarize: Summarizer
+    ) -> tuple[Optional[str], List[Message]]:
+        msgs = [m for m in history if m.role in ("user", "assistant")]
+        if self.budget <= 0:
+            return None, msgs
+        upto, summary = 0, None
+        digests = [_digest(m) for m in msgs]
+        state = self._summaries.get(session_id)
+        if state:
+            shift = _shift(state[1], digests)
+            if shift is not None:
+                upto, summary = min(len(msgs), max(0, state[0] - shift)), state[2]
+
+        costs = [self._cost(m) for m in msgs]
+        # suffix[i] = tokens of msgs[i:]
+        suffix = [0] * (len(msgs) + 1)
+        for i in range(len(msgs) - 1, -1, -1):
+            suffix[i] = suffix[i + 1] + costs[i]
+
+        fixed = self._count(system_text) + (self._count(summary) if summary else 0)
+        if fixed + suffix[upto] <= self.budget:
+            self._remember(session_id, upto, digests, summary)
+            return summary, msgs[upto:]
+
+        target = self.budget * self.low_watermark - self._count(system_text)
+        new_upto = upto
+        while len(msgs) - new_upto > self.min_recent and suffix[new_upto] > target:
+            new_upto += 1
+        # Prefer starting the window on a user turn
+        while new_upto < len(msgs) - self.min_recent and msgs[new_upto].role != "user":
+            new_upto += 1
+        if new_upto == upto:
+            self._remember(session_id, upto, digests, summary)
+            return summary, msgs[upto:]
+
+        summary = await summarize(summary, msgs[upto:new_upto])
+        self._remember(session_id, new_upto, digests, summary)
+        return summary, msgs[new_upto:]
+
+    def _remember(self, session_id: str, upto: int, digests: List[bytes], summary: Optional[str]) -> None:
+        # Refreshed on every call so the digests keep overlapping a sliding window
+        if summary is not None:
+            self._summaries.set(session_id, (upto, tuple(digests), summary))
+
+    def stats(self) -> dict:
+        return {"budget": self.budget, **self._summaries.stats()}
@@ -0,0 +1,69 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from .env import env_float
+
+
+# End-to-end request deadline ---------------------------------------------------
+#
+# The caller's budget arrives as X-Request-Timeout-Ms (relative, so host clocks
+# need not agree) or comes from CHAT_REQUEST_TIMEOUT_SECONDS (unset/0 = none).
+# It is held in a ContextVar as a monotonic instant; everything on the reply
+# path (HTTP timeouts, model and tool waits, the agent loop) asks what is left.
+
+HEADER = "X-Request-Timeout-Ms"
+# Kept back for serializing and sending the reply
+_TRANSIT_MARGIN_SECONDS = 0.25
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def budget(header_value: Optional[str]) -> Optional[float]:
+    """Seconds available for this request, or None for no deadline."""
+    seconds = None
+    if header_value:
+        try:
+            seconds = int(header_value) / 1000
+        except ValueError:
+            seconds = None
+    if seconds is None or seconds <= 0:
+        seconds = env_float("CHAT_REQUEST_TIMEOUT_SECONDS", 0.0)
+    if seconds <= 0:
+        return None
+    return max(0.0, seconds - _TRANSIT_MARGIN_SECONDS)
+
+
+@contextmanager
+def scope(seconds: Optional[float]) -> Iterator[None]:
+    token = _deadline.set(time.monotonic() + seconds if seconds is not None else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def clear() -> None:
+    """Drop the deadline for the rest of this context (e.g. in a background task)."""
+    _deadline.set(None)
+
+
+def remaining(reserve: float = 0.0) -> Optional[float]:
+    """Seconds left after holding back ``reserve`` (never negative); None without a deadline."""
+    at = _deadline.get()
+    if at is None:
+        return None
+    return max(0.0, at - time.monotonic() - reserve)
+
+
+def clamp(timeout: Optional[float], reserve: float = 0.0) -> Optional[float]:
+    """The shorter of ``timeout`` and the time left; None means unbounded."""
+    left = remaining(reserve)
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def expired() -> bool:
+    return remaining() == 0.0
@@ -0,0 +1,136 @@
+import os
+import time
+import sqlite3
+import threading
+from typing import Dict, Optional
+
+from .cache import TTLCache
+from .env import env_int
+
+
+# Discovery de-duplication stores ----------------------------------------------
+#
+# Both stores expose the same small interface used by _queue_discovery_once:
+#   claim(key, ttl)  -> True if the caller now owns the key for ttl seconds
+#   release(key)     -> give the key back (e.g. the backend call failed)
+# `blocking` tells the caller whether these touch disk and belong off the event
+# loop (run_in_threadpool) or are cheap enough to call inline.
+
+class MemoryDedupeStore:
+    """Per-process store: bounded LRU with expiry, swept periodically."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 10000, sweep_interval: float = 30.0):
+        self._cache = TTLCache(maxsize=max_keys, ttl=120.0)
+        self._sweep_interval = sweep_interval
+        self._last_sweep = time.monotonic()
+
+    def claim(self, key: str, ttl: float) -> bool:
+        self._maybe_sweep()
+        if key in self._cache:
+            return False
+        self._cache.set(key, True, ttl=ttl)
+        return True
+
+    def release(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def _maybe_sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._last_sweep >= self._sweep_interval:
+            self._cache.sweep()
+            self._last_sweep = now
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", **self._cache.stats()}
+
+
+class SQLiteDedupeStore:
+    """Store shared by every worker on the host through a WAL-mode SQLite file.
+
+    Dedupe is best effort: when the file stays locked past ``busy_timeout`` a
+    claim succeeds (at worst one duplicate discovery) rather than holding up
+    the request.
+    """
+
+    blocking = True
+
+    def __init__(self, path: str, max_keys: int = 10000, sweep_interval: float = 30.0, busy_timeout: float = 0.1):
+        self.path = path
+        self.max_keys = max_keys
+        self._sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self.busy = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS discovery_dedupe (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS discovery_dedupe_expires ON discovery_dedupe (expires_at)"
+        )
+
+    def claim(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            try:
+                self._maybe_sweep(now)
+                # Single statement, so concurrent workers cannot both win the key
+                cur = self._conn.execute(
+                    "INSERT INTO discovery_dedupe (key, expires_at) VALUES (?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at "
+                    "WHERE discovery_dedupe.expires_at <= ?",
+                    (key, now + ttl, now),
+                )
+            except sqlite3.OperationalError:
+                self.busy += 1
+                return True
+            return cur.rowcount == 1
+
+    def release(self, key: str) -> None:
+        with self._lock:
+            try:
+                self._conn.execute("DELETE FROM discovery_dedupe WHERE key = ?", (key,))
+            except sqlite3.OperationalError:
+                # The key then simply expires
+                self.busy += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM discovery_dedupe")
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now - self._last_sweep < self._sweep_interval:
+            return
+        self._last_sweep = now
+        self._conn.execute("DELETE FROM discovery_dedupe WHERE expires_at <= ?", (now,))
+        # Size cap: drop the keys closest to expiry first
+        self._conn.execute(
+            "DELETE FROM discovery_dedupe WHERE key IN ("
+            "SELECT key FROM discovery_dedupe ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_keys,),
+        )
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM discovery_dedupe").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "size": size, "max_keys": self.max_keys, "busy": self.busy}
+
+
+def make_dedupe_store(backend: Optional[str] = None):
+    backend = (backend or os.getenv("DISCOVERY_DEDUPE_BACKEND") or "memory").lower()
+    max_keys = env_int("DISCOVERY_DEDUPE_MAX_KEYS", 10000)
+    if backend == "sqlite":
+        path = os.getenv("DISCOVERY_DEDUPE_PATH", "/tmp/llm_service_dedupe.sqlite3")
+        try:
+            return SQLiteDedupeStore(path, max_keys=max_keys)
+        except sqlite3.Error:
+            # Fall back rather than refuse to serve chat
+            pass
+    return MemoryDedupeStore(max_keys=max_keys)
@@ -0,0 +1,139 @@
+import time
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import http_pool
+from .env import env_float
+
+
+# Sticky (base, token) resolution for backend internal calls -------------------
+
+class EndpointResolver:
+    """Remembers the last working (base, token) pair and backs off dead bases.
+
+    Candidate bases/tokens are loaded through the given callables and cached for
+    ``refresh_seconds`` so the environment is not re-read on every call.
+    """
+
+    def __init__(
+        self,
+        bases_fn: Callable[[], List[str]],
+        tokens_fn: Callable[[], List[str]],
+        refresh_seconds: Optional[float] = None,
+        min_backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+    ):
+        self._bases_fn = bases_fn
+        self._tokens_fn = tokens_fn
+        self.refresh_seconds = refresh_seconds if refresh_seconds is not None else env_float("BACKEND_RESOLVER_REFRESH", 60.0)
+        self.min_backoff = min_backoff if min_backoff is not None else env_float("BACKEND_PROBE_BACKOFF_MIN", 1.0)
+        self.max_backoff = max_backoff if max_backoff is not None else env_float("BACKEND_PROBE_BACKOFF_MAX", 60.0)
+        self._probe_task: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._bases: List[str] = []
+        self._tokens: List[str] = []
+        self._loaded_at: Optional[float] = None
+        self._preferred: Optional[Tuple[str, str]] = None
+        # base -> (consecutive failures, monotonic time when it may be retried)
+        self._down: Dict[str, Tuple[int, float]] = {}
+
+    def _load(self) -> None:
+        now = time.monotonic()
+        if self._loaded_at is not None and (now - self._loaded_at) < self.refresh_seconds:
+            return
+        self._bases = list(self._bases_fn())
+        self._tokens = list(self._tokens_fn())
+        self._loaded_at = now
+        if self._preferred and (self._preferred[0] not in self._bases or self._preferred[1] not in self._tokens):
+            self._preferred = None
+
+    def tokens(self) -> List[str]:
+        self._load()
+        return list(self._tokens)
+
+    def bases(self) -> List[str]:
+        self._load()
+        return list(self._bases)
+
+    def is_down(self, base: str, now: Optional[float] = None) -> bool:
+        state = self._down.get(base)
+        if not state:
+            return False
+        return (now if now is not None else time.monotonic()) < state[1]
+
+    def plan(self) -> List[Tuple[str, str]]:
+        """Ordered (base, token) attempts: known-good pair first; bases in backoff are
+        left out (the prober revives them) unless every base is backing off."""
+        self._load()
+        now = time.monotonic()
+        pairs = [(b, tok) for b in self._bases for tok in self._tokens]
+        if self._preferred in pairs:
+            pairs.remove(self._preferred)
+            pairs.insert(0, self._preferred)
+        healthy = [p for p in pairs if not self.is_down(p[0], now)]
+        # If every base is backing off, still try them rather than fail outright
+        return healthy or pairs
+
+    def mark_success(self, base: str, token: str, prefer: bool = True) -> None:
+        # prefer=False: the pair works, but should not become the first choice
+        # (e.g. it only won a hedge against a primary that was merely slow)
+        if prefer:
+            self._preferred = (base, token)
+        self._down.pop(base, None)
+
+    def mark_failure(self, base: str) -> None:
+        failures = self._down.get(base, (0, 0.0))[0] + 1
+        delay = min(self.max_backoff, self.min_backoff * (2 ** (failures - 1)))
+        self._down[base] = (failures, time.monotonic() + delay)
+        if self._preferred and self._preferred[0] == base:
+            self._preferred = None
+
+    async def probe(self, base: str) -> bool:
+        try:
+            r = await http_pool.get_client().get(f"{base}/up", timeout=http_pool.config()["connect_timeout"])
+            alive = r.status_code < 500
+        except Exception:
+            alive = False
+        if alive:
+            self._down.pop(base, None)
+        else:
+            self.mark_failure(base)
+        return alive
+
+    async def probe_due(self) -> None:
+        now = time.monotonic()
+        due = [b for b, (_, retry_at) in list(self._down.items()) if retry_at <= now]
+        for base in due:
+            await self.probe(base)
+
+    async def _probe_forever(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.probe_due()
+            except Exception:
+                pass
+
+    def start_probing(self, interval: float = 1.0) -> None:
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_forever(interval))
+
+    async def stop_probing(self) -> None:
+        task, self._probe_task = self._probe_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        preferred = self._preferred
+        return {
+            "preferred_base": preferred[0] if preferred else None,
+            "preferred_token_index": self._tokens.index(preferred[1]) if preferred and preferred[1] in self._tokens else None,
+            "down": {b: {"failures": f, "retry_in": round(max(0.0, at - now), 2)} for b, (f, at) in self._down.items()},
+        }
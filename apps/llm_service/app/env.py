@@ -0,0 +1,27 @@
+import os
+
+
+# Typed environment settings ----------------------------------------------------
+#
+# Unset, empty or malformed values fall back to the default, so a typo in one
+# knob cannot stop the service from importing.
+
+def env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def env_bool(name: str, default: bool = False) -> bool:
+    raw = (os.getenv(name) or "").strip().lower()
+    if not raw:
+        return default
+    return raw in ("1", "true", "yes", "on")
@@ -0,0 +1,91 @@
+import re
+from typing import Dict, FrozenSet, Optional, Sequence
+
+from .i18n import RESOURCES, t
+from .schemas import Message
+
+
+# Trivial-turn vocabulary per locale -------------------------------------------
+#
+# Whole-message phrases only (after lowercasing, dropping punctuation and
+# politeness words), so "yes, but only in Europe" still goes to the model.
+
+PHRASES: Dict[str, Dict[str, Sequence[str]]] = {
+    'en': {
+        'yes': ['yes', 'y', 'yeah', 'yep', 'sure', 'ok', 'okay', 'yes please', 'go ahead'],
+        'no': ['no', 'n', 'nope', 'not really', 'no more'],
+        'greeting': ['hi', 'hello', 'hey', 'hi there', 'hello there', 'good morning', 'good afternoon', 'good evening'],
+        'close': ['close the chat', 'close chat', 'end the chat', 'end chat', "that's all", 'that is all',
+                  "we're done", 'we are done', 'i am done', "i'm done", 'bye', 'goodbye'],
+    },
+    'es': {
+        'yes': ['sí', 'si', 'claro', 'vale', 'de acuerdo', 'adelante'],
+        'no': ['no', 'no gracias', 'todavía no'],
+        'greeting': ['hola', 'buenos días', 'buenas tardes', 'buenas noches', 'buenas'],
+        'close': ['cierra el chat', 'cerrar el chat', 'eso es todo', 'terminamos', 'adiós', 'hasta luego'],
+    },
+    'fr': {
+        'yes': ['oui', "d'accord", 'ok', 'volontiers', 'allez-y'],
+        'no': ['non', 'non merci', 'pas vraiment'],
+        'greeting': ['bonjour', 'salut', 'bonsoir', 'coucou'],
+        'close': ['fermer la discussion', 'fermez la discussion', 'fermer le chat', "c'est tout",
+                  'au revoir', "c'est terminé"],
+    },
+}
+
+_POLITE = {'please', 'thanks', 'thank you', 'por favor', 'gracias', 'merci', "s'il vous plaît", "s'il te plaît"}
+_PUNCT = re.compile(r"[^\w\s'-]+")
+
+
+def _normalize(text: str) -> str:
+    text = ' '.join(_PUNCT.sub(' ', (text or '').lower().replace('’', "'")).split())
+    for word in sorted(_POLITE, key=len, reverse=True):
+        if text.endswith(' ' + word):
+            text = text[: -len(word) - 1]
+        if text.startswith(word + ' '):
+            text = text[len(word) + 1:]
+    return text.strip()
+
+
+def _compile() -> Dict[str, FrozenSet[str]]:
+    out: Dict[str, set] = {}
+    for phrases in PHRASES.values():
+        for kind, items in phrases.items():
+            out.setdefault(kind, set()).update(_normalize(p) for p in items)
+    return {k: frozenset(v) for k, v in out.items()}
+
+
+# Matched across locales: the UI locale and the language typed often differ
+_PHRASES = _compile()
+# Assistant prompts whose yes/no answers are deterministic, in every locale
+_PROMPTS = {
+    key: tuple(_normalize(t(key, loc)) for loc in RESOURCES)
+    for key in ('db_satisfied', 'db_empty_offer_external')
+}
+
+
+def _asked(last_assistant: str, key: str) -> bool:
+    text = _normalize(last_assistant)
+    return bool(text) and any(text.endswith(p) for p in _PROMPTS[key])
+
+
+def classify(messages: Sequence[Message]) -> Optional[str]:
+    """Return 'close', 'fetch_more' or 'greeting' for turns that need no model call."""
+    if not messages or messages[-1].role != 'user':
+        return None
+    text = _normalize(messages[-1].content)
+    if not text:
+        return None
+    last_assistant = next((m.content for m in reversed(messages[:-1]) if m.role == 'assistant'), '')
+    if text in _PHRASES['close']:
+        return 'close'
+    if _asked(last_assistant, 'db_satisfied'):
+        if text in _PHRASES['yes']:
+            return 'close'
+        if text in _PHRASES['no']:
+            return 'fetch_more'
+    if _asked(last_assistant, 'db_empty_offer_external') and text in _PHRASES['yes']:
+        return 'fetch_more'
+    if text in _PHRASES['greeting'] and not any(m.role == 'user' for m in messages[:-1]):
+        return 'greeting'
+    return None
@@ -0,0 +1,70 @@
+import os
+from typing import Dict, Iterable, Optional
+
+from .breaker import AdaptiveTimeout
+from .env import env_bool, env_float
+
+
+# Hedged reads across backend bases ---------------------------------------------
+#
+# For idempotent read paths only: when the first base has not answered within
+# the path's recent p95, the same request goes to the next healthy base and the
+# first success wins. Extra requests are capped by a budget that earns `ratio`
+# of a hedge per request (at most `burst` banked), so hedging adds at most
+# ~ratio x traffic even when the backend is slow across the board.
+
+_DEFAULT_PATHS = ("/api/v1/internal/db_preview_leads",)
+
+
+class HedgePolicy:
+    def __init__(self, enabled: Optional[bool] = None, paths: Optional[Iterable[str]] = None,
+                 ratio: Optional[float] = None, burst: float = 3.0,
+                 min_delay: Optional[float] = None, default_delay: float = 0.25):
+        if enabled is None:
+            enabled = env_bool("BACKEND_HEDGING")
+        if paths is None:
+            raw = os.getenv("BACKEND_HEDGE_PATHS")
+            paths = [p.strip() for p in raw.split(",") if p.strip()] if raw else _DEFAULT_PATHS
+        self.enabled = enabled
+        self.paths = frozenset(paths)
+        self.ratio = ratio if ratio is not None else env_float("BACKEND_HEDGE_MAX_RATIO", 0.1)
+        self.burst = burst
+        self.min_delay = min_delay if min_delay is not None else env_float("BACKEND_HEDGE_MIN_DELAY_SECONDS", 0.05)
+        self.default_delay = default_delay
+        self.reset()
+
+    def reset(self) -> None:
+        self._tokens = self.burst
+        self.requests = 0
+        self.sent = 0
+        self.won = 0
+        self.over_budget = 0
+
+    def applies(self, path: str) -> bool:
+        return self.enabled and path in self.paths
+
+    def delay(self, latency: AdaptiveTimeout) -> float:
+        p95 = latency.quantile(0.95)
+        return max(self.min_delay, p95) if p95 is not None else self.default_delay
+
+    def on_request(self) -> None:
+        self.requests += 1
+        self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        if self._tokens < 1.0:
+            self.over_budget += 1
+            return False
+        self._tokens -= 1.0
+        self.sent += 1
+        return True
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "paths": sorted(self.paths),
+            "requests": self.requests,
+            "sent": self.sent,
+            "won": self.won,
+            "over_budget": self.over_budget,
+        }
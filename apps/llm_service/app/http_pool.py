@@ -0,0 +1,138 @@
+import asyncio
+from typing import Dict, Optional, Set
+
+import httpx
+
+from .env import env_bool, env_float, env_int
+
+
+# Shared keep-alive client for backend internal calls ---------------------------
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_stats: Dict[str, int] = {"requests": 0, "responses": 0, "clients_created": 0}
+_retiring: Set["asyncio.Future"] = set()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def config() -> Dict:
+    return {
+        "max_connections": env_int("BACKEND_POOL_MAX_CONNECTIONS", 50),
+        "max_keepalive_connections": env_int("BACKEND_POOL_MAX_KEEPALIVE", 20),
+        "keepalive_expiry": env_float("BACKEND_POOL_KEEPALIVE_EXPIRY", 30.0),
+        "timeout": env_float("BACKEND_HTTP_TIMEOUT", 5.0),
+        "connect_timeout": env_float("BACKEND_CONNECT_TIMEOUT", 2.0),
+        "http2": env_bool("BACKEND_HTTP2") and _http2_available(),
+    }
+
+
+async def _on_request(request: httpx.Request) -> None:
+    _stats["requests"] += 1
+
+
+async def _on_response(response: httpx.Response) -> None:
+    _stats["responses"] += 1
+
+
+def _build_client() -> httpx.AsyncClient:
+    cfg = config()
+    limits = httpx.Limits(
+        max_connections=cfg["max_connections"],
+        max_keepalive_connections=cfg["max_keepalive_connections"],
+        keepalive_expiry=cfg["keepalive_expiry"],
+    )
+    timeout = httpx.Timeout(cfg["timeout"], connect=cfg["connect_timeout"])
+    _stats["clients_created"] += 1
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=timeout,
+        http2=cfg["http2"],
+        event_hooks={"request": [_on_request], "response": [_on_response]},
+    )
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+async def startup() -> None:
+    global _client, _client_loop
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+        _client_loop = _running_loop()
+
+
+async def shutdown() -> None:
+    global _client, _client_loop
+    client, _client, _client_loop = _client, None, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+async def _close_quietly(client: httpx.AsyncClient) -> None:
+    try:
+        await client.aclose()
+    except Exception:
+        # Connections opened on a loop that has since closed cannot shut down
+        # cleanly; the sockets go with the client either way
+        pass
+
+
+def _retire(client: httpx.AsyncClient, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+    """Best-effort close of a client replaced by get_client()."""
+    if client.is_closed:
+        return
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        # Still serving on another thread: close it there
+        fut = asyncio.run_coroutine_threadsafe(_close_quietly(client), loop)
+    else:
+        fut = asyncio.ensure_future(_close_quietly(client))
+    _retiring.add(fut)
+    fut.add_done_callback(_retiring.discard)
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating one lazily outside the app lifespan."""
+    global _client, _client_loop
+    loop = _running_loop()
+    # Pooled connections are bound to the loop that opened them; a client from a
+    # different (e.g. finished test) loop cannot be reused.
+    if _client is None or _client.is_closed or (loop is not None and _client_loop is not loop):
+        if _client is not None and loop is not None:
+            _retire(_client, _client_loop)
+        _client = _build_client()
+        _client_loop = loop
+    return _client
+
+
+def pool_stats() -> Dict:
+    cfg = config()
+    out: Dict = {
+        "active": _client is not None and not _client.is_closed,
+        "http2": cfg["http2"],
+        "max_connections": cfg["max_connections"],
+        "max_keepalive_connections": cfg["max_keepalive_connections"],
+        "keepalive_expiry": cfg["keepalive_expiry"],
+        "timeout": cfg["timeout"],
+        **_stats,
+    }
+    # httpx does not expose pool internals publicly; best-effort peek at httpcore
+    try:
+        pool = _client._transport._pool  # type: ignore[union-attr]
+        conns = list(pool.connections)
+        out["connections"] = len(conns)
+        out["idle_connections"] = sum(1 for c in conns if c.is_idle())
+    except Exception:
+        out["connections"] = 0
+        out["idle_connections"] = 0
+    return out
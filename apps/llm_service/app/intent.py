@@ -0,0 +1,185 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+
+# Targeting vocabulary per locale ----------------------------------------------
+#
+# role/location map a phrase to the canonical filter value; keyword phrases are
+# passed through as search keywords. A match on any role or location, or on a
+# "trigger" phrase, means the turn carries targeting and should use tools.
+# Abbreviations that are also everyday words ("us") only count as a location
+# when written as the abbreviation ("US") or right after a location_context
+# token ("in us"), and never force tools on their own.
+# Other locales extend "en" (users mix in English titles like CTO or SaaS).
+# INTENT_VOCABULARY_FILE may point at a JSON file with the same shape; its
+# entries are merged over these.
+
+VOCABULARY: Dict[str, Dict[str, object]] = {
+    'en': {
+        'role': {
+            'cto': 'CTO', 'ctos': 'CTO', 'chief technology officer': 'CTO', 'vp engineering': 'CTO',
+        },
+        'location': {
+            'united states': 'United States', 'usa': 'United States',
+            'india': 'India', 'uk': 'United Kingdom', 'united kingdom': 'United Kingdom',
+        },
+        'keyword': [
+            'saas', 'ai', 'cloud', 'automation', 'ml', 'machine learning', 'devops', 'security', 'data',
+        ],
+        'trigger': ['role:', 'location:', 'keywords:', 'saas', 'ai', 'find', 'search', 'target'],
+        'abbreviation': {'US': 'United States'},
+        'location_context': ['in', 'location:'],
+    },
+    'es': {
+        'role': {'director de tecnología': 'CTO', 'director técnico': 'CTO'},
+        'location': {
+            'estados unidos': 'United States', 'eeuu': 'United States', 'ee. uu.': 'United States',
+            'reino unido': 'United Kingdom',
+        },
+        'keyword': ['nube', 'automatización', 'seguridad', 'datos'],
+        'trigger': ['rol:', 'ubicación:', 'busca', 'buscar', 'encuentra', 'encontrar'],
+        'location_context': ['en', 'ubicación:'],
+    },
+    'fr': {
+        'role': {'directeur technique': 'CTO', 'directrice technique': 'CTO'},
+        'location': {'états-unis': 'United States', 'inde': 'India', 'royaume-uni': 'United Kingdom'},
+        'keyword': ['sécurité', 'données'],
+        'trigger': ['rôle:', 'lieu:', 'cherche', 'chercher', 'trouve', 'trouver', 'cibler'],
+        'location_context': ['en', 'au', 'aux', 'lieu:'],
+    },
+}
+
+
+@dataclass(frozen=True)
+class Intent:
+    role: Optional[str] = None
+    location: Optional[str] = None
+    keywords: Tuple[str, ...] = field(default_factory=tuple)
+    require_tool: bool = False
+
+    def filters(self) -> Dict[str, str]:
+        return {k: v for k, v in {
+            'role': self.role,
+            'location': self.location,
+            'keywords': ' '.join(self.keywords) if self.keywords else None,
+        }.items() if v}
+
+
+# Words (hyphenated compounds kept whole) with an optional trailing ':' so
+# "role:" and "états-unis" are single tokens
+_TOKEN = re.compile(r"\w+(?:-\w+)*:?")
+
+
+def _tokens(text: str) -> Tuple[str, ...]:
+    return tuple(tok.lower() for tok in _TOKEN.findall(text))
+
+
+class IntentMatcher:
+    """Token-level phrase matcher: one regex tokenization, then dict lookups.
+
+    Matching whole tokens gives word boundaries for free ("ai" never matches
+    inside "said"), and the cost grows with the message, not the vocabulary.
+    """
+
+    def __init__(self, vocab: Dict[str, object]):
+        self._lookup: Dict[Tuple[str, ...], List[Tuple[str, str]]] = {}
+        for kind in ('role', 'location'):
+            for phrase, value in dict(vocab.get(kind) or {}).items():
+                self._add(phrase, (kind, value))
+        for kind in ('keyword', 'trigger'):
+            for phrase in vocab.get(kind) or []:
+                self._add(phrase, (kind, ' '.join(_tokens(phrase))))
+        # First token -> candidate phrase lengths, longest first
+        self._starts: Dict[str, List[int]] = {}
+        for key in self._lookup:
+            self._starts.setdefault(key[0], []).append(len(key))
+        for lengths in self._starts.values():
+            lengths.sort(reverse=True)
+        # lowercased token -> (exact spelling, location)
+        self._abbreviations = {k.lower(): (k, v) for k, v in dict(vocab.get('abbreviation') or {}).items()}
+        self._location_context = frozenset(_tokens(' '.join(vocab.get('location_context') or [])))
+
+    def _add(self, phrase: str, entry: Tuple[str, str]) -> None:
+        key = _tokens(phrase)
+        if key:
+            self._lookup.setdefault(key, []).append(entry)
+
+    def extract(self, text: str) -> Intent:
+        if not text:
+            return Intent()
+        raw = _TOKEN.findall(text)
+        toks = tuple(tok.lower() for tok in raw)
+        starts, lookup = self._starts, self._lookup
+        role = location = None
+        keywords: List[str] = []
+        require_tool = False
+        resume = 0
+        for i in [i for i, tok in enumerate(toks) if tok in starts]:
+            if i < resume:
+                continue  # inside a phrase matched earlier
+            for n in starts[toks[i]]:
+                entries = lookup.get(toks[i:i + n])
+                if entries is None:
+                    continue
+                resume = i + n
+                for kind, value in entries:
+                    if kind == 'role':
+                        role = role or value
+                        require_tool = True
+                    elif kind == 'location':
+                        location = location or value
+                        require_tool = True
+                    elif kind == 'keyword':
+                        if value not in keywords:
+                            keywords.append(value)
+                    else:
+                        require_tool = True
+                break
+        if location is None and self._abbreviations:
+            for i, tok in enumerate(toks):
+                spelling, value = self._abbreviations.get(tok, (None, None))
+                if spelling and (raw[i] == spelling or (i and toks[i - 1] in self._location_context)):
+                    location = value
+                    break
+        return Intent(role=role, location=location, keywords=tuple(keywords), require_tool=require_tool)
+
+
+def _load_overrides() -> Dict[str, Dict[str, object]]:
+    path = os.getenv('INTENT_VOCABULARY_FILE')
+    if not path:
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _merge(*vocabs: Dict[str, object]) -> Dict[str, object]:
+    out: Dict[str, object] = {
+        'role': {}, 'location': {}, 'abbreviation': {}, 'keyword': [], 'trigger': [], 'location_context': [],
+    }
+    for v in vocabs:
+        for kind in ('role', 'location', 'abbreviation'):
+            out[kind].update(v.get(kind) or {})
+        for kind in ('keyword', 'trigger', 'location_context'):
+            out[kind] += [p for p in v.get(kind) or [] if p not in out[kind]]
+    return out
+
+
+@lru_cache(maxsize=None)
+def matcher_for(locale: str) -> IntentMatcher:
+    overrides = _load_overrides()
+    layers = [VOCABULARY['en'], overrides.get('en') or {}]
+    if locale != 'en':
+        layers += [VOCABULARY.get(locale) or {}, overrides.get(locale) or {}]
+    return IntentMatcher(_merge(*layers))
+
+
+def extract_intent(text: str, locale: str = 'en') -> Intent:
+    return matcher_for(locale).extract(text)
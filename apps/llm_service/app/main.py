@@ -1,7 +1,26 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Response
+from . import http_pool, metrics, routes_chat, tracing
 from .routes_chat import router as chat_router
 
-app = FastAPI(title="AI Sales Agent LLM Service", version="0.1.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.startup()
+    routes_chat.resolver.start_probing()
+    routes_chat._PROFILE_WRITES.start()
+    try:
+        yield
+    finally:
+        await routes_chat.resolver.stop_probing()
+        # Drain pending writes while the HTTP client is still open
+        await routes_chat._PROFILE_WRITES.stop()
+        await http_pool.shutdown()
+        tracing.flush()
+
+
+app = FastAPI(title="AI Sales Agent LLM Service", version="0.1.0", lifespan=lifespan)
 
 
 @app.get("/health")
@@ -10,4 +29,38 @@ async def health_check() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/health/pool")
+async def pool_health() -> dict:
+    """Connection pool stats for backend internal calls."""
+    return {
+        **http_pool.pool_stats(),
+        "endpoints": routes_chat.resolver.snapshot(),
+        "breakers": routes_chat._GUARDS.snapshot(),
+        "hedging": routes_chat._HEDGE.stats(),
+    }
+
+
+@app.get("/health/cache")
+async def cache_health() -> dict:
+    """Hit/miss counters for the in-process caches (null when disabled)."""
+    caches = {"llm": routes_chat._LLM_CACHE, "db_preview": routes_chat._DB_PREVIEW_CACHE}
+    out = {name: c.stats() if c is not None else None for name, c in caches.items()}
+    out["singleflight"] = routes_chat._INFLIGHT.stats()
+    out["discovery_dedupe"] = routes_chat._DISCOVERY_DEDUPE.stats()
+    out["context_window"] = routes_chat._WINDOW.stats()
+    out["sessions"] = routes_chat._SESSIONS.stats()
+    out["prompt_cache"] = routes_chat.prompt_usage_stats()
+    out["profile_writes"] = routes_chat._PROFILE_WRITES.stats()
+    out["fast_path"] = dict(routes_chat._FAST_PATH_HITS)
+    out["llm_cassette"] = routes_chat.cassette_stats()
+    return out
+
+
+@app.get("/metrics")
+async def prometheus_metrics() -> Response:
+    """Prometheus scrape endpoint (latency histograms and agent counters)."""
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+
 app.include_router(chat_router)
@@ -0,0 +1,73 @@
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+
+# Prometheus metrics -----------------------------------------------------------
+#
+# Own registry so tests and reloads start clean. With several uvicorn workers
+# set PROMETHEUS_MULTIPROC_DIR and /metrics aggregates every worker's samples.
+
+REGISTRY = CollectorRegistry()
+
+# Seconds; spans fast cache hits up to slow vendor fetches and model turns
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+REQUEST_SECONDS = Histogram(
+    "llm_chat_request_seconds", "Whole chat request latency.",
+    ["endpoint", "outcome"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+MODEL_SECONDS = Histogram(
+    "llm_model_call_seconds", "Latency of each model call.",
+    ["stage"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+TOOL_SECONDS = Histogram(
+    "llm_tool_seconds", "Latency of each tool invocation.",
+    ["tool", "status"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+BACKEND_SECONDS = Histogram(
+    "llm_backend_request_seconds", "Latency of each internal backend attempt.",
+    ["path", "status"], buckets=_LATENCY_BUCKETS, registry=REGISTRY,
+)
+AGENT_ITERATIONS = Histogram(
+    "llm_agent_iterations", "Agent loop iterations per request.",
+    buckets=(1, 2, 3, 4, 5, 6), registry=REGISTRY,
+)
+SERVER_ASSIST = Counter(
+    "llm_server_assist_total", "Server-side assist fallback runs, by what surfaced leads.",
+    ["outcome"], registry=REGISTRY,
+)
+DISCOVERY_DEDUPE = Counter(
+    "llm_discovery_dedupe_total", "discover_leads calls skipped by the dedupe window or joined in flight.",
+    ["result"], registry=REGISTRY,
+)
+TOOL_CHOICE_RETRIES = Counter(
+    "llm_tool_choice_required_retries_total", "Turns re-run with tool_choice=required.",
+    registry=REGISTRY,
+)
+BREAKER_REJECTIONS = Counter(
+    "llm_backend_breaker_rejections_total", "Internal calls failed fast by an open circuit breaker.",
+    ["path"], registry=REGISTRY,
+)
+BREAKER_OPENED = Counter(
+    "llm_backend_breaker_opened_total", "Times a path's circuit breaker opened.",
+    ["path"], registry=REGISTRY,
+)
+BACKEND_HEDGES = Counter(
+    "llm_backend_hedges_total", "Hedged backend reads: sent, won by the hedge, or skipped over budget.",
+    ["path", "result"], registry=REGISTRY,
+)
+DEADLINE_CUTOFFS = Counter(
+    "llm_deadline_cutoffs_total", "Work skipped or cut short by the request deadline, by stage.",
+    ["stage"], registry=REGISTRY,
+)
+
+
+def render() -> tuple[bytes, str]:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
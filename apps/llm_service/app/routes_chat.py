@@ -1,13 +1,42 @@
 import os
 import json
+import hashlib
 import time
-from typing import List, Dict, Optional
+import asyncio
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List, Dict, Optional
 
 import httpx
-from fastapi import APIRouter, Request, HTTPException
+from fastapi import APIRouter, Request, Response, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
-from .i18n import normalize_locale, t
-from .schemas import ChatRequest, ChatResponse
+from . import deadline, http_pool, metrics, tracing
+from .env import env_bool, env_float, env_int
+from .breaker import HALF_OPEN, OPEN, BackendGuards
+from .cache import TTLCache
+from .cassette import Cassette, wrap_from_env
+from .context_window import ConversationWindow, count_tokens, extractive_summary
+from .dedupe import make_dedupe_store
+from .endpoints import EndpointResolver
+from .hedging import HedgePolicy
+from .fast_path import classify as classify_trivial_turn
+from .i18n import RESOURCES, normalize_locale, t
+from .intent import extract_intent
+from .schemas import (
+    ChatRequest,
+    ChatResponse,
+    DiscoverInput,
+    Message,
+    NotifyInput,
+    PackInput,
+    PreviewInput,
+    ProfileInput,
+)
+from .sessions import SessionStore
+from .singleflight import SingleFlight
+from .write_behind import WriteBehind
 
 
 # Initialize OpenAI chat model (required; no non-AI mode)
@@ -21,15 +50,23 @@ if USE_OPENAI:
         from langchain.schema import HumanMessage, SystemMessage, AIMessage
         from langchain_core.messages import ToolMessage
 
-        llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0.2)
+        # stream_usage: streamed replies also report token usage (incl. cached prompt tokens)
+        llm = ChatOpenAI(model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"), temperature=0.2, stream_usage=True)
     except Exception:
         llm = None
+# LLM_CASSETTE_MODE=record|replay puts a record/replay layer in front (replay needs no key)
+llm = wrap_from_env(llm)
+
+
+def cassette_stats() -> Optional[Dict]:
+    cassette = getattr(llm, "cassette", None)
+    return cassette.stats() if isinstance(cassette, Cassette) else None
 
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
-def system_prompt(locale: str) -> str:
+def _build_system_prompt(locale: str) -> str:
     base = t('system_prompt', locale)
     suffix = (
         " You have tools: db_preview_leads, discover_leads, chat_notify, profile_update, close_chat. "
@@ -40,21 +77,16 @@ def system_prompt(locale: str) -> str:
     return f"{base} {suffix}"
 
 
-def _infer_filters(text: str) -> Dict[str, str]:
-    t = (text or "").lower()
-    role = 'CTO' if ('cto' in t or 'chief technology officer' in t or 'vp engineering' in t) else None
-    location = None
-    if 'united states' in t or ' us' in t or 'usa' in t:
-        location = 'United States'
-    keywords = []
-    for k in ['saas', 'ai', 'cloud', 'automation', 'ml', 'machine learning', 'devops', 'security', 'data']:
-        if k in t:
-            keywords.append(k)
-    return {k: v for k, v in {
-        'role': role,
-        'location': location,
-        'keywords': ' '.join(keywords) if keywords else None,
-    }.items() if v}
+# Built once per locale: the provider caches prompts by exact prefix, so the
+# system prompt (like the bound tool specs below) must not vary between requests.
+_SYSTEM_PROMPTS: Dict[str, str] = {loc: _build_system_prompt(loc) for loc in RESOURCES}
+
+
+def system_prompt(locale: str) -> str:
+    prompt = _SYSTEM_PROMPTS.get(locale)
+    if prompt is None:
+        prompt = _SYSTEM_PROMPTS.setdefault(locale, _build_system_prompt(locale))
+    return prompt
 
 
 # Internal API utilities -------------------------------------------------------
@@ -94,52 +126,300 @@ def _backend_bases() -> List[str]:
     return bases
 
 
-def _post_internal(path: str, payload: Dict) -> tuple[bool, int]:
-    tokens = _candidate_tokens()
-    if not any(tokens):
-        return (False, 0)
-    for base in _backend_bases():
-        for token in tokens:
-            try:
-                with httpx.Client(timeout=5.0) as c:
-                    url = f"{base}{path}"
-                    r = c.post(url, headers={"X-Internal-Token": token}, json=payload)
-                    if 200 <= r.status_code < 400:
-                        return (True, r.status_code)
-                    if r.status_code == 403:
-                        continue
-            except Exception:
-                continue
-    return (False, 403 if any(tokens) else -1)
+# Bases/tokens are resolved once and the last working pair is tried first;
+# unreachable bases back off and are re-probed in the background.
+resolver = EndpointResolver(lambda: _backend_bases(), lambda: _candidate_tokens())
+# Per-path circuit breakers and latency-based timeouts (see breaker.py)
+_GUARDS = BackendGuards()
+# Optional hedging of idempotent reads across bases (see hedging.py)
+_HEDGE = HedgePolicy()
+
+
+def _is_backend_failure(status: int) -> bool:
+    return status >= 500 or status == 429
+
+
+def _is_success(r: Optional[httpx.Response]) -> bool:
+    return r is not None and 200 <= r.status_code < 400
 
 
-def _post_internal_json(path: str, payload: Dict) -> tuple[bool, int, Dict]:
-    tokens = _candidate_tokens()
+async def _attempt(path: str, base: str, token: str, token_index: int, payload: Dict, extra: Dict):
+    """One POST; returns (response or None, elapsed, timed_out)."""
+    started = time.monotonic()
+    timed_out = False
+    with tracing.span("backend.attempt", path=path, base=base, token_index=token_index) as sp:
+        try:
+            r = await http_pool.get_client().post(
+                f"{base}{path}", headers={"X-Internal-Token": token}, json=payload, **extra
+            )
+        except Exception as e:
+            r = None
+            timed_out = isinstance(e, httpx.TimeoutException)
+            sp.set(status="error", error=type(e).__name__)
+        else:
+            sp.set(status=r.status_code)
+    return r, time.monotonic() - started, timed_out
+
+
+async def _hedged_attempts(path: str, plan: List[tuple], tokens: List[str], payload: Dict, extra: Dict) -> List[tuple]:
+    """First attempt, plus a hedge to the next healthy base if it is slow; returns finished ((base, token), r, elapsed, timed_out)."""
+    primary = plan[0]
+    backup = next(((b, tok) for b, tok in plan if b != primary[0] and not resolver.is_down(b)), None)
+    _HEDGE.on_request()
+    first = asyncio.ensure_future(_attempt(path, *primary, tokens.index(primary[1]), payload, extra))
+    pairs = {first: primary}
+    pending = {first}
+    outcomes: List[tuple] = []
+    try:
+        if backup is not None:
+            _, pending = await asyncio.wait(pending, timeout=_HEDGE.delay(_GUARDS.latency(path)))
+            if pending:
+                if _HEDGE.try_acquire():
+                    metrics.BACKEND_HEDGES.labels(path, "sent").inc()
+                    second = asyncio.ensure_future(_attempt(path, *backup, tokens.index(backup[1]), payload, extra))
+                    pairs[second] = backup
+                    pending.add(second)
+                else:
+                    metrics.BACKEND_HEDGES.labels(path, "over_budget").inc()
+        pending = set(pairs)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                r, elapsed, timed_out = task.result()
+                outcomes.append((pairs[task], r, elapsed, timed_out))
+                if _is_success(r):
+                    if task is not first:
+                        _HEDGE.won += 1
+                        metrics.BACKEND_HEDGES.labels(path, "won").inc()
+                    return outcomes
+        return outcomes
+    finally:
+        # The slower request (or both, if we were cancelled) is no longer needed
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _send_internal(path: str, payload: Dict) -> tuple[bool, int, Optional[httpx.Response]]:
+    tokens = resolver.tokens()
     if not any(tokens):
-        return (False, 0, {})
-    for base in _backend_bases():
-        for token in tokens:
-            try:
-                with httpx.Client(timeout=5.0) as c:
-                    url = f"{base}{path}"
-                    r = c.post(url, headers={"X-Internal-Token": token}, json=payload)
-                    if 200 <= r.status_code < 400:
-                        try:
-                            return (True, r.status_code, r.json())
-                        except Exception:
-                            return (True, r.status_code, {})
-                    if r.status_code == 403:
-                        continue
-            except Exception:
+        return (False, 0, None)
+    if deadline.expired():
+        metrics.DEADLINE_CUTOFFS.labels("backend").inc()
+        return (False, 504, None)
+    breaker = _GUARDS.breaker(path)
+    if not breaker.allow():
+        # Open breaker: fail fast instead of waiting on an overloaded backend
+        metrics.BREAKER_REJECTIONS.labels(path).inc()
+        return (False, 503, None)
+    cfg = http_pool.config()
+    # The half-open trial gets the full client timeout: a bound learned while the
+    # backend was fast would otherwise time the trial out and keep the path shut
+    timeout = None if breaker.state == HALF_OPEN else _GUARDS.timeout(path, cfg["timeout"])
+    left = deadline.remaining()
+    if left is not None:
+        # The request deadline caps every attempt
+        timeout = min(timeout or cfg["timeout"], left)
+    # Without enough samples yet (and no deadline) the client's configured timeout applies
+    extra = {"timeout": httpx.Timeout(timeout, connect=min(timeout, cfg["connect_timeout"]))} if timeout is not None else {}
+    unreachable: set = set()
+    failed = False
+    # Status reported when every attempt fails: 403 if only tokens were rejected,
+    # otherwise the backend's own failure, 504 for a timeout, 502 for no connection
+    cause = 403
+
+    def settle(base: str, token: str, r: Optional[httpx.Response], elapsed: float, timed_out: bool,
+               prefer: bool = True) -> bool:
+        """Record one attempt; True when its response is the answer (success or a definite 4xx)."""
+        nonlocal failed, cause
+        if r is None:
+            metrics.BACKEND_SECONDS.labels(path, "error").observe(elapsed)
+            # Connection-level failure: skip this base's remaining tokens
+            unreachable.add(base)
+            cause = 504 if timed_out else 502
+            if not deadline.expired():  # our own deadline cut it short, not the base
+                failed = True
+                resolver.mark_failure(base)
+                if timed_out:
+                    # The call took at least this long; without the sample a timeout
+                    # learned while the backend was fast could never grow back
+                    _GUARDS.latency(path).observe(elapsed)
+            return False
+        metrics.BACKEND_SECONDS.labels(path, str(r.status_code)).observe(elapsed)
+        if _is_success(r):
+            resolver.mark_success(base, token, prefer=prefer)
+            breaker.record_success()
+            _GUARDS.latency(path).observe(elapsed)
+            return True
+        if _is_backend_failure(r.status_code):
+            failed = True
+            cause = r.status_code
+            return False
+        # 403 means this token is rejected here; try the next pair. Any other
+        # 4xx (400/404/422) is the backend's answer to the request itself.
+        return r.status_code != 403
+
+    try:
+        plan = resolver.plan()
+        tried: set = set()
+        if _HEDGE.applies(path) and plan:
+            outcomes = await _hedged_attempts(path, plan, tokens, payload, extra)
+            # A hedge that beat a slow (not failed) primary must not move every
+            # path's traffic to its base
+            primary_failed = any(pair == plan[0] and not _is_success(r) for pair, r, _, _ in outcomes)
+            for (base, token), r, elapsed, timed_out in outcomes:
+                tried.add((base, token))
+                if settle(base, token, r, elapsed, timed_out, prefer=(base, token) == plan[0] or primary_failed):
+                    return _settled(breaker, r)
+        for base, token in plan:
+            if base in unreachable or (base, token) in tried:
                 continue
-    return (False, 403 if any(tokens) else -1, {})
+            if deadline.expired():
+                metrics.DEADLINE_CUTOFFS.labels("backend").inc()
+                break
+            r, elapsed, timed_out = await _attempt(path, base, token, tokens.index(token), payload, extra)
+            if settle(base, token, r, elapsed, timed_out):
+                return _settled(breaker, r)
+    except BaseException:
+        breaker.release()
+        raise
+    if failed:
+        was_open = breaker.state == OPEN
+        breaker.record_failure()
+        if breaker.state == OPEN and not was_open:
+            metrics.BREAKER_OPENED.labels(path).inc()
+    else:
+        breaker.release()
+    return (False, cause, None)
+
+
+def _settled(breaker, r: httpx.Response) -> tuple[bool, int, Optional[httpx.Response]]:
+    if not _is_success(r):
+        # A definite client error says nothing about backend health
+        breaker.release()
+    return (_is_success(r), r.status_code, r)
+
+
+_BACKEND_FAILURES = {
+    502: ("backend_unreachable", "The backend could not be reached."),
+    504: ("backend_timeout", "The backend did not answer in time."),
+}
+
+
+def _tool_error(path: str, status: int) -> Dict:
+    """Tool result for a failed backend call; states the cause plainly when it was the backend's."""
+    out: Dict = {"status": "error", "code": status}
+    breaker = _GUARDS.breaker(path)
+    if breaker.state == OPEN:
+        out.update(
+            reason="backend_unavailable",
+            retry_after_seconds=round(breaker.retry_after(), 1),
+            message="The backend is temporarily unavailable. Do not call this tool again in this turn; tell the user to try again shortly.",
+        )
+    elif status in _BACKEND_FAILURES or _is_backend_failure(status):
+        reason, message = _BACKEND_FAILURES.get(status, ("backend_error", f"The backend failed with status {status}."))
+        out.update(reason=reason, message=message + " Tell the user if retrying does not help.")
+    return out
+
+
+async def _post_internal(path: str, payload: Dict) -> tuple[bool, int]:
+    ok, status, _ = await _send_internal(path, payload)
+    return (ok, status)
+
+
+async def _post_internal_json(path: str, payload: Dict) -> tuple[bool, int, Dict]:
+    ok, status, r = await _send_internal(path, payload)
+    if not ok or r is None:
+        return (ok, status, {})
+    try:
+        return (True, status, r.json())
+    except Exception:
+        return (True, status, {})
+
+
+# Per-turn write batching ------------------------------------------------------
+# chat_notify/profile_update/close_chat are fire-and-forget: during a turn they
+# are collected (in call order) and flushed as one request to the batch endpoint
+# when the turn ends. Older backends without it get the individual calls.
+_BATCH_PATH = "/api/v1/internal/batch"
+_BATCH_OPS = {
+    "/api/v1/internal/chat_notify": "chat_notify",
+    "/api/v1/internal/profile_update": "profile_update",
+    "/api/v1/internal/close_chat": "close_chat",
+}
+_BATCH_RETRY_SECONDS = env_float("INTERNAL_BATCH_RETRY_SECONDS", 300.0)
+_batch_disabled_until = 0.0
+_turn_writes: ContextVar[Optional[List[tuple]]] = ContextVar("turn_writes", default=None)
+# Per-turn flags set by tools (e.g. which follow-up prompt the reply must end with)
+_turn_state: ContextVar[Optional[Dict]] = ContextVar("turn_state", default=None)
+
+
+async def _post_write(path: str, payload: Dict) -> tuple[bool, int]:
+    pending = _turn_writes.get()
+    if pending is None or path not in _BATCH_OPS:
+        return await _post_internal(path, payload)
+    pending.append((path, payload))
+    return (True, 202)
+
+
+async def _flush_writes(pending: List[tuple]) -> List[tuple]:
+    """Send (and clear) the collected writes; returns the ones the backend accepted."""
+    global _batch_disabled_until
+    ops, pending[:] = list(pending), []
+    if len(ops) > 1 and time.monotonic() >= _batch_disabled_until:
+        try:
+            ok, status, body = await _post_internal_json(
+                _BATCH_PATH, {"operations": [{"op": _BATCH_OPS[path], "params": payload} for path, payload in ops]}
+            )
+        except Exception:
+            ok, status, body = False, 0, {}
+        if ok:
+            # One result per operation, in order; a failed op does not fail the batch
+            results = body.get("results")
+            if not isinstance(results, list) or len(results) != len(ops):
+                return ops
+            return [op for op, res in zip(ops, results) if isinstance(res, dict) and res.get("status") == "ok"]
+        # Only a backend without the endpoint turns batching off for a while;
+        # overload and timeouts just fall back for this flush
+        if status in (404, 405):
+            _batch_disabled_until = time.monotonic() + _BATCH_RETRY_SECONDS
+    delivered = []
+    for path, payload in ops:
+        try:
+            ok, _ = await _post_internal(path, payload)
+        except Exception:
+            ok = False
+        if ok:
+            delivered.append((path, payload))
+    return delivered
+
+
+# Write-behind for the per-turn profile_update: latest text per account, flushed
+# in the background (several accounts share one batch call); started/drained by
+# the app lifespan.
+_PROFILE_WRITES = WriteBehind(
+    _flush_writes,
+    max_pending=env_int("PROFILE_WRITE_MAX_PENDING", 1000),
+    flush_interval=env_float("PROFILE_WRITE_FLUSH_SECONDS", 1.0),
+)
 
 
 # Discovery de-duplication to avoid spamming ----------------------------------
-_RECENT_DISCOVERY: dict[str, float] = {}
+_INFLIGHT = SingleFlight()
+# In-process by default; DISCOVERY_DEDUPE_BACKEND=sqlite shares the window
+# across uvicorn workers on the same host.
+_DISCOVERY_DEDUPE = make_dedupe_store()
 _DISCOVERY_TTL_SECONDS = 120.0
 
 
+async def _dedupe(op: Callable, *args):
+    # The SQLite store touches disk; keep it off the event loop
+    if _DISCOVERY_DEDUPE.blocking:
+        return await run_in_threadpool(op, *args)
+    return op(*args)
+
+
 def _discovery_key(account_id: int, session_id: str, filters: Dict[str, str]) -> str:
     role = (filters.get('role') or '').lower()
     loc = (filters.get('location') or '').lower()
@@ -147,180 +427,627 @@ def _discovery_key(account_id: int, session_id: str, filters: Dict[str, str]) ->
     return f"{account_id}:{session_id}:{role}:{loc}:{kw}"
 
 
-def _queue_discovery_once(account_id: int, session_id: str, filters: Dict[str, str]) -> tuple[bool, bool, int, Dict]:
-    now = time.time()
+async def _queue_discovery_once(account_id: int, session_id: str, filters: Dict[str, str]) -> tuple[bool, bool, int, Dict]:
     key = _discovery_key(account_id, session_id, filters)
-    ts = _RECENT_DISCOVERY.get(key)
-    if ts and (now - ts) < _DISCOVERY_TTL_SECONDS:
+    flight = ("discover", key)
+    # A concurrent identical call (double submit, retry) waits for the one in
+    # flight instead of paying for a second vendor fetch.
+    follower = _INFLIGHT.pending(flight)
+    # Claim before calling so other workers see the key immediately
+    if not follower and not await _dedupe(_DISCOVERY_DEDUPE.claim, key, _DISCOVERY_TTL_SECONDS):
+        metrics.DISCOVERY_DEDUPE.labels("duplicate").inc()
         return (False, True, 200, {})
     # In dev, run sync for snappier UX
     sync = (os.getenv("PYTHON_ENV") or os.getenv("APP_ENV") or os.getenv("RAILS_ENV") or "").lower() != "production"
-    ok, status, body = _post_internal_json(
-        "/api/v1/internal/discover_leads",
-        {"account_id": account_id, "filters": filters, "sync": sync},
-    )
+    try:
+        ok, status, body = await _INFLIGHT.do(flight, lambda: _post_internal_json(
+            "/api/v1/internal/discover_leads",
+            {"account_id": account_id, "filters": filters, "sync": sync},
+        ))
+    except BaseException:
+        if not follower:
+            await _dedupe(_DISCOVERY_DEDUPE.release, key)
+        raise
+    if follower:
+        metrics.DISCOVERY_DEDUPE.labels("coalesced").inc()
+        return (False, True, status, {})
     if ok:
-        _RECENT_DISCOVERY[key] = now
+        _invalidate_db_preview(account_id)
+    else:
+        await _dedupe(_DISCOVERY_DEDUPE.release, key)
     return (ok, False, status, body or {})
 
 
+# Short-lived cache of DB previews; new leads (discover/apollo) invalidate it
+_DB_PREVIEW_TTL_SECONDS = env_float("DB_PREVIEW_CACHE_TTL_SECONDS", 30.0)
+_DB_PREVIEW_CACHE: Optional[TTLCache] = (
+    TTLCache(maxsize=env_int("DB_PREVIEW_CACHE_MAX_ENTRIES", 512), ttl=_DB_PREVIEW_TTL_SECONDS)
+    if _DB_PREVIEW_TTL_SECONDS > 0
+    else None
+)
+
+
+def _db_preview_key(account_id: int, filters: Dict, limit: int) -> tuple:
+    norm = tuple(sorted(
+        (k, " ".join(str(v).lower().split()))
+        for k, v in (filters or {}).items()
+        if k != "limit" and v not in (None, "")
+    ))
+    return (account_id, norm, int(limit))
+
+
+def _invalidate_db_preview(account_id: int) -> None:
+    if _DB_PREVIEW_CACHE is not None:
+        _DB_PREVIEW_CACHE.discard_where(lambda k: k[0] == account_id)
+
+
+async def _db_preview(account_id: int, filters: Dict, limit: int) -> tuple[bool, int, Dict]:
+    key = _db_preview_key(account_id, filters, limit)
+    if _DB_PREVIEW_CACHE is not None:
+        cached = _DB_PREVIEW_CACHE.get(key)
+        if cached is not None:
+            return (True, 200, cached)
+    ok, status, data = await _INFLIGHT.do(("db_preview", key), lambda: _post_internal_json(
+        "/api/v1/internal/db_preview_leads",
+        {"account_id": account_id, "filters": filters, "limit": limit},
+    ))
+    if ok and isinstance(data, dict) and _DB_PREVIEW_CACHE is not None:
+        _DB_PREVIEW_CACHE.set(key, data)
+    return (ok, status, data)
+
+
 # Tools exposed to the LLM -----------------------------------------------------
 
+@dataclass(frozen=True)
+class ToolContext:
+    account_id: int
+    session_id: str
+    locale: str
+
+
+# The tool objects (and their JSON schemas) are built once per process; the
+# per-request account/session/locale is read from this context variable.
+_tool_ctx: ContextVar[ToolContext] = ContextVar("tool_ctx")
+_TOOLS: Optional[list] = None
+
+
+def _format_bullets(rows: list[dict], limit: int = 5) -> str:
+    bullets = []
+    for r in (rows or [])[:limit]:
+        name = ((str(r.get('first_name') or '') + ' ' + str(r.get('last_name') or '')).strip()) or '(No name)'
+        line = f"- {name} — {r.get('company') or ''} — {r.get('email') or ''}"
+        bullets.append(line)
+    return "\n".join(bullets)
+
+
+def _filters_dict(**filters) -> Dict:
+    return {k: v for k, v in filters.items() if v is not None}
+
+
+async def _tool_db_preview(keywords: Optional[str] = None, role: Optional[str] = None,
+                           location: Optional[str] = None, limit: int = 5) -> dict:
+    ctx = _tool_ctx.get()
+    ok, status, data = await _db_preview(
+        ctx.account_id, _filters_dict(keywords=keywords, role=role, location=location, limit=limit), limit
+    )
+    if ok and isinstance(data, dict):
+        total = data.get("total", 0)
+        results = data.get("results", [])
+        # Post preview bullets to the chat; queued with the turn's other writes and
+        # flushed when the turn ends, ahead of the reply
+        if total and results:
+            content = t('db_preview_intro', ctx.locale) + "\n" + _format_bullets(results)
+            await _post_write(
+                "/api/v1/internal/chat_notify",
+                {"account_id": ctx.account_id, "chat_session_id": ctx.session_id, "content": content},
+            )
+            # The reply closes with the yes/no question the fast path answers next turn
+            turn = _turn_state.get()
+            if turn is not None:
+                turn["prompt"] = "db_satisfied"
+        return {"status": "ok", "total": total, "results": results}
+    return _tool_error("/api/v1/internal/db_preview_leads", status)
+
+
+async def _tool_discover(keywords: Optional[str] = None, role: Optional[str] = None,
+                         location: Optional[str] = None) -> dict:
+    ctx = _tool_ctx.get()
+    # A search after the preview supersedes its "satisfied?" question
+    turn = _turn_state.get()
+    if turn is not None:
+        turn.pop("prompt", None)
+    filters = _filters_dict(keywords=keywords, role=role, location=location)
+    queued, duplicate, queued_status, body = await _queue_discovery_once(ctx.account_id, ctx.session_id, filters)
+    out = {"queued": queued, "duplicate": duplicate, "status": queued_status}
+    if not queued and not duplicate:
+        out.update({k: v for k, v in _tool_error("/api/v1/internal/discover_leads", queued_status).items() if k not in ("status", "code")})
+    if isinstance(body, dict) and body.get("sample"):
+        out["sample"] = body.get("sample")
+        # Share a few leads in chat; delivered with the turn's batched writes at the end of the turn
+        try:
+            sample = out["sample"]
+            if isinstance(sample, list) and sample:
+                bullets = _format_bullets(sample)
+                await _post_write(
+                    "/api/v1/internal/chat_notify",
+                    {"account_id": ctx.account_id, "chat_session_id": ctx.session_id, "content": "New leads found:\n" + bullets},
+                )
+        except Exception:
+            pass
+    return out
+
+
+async def _tool_chat_notify(content: str) -> dict:
+    ctx = _tool_ctx.get()
+    ok, status = await _post_write(
+        "/api/v1/internal/chat_notify",
+        {"account_id": ctx.account_id, "chat_session_id": ctx.session_id, "content": content},
+    )
+    return {"status": "ok", "code": status} if ok else _tool_error("/api/v1/internal/chat_notify", status)
+
+
+async def _tool_close_chat() -> dict:
+    ctx = _tool_ctx.get()
+    ok, status = await _post_write(
+        "/api/v1/internal/close_chat",
+        {"account_id": ctx.account_id, "chat_session_id": ctx.session_id},
+    )
+    return {"status": "ok", "code": status} if ok else _tool_error("/api/v1/internal/close_chat", status)
+
+
+async def _tool_profile_update(free_text: str) -> dict:
+    ctx = _tool_ctx.get()
+    # Supersedes this turn's pending write-behind of the raw user text
+    _PROFILE_WRITES.discard(ctx.account_id)
+    ok, status = await _post_write(
+        "/api/v1/internal/profile_update",
+        {"account_id": ctx.account_id, "profile": {"questionnaire": {"free_text": free_text}}},
+    )
+    return {"status": "ok", "code": status} if ok else _tool_error("/api/v1/internal/profile_update", status)
+
+
+async def _tool_create_lead_pack(lead_ids: Optional[List[int]] = None, filters=None, name: Optional[str] = None) -> dict:
+    ctx = _tool_ctx.get()
+    payload: Dict = {"account_id": ctx.account_id}
+    if lead_ids:
+        payload["lead_ids"] = list(lead_ids)
+    if filters is not None:
+        payload["filters"] = filters.model_dump(exclude_none=True) if hasattr(filters, "model_dump") else _filters_dict(**filters)
+    if name:
+        payload["name"] = name
+    # Require at least one of lead_ids or filters
+    if not payload.get("lead_ids") and not payload.get("filters"):
+        return {"status": "error", "code": 400, "message": "lead_ids or filters required"}
+    ok, status, body = await _post_internal_json("/api/v1/internal/lead_packs", payload)
+    out: Dict = {"status": "ok", "code": status} if ok else _tool_error("/api/v1/internal/lead_packs", status)
+    if isinstance(body, dict):
+        out.update({"pack": body.get("lead_pack") or body})
+    return out
+
+
+def _tool_registry() -> list:
+    global _TOOLS
+    if _TOOLS is None:
+        from langchain.tools import StructuredTool
+
+        _TOOLS = [
+            StructuredTool.from_function(
+                name="db_preview_leads",
+                description="Preview leads from the user's database.",
+                coroutine=_tool_db_preview,
+                args_schema=PreviewInput,
+            ),
+            StructuredTool.from_function(
+                name="discover_leads",
+                description="Discover more leads via external providers (Apollo/HubSpot/Salesforce).",
+                coroutine=_tool_discover,
+                args_schema=DiscoverInput,
+            ),
+            StructuredTool.from_function(
+                name="chat_notify",
+                description="Post a message into the chat (use to share bullet lists).",
+                coroutine=_tool_chat_notify,
+                args_schema=NotifyInput,
+            ),
+            StructuredTool.from_function(
+                name="close_chat",
+                description="Mark the chat session as completed when user is satisfied.",
+                coroutine=_tool_close_chat,
+            ),
+            StructuredTool.from_function(
+                name="profile_update",
+                description="Save user preferences in profile questionnaire.free_text.",
+                coroutine=_tool_profile_update,
+                args_schema=ProfileInput,
+            ),
+            # Pack creation tool placed last so model prefers preview/discover first
+            StructuredTool.from_function(
+                name="create_lead_pack",
+                description=(
+                    "Create a saved pack of leads for follow-up actions (export, campaign). "
+                    "Provide either lead_ids from recent results or filters to select them."
+                ),
+                coroutine=_tool_create_lead_pack,
+                args_schema=PackInput,
+            ),
+        ]
+    return _TOOLS
+
+
 def _make_tools(account_id: int, session_id: str, locale: str):
     if llm is None:
         return []
-    from langchain.tools import StructuredTool
-    from pydantic import BaseModel, Field
+    # Binds the request to the current task context; tool calls spawned from it
+    # (including asyncio.gather children) inherit the values.
+    _tool_ctx.set(ToolContext(account_id=account_id, session_id=session_id, locale=locale))
+    return _tool_registry()
 
-    class Filters(BaseModel):
-        keywords: Optional[str] = Field(default=None)
-        role: Optional[str] = Field(default=None)
-        location: Optional[str] = Field(default=None)
 
-    class PreviewInput(Filters):
-        limit: int = Field(default=5, ge=1, le=10)
+# Bound runnables per tool_choice mode, reused across requests. Converting the
+# tools to OpenAI function specs on every bind is pure per-request overhead.
+_BOUND_MODELS: Dict[str, object] = {}
+_BOUND_FOR: object = None
 
-    class DiscoverInput(Filters):
-        pass
 
-    class NotifyInput(BaseModel):
-        content: str
-
-    class ProfileInput(BaseModel):
-        free_text: str
-
-    class PackInput(BaseModel):
-        lead_ids: Optional[List[int]] = Field(default=None, description="IDs of leads to include")
-        filters: Optional[Filters] = Field(default=None, description="Filters to select leads")
-        name: Optional[str] = Field(default=None, description="Optional pack name")
-
-    def _format_bullets(rows: list[dict], limit: int = 5) -> str:
-        bullets = []
-        for r in (rows or [])[:limit]:
-            name = ((str(r.get('first_name') or '') + ' ' + str(r.get('last_name') or '')).strip()) or '(No name)'
-            line = f"- {name} — {r.get('company') or ''} — {r.get('email') or ''}"
-            bullets.append(line)
-        return "\n".join(bullets)
-
-    def tool_db_preview(filters: PreviewInput) -> dict:
-        ok, status, data = _post_internal_json(
-            "/api/v1/internal/db_preview_leads",
-            {"account_id": account_id, "filters": filters.model_dump(exclude_none=True), "limit": filters.limit},
-        )
-        if ok and isinstance(data, dict):
-            total = data.get("total", 0)
-            results = data.get("results", [])
-            # Post preview bullets automatically so user sees results promptly
-            if total and results:
-                content = t('db_preview_intro', locale) + "\n" + _format_bullets(results)
-                _post_internal(
-                    "/api/v1/internal/chat_notify",
-                    {"account_id": account_id, "chat_session_id": session_id, "content": content},
-                )
-            return {"status": "ok", "total": total, "results": results}
-        return {"status": "error", "code": status}
-
-    def tool_discover(inp: DiscoverInput) -> dict:
-        filters = inp.model_dump(exclude_none=True)
-        queued, duplicate, queued_status, body = _queue_discovery_once(account_id, session_id, filters)
-        out = {"queued": queued, "duplicate": duplicate, "status": queued_status}
-        if isinstance(body, dict) and body.get("sample"):
-            out["sample"] = body.get("sample")
-            # Immediately share a few leads in chat so the user sees progress
+def _bound_model(mode: str):
+    global _BOUND_FOR
+    if _BOUND_FOR is not llm:
+        # llm was swapped (reload/tests); drop runnables bound to the old one
+        _BOUND_MODELS.clear()
+        _BOUND_FOR = llm
+    model = _BOUND_MODELS.get(mode)
+    if model is None:
+        tools = _tool_registry()
+        if mode == "required":
             try:
-                sample = out["sample"]
-                if isinstance(sample, list) and sample:
-                    bullets = _format_bullets(sample)
-                    _post_internal(
-                        "/api/v1/internal/chat_notify",
-                        {"account_id": account_id, "chat_session_id": session_id, "content": "New leads found:\n" + bullets},
-                    )
+                model = llm.bind_tools(tools, tool_choice="required")
             except Exception:
-                pass
-        return out
+                model = _bound_model("auto")
+        else:
+            model = llm.bind_tools(tools)
+        _BOUND_MODELS[mode] = model
+    return model
 
-    def tool_chat_notify(inp: NotifyInput) -> dict:
-        ok, status = _post_internal(
-            "/api/v1/internal/chat_notify",
-            {"account_id": account_id, "chat_session_id": session_id, "content": inp.content},
-        )
-        return {"status": "ok" if ok else "error", "code": status}
 
-    def tool_close_chat() -> dict:
-        ok, status = _post_internal(
-            "/api/v1/internal/close_chat",
-            {"account_id": account_id, "chat_session_id": session_id},
-        )
-        return {"status": "ok" if ok else "error", "code": status}
+async def _invoke_model(model, msgs):
+    # Prefer the native async path; fall back to a worker thread for sync-only models
+    ainvoke = getattr(model, "ainvoke", None)
+    if ainvoke is not None:
+        return await ainvoke(msgs)
+    return await run_in_threadpool(model.invoke, msgs)
 
-    def tool_profile_update(inp: ProfileInput) -> dict:
-        ok, status = _post_internal(
-            "/api/v1/internal/profile_update",
-            {"account_id": account_id, "profile": {"questionnaire": {"free_text": inp.free_text}}},
-        )
-        return {"status": "ok" if ok else "error", "code": status}
-
-    def tool_create_lead_pack(inp: PackInput) -> dict:
-        payload: Dict = {"account_id": account_id}
-        if inp.lead_ids:
-            payload["lead_ids"] = list(inp.lead_ids)
-        if inp.filters is not None:
-            payload["filters"] = inp.filters.model_dump(exclude_none=True)
-        if inp.name:
-            payload["name"] = inp.name
-        # Require at least one of lead_ids or filters
-        if not payload.get("lead_ids") and not payload.get("filters"):
-            return {"status": "error", "code": 400, "message": "lead_ids or filters required"}
-        ok, status, body = _post_internal_json("/api/v1/internal/lead_packs", payload)
-        out: Dict = {"status": "ok" if ok else "error", "code": status}
-        if isinstance(body, dict):
-            out.update({"pack": body.get("lead_pack") or body})
-        return out
-
-    return [
-        StructuredTool.from_function(
-            name="db_preview_leads",
-            description="Preview leads from the user's database.",
-            func=tool_db_preview,
-            args_schema=PreviewInput,
-        ),
-        StructuredTool.from_function(
-            name="discover_leads",
-            description="Discover more leads via external providers (Apollo/HubSpot/Salesforce).",
-            func=tool_discover,
-            args_schema=DiscoverInput,
-        ),
-        StructuredTool.from_function(
-            name="chat_notify",
-            description="Post a message into the chat (use to share bullet lists).",
-            func=tool_chat_notify,
-            args_schema=NotifyInput,
-        ),
-        StructuredTool.from_function(
-            name="close_chat",
-            description="Mark the chat session as completed when user is satisfied.",
-            func=tool_close_chat,
-        ),
-        StructuredTool.from_function(
-            name="profile_update",
-            description="Save user preferences in profile questionnaire.free_text.",
-            func=tool_profile_update,
-            args_schema=ProfileInput,
-        ),
-        # Pack creation tool placed last so model prefers preview/discover first
-        StructuredTool.from_function(
-            name="create_lead_pack",
-            description=(
-                "Create a saved pack of leads for follow-up actions (export, campaign). "
-                "Provide either lead_ids from recent results or filters to select them."
-            ),
-            func=tool_create_lead_pack,
-            args_schema=PackInput,
-        ),
+
+# Optional per-request event sink used by the streaming endpoint
+Emit = Optional[Callable[[str, Dict], Awaitable[None]]]
+
+
+async def _stream_model(model, msgs, emit: Emit):
+    # Stream content deltas as they arrive; once the model starts a tool call the
+    # turn is not a final answer, so stop forwarding text.
+    astream = getattr(model, "astream", None)
+    if emit is None or astream is None:
+        return await _invoke_model(model, msgs)
+    res = None
+    async for chunk in astream(msgs):
+        res = chunk if res is None else res + chunk
+        if getattr(res, "tool_call_chunks", None):
+            continue
+        text = getattr(chunk, "content", "")
+        if isinstance(text, str) and text:
+            await emit("token", {"text": text})
+    return res
+
+
+# Opt-in exact-match response cache for the model layer
+_LLM_CACHE: Optional[TTLCache] = (
+    TTLCache(
+        maxsize=env_int("LLM_CACHE_MAX_ENTRIES", 256),
+        ttl=env_float("LLM_CACHE_TTL_SECONDS", 300.0),
+    )
+    if env_bool("LLM_CACHE_ENABLED")
+    else None
+)
+
+
+def _llm_cache_key(msgs, locale: str, mode: str) -> Optional[str]:
+    parts = []
+    for m in msgs:
+        kind = getattr(m, "type", "")
+        # Anything carrying tool calls/results depends on live backend data
+        if kind not in ("system", "human", "ai") or getattr(m, "tool_calls", None):
+            return None
+        content = m.content if isinstance(m.content, str) else json.dumps(m.content, sort_keys=True)
+        parts.append([kind, " ".join(content.split())])
+    model_name = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    raw = json.dumps({
+        "messages": parts,
+        "locale": locale,
+        "model": str(model_name),
+        "tools": [getattr(t, "name", "") for t in _tool_registry()],
+        "tool_choice": mode,
+    }, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# Provider-side prompt cache effectiveness, from the usage reported per call
+_PROMPT_USAGE: Dict[str, int] = {"calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0}
+
+
+def _record_usage(res) -> None:
+    usage = getattr(res, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return
+    details = usage.get("input_token_details") or {}
+    _PROMPT_USAGE["calls"] += 1
+    _PROMPT_USAGE["input_tokens"] += int(usage.get("input_tokens") or 0)
+    _PROMPT_USAGE["cached_input_tokens"] += int(details.get("cache_read") or 0)
+    _PROMPT_USAGE["output_tokens"] += int(usage.get("output_tokens") or 0)
+
+
+def prompt_usage_stats() -> Dict:
+    total = _PROMPT_USAGE["input_tokens"]
+    ratio = round(_PROMPT_USAGE["cached_input_tokens"] / total, 4) if total else 0.0
+    return {**_PROMPT_USAGE, "cached_ratio": ratio}
+
+
+def _usage_attrs(res) -> Dict[str, int]:
+    usage = getattr(res, "usage_metadata", None)
+    if not isinstance(usage, dict):
+        return {}
+    return {
+        "input_tokens": int(usage.get("input_tokens") or 0),
+        "cached_input_tokens": int((usage.get("input_token_details") or {}).get("cache_read") or 0),
+        "output_tokens": int(usage.get("output_tokens") or 0),
+    }
+
+
+async def _call_model(model, mode: str, msgs, locale: str, emit: Emit = None, iteration: int = 0):
+    with tracing.span("llm.call", stage="agent", mode=mode, iteration=iteration, message_count=len(msgs)) as sp:
+        key = _llm_cache_key(msgs, locale, mode) if _LLM_CACHE is not None else None
+        if key is not None:
+            cached = _LLM_CACHE.get(key)
+            if cached is not None:
+                sp.set(cache_hit=True)
+                return cached
+        with metrics.MODEL_SECONDS.labels("agent").time():
+            res = await _stream_model(model, msgs, emit)
+        sp.set(tool_calls=len(getattr(res, "tool_calls", None) or []), **_usage_attrs(res))
+    _record_usage(res)
+    if key is not None and res is not None:
+        _LLM_CACHE.set(key, res)
+    return res
+
+
+# History windowing: system prompt + rolling summary + recent turns stay under
+# CHAT_CONTEXT_TOKEN_BUDGET tokens (0 disables)
+_CONTEXT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+_WINDOW = ConversationWindow(
+    budget=env_int("CHAT_CONTEXT_TOKEN_BUDGET", 3000),
+    min_recent=env_int("CHAT_CONTEXT_MIN_RECENT", 4),
+    counter=lambda text: count_tokens(text, _CONTEXT_MODEL),
+    max_sessions=env_int("CHAT_SUMMARY_CACHE_MAX_SESSIONS", 1000),
+)
+
+_SUMMARY_INSTRUCTIONS = (
+    "Summarize the earlier part of a B2B prospecting chat for the assistant's memory. "
+    "Keep targeting details (roles, locations, industries, keywords, companies), decisions, "
+    "leads already shared and open questions. Plain text, at most 120 words."
+)
+
+
+async def _summarize_history(previous: Optional[str], dropped) -> str:
+    from langchain.schema import HumanMessage, SystemMessage
+
+    turns = "\n".join(f"{m.role}: {m.content}" for m in dropped)
+    body = (f"Previous summary:\n{previous}\n\n" if previous else "") + f"New turns:\n{turns}"
+    try:
+        with tracing.span("llm.call", stage="summary", dropped_messages=len(dropped)) as sp, \
+                metrics.MODEL_SECONDS.labels("summary").time():
+            res = await asyncio.wait_for(
+                _invoke_model(llm, [SystemMessage(content=_SUMMARY_INSTRUCTIONS), HumanMessage(content=body)]),
+                timeout=deadline.clamp(None, _FINALIZE_RESERVE_SECONDS),
+            )
+            sp.set(**_usage_attrs(res))
+        _record_usage(res)
+        text = getattr(res, "content", "")
+        if isinstance(text, str) and text.strip():
+            return text.strip()
+    except Exception:
+        pass
+    return extractive_summary(previous, dropped)
+
+
+async def _invoke_tool(tool, args: Dict):
+    ainvoke = getattr(tool, "ainvoke", None)
+    if ainvoke is not None:
+        return await ainvoke(args)
+    return await run_in_threadpool(tool.invoke, args)
+
+
+_TOOL_TIMEOUT_SECONDS = env_float("TOOL_TIMEOUT_SECONDS", 20.0)
+# Budget kept back from the request deadline for the finalize call
+_FINALIZE_RESERVE_SECONDS = env_float("CHAT_DEADLINE_FINALIZE_RESERVE_SECONDS", 3.0)
+# chat_notify posts must land in the order the model emitted them, and
+# close_chat must only run once everything else in the turn has finished.
+_SERIAL_TOOLS = {"chat_notify"}
+_FINAL_TOOLS = {"close_chat"}
+
+
+def _parse_tool_call(call) -> tuple[Optional[str], Dict, str]:
+    # Tool call structure differs by SDK version; support dict/obj
+    name = call.get("name") if isinstance(call, dict) else getattr(call, "name", None)
+    args = call.get("args") if isinstance(call, dict) else getattr(call, "args", {})
+    call_id = call.get("id") if isinstance(call, dict) else getattr(call, "id", name or "tool")
+    return name, args or {}, call_id
+
+
+async def _execute_tool(tools, name: Optional[str], args: Dict, call_id: str = "", emit: Emit = None) -> str:
+    tool = next((t for t in tools if getattr(t, "name", None) == name), None)
+    if not tool:
+        return json.dumps({"error": "unknown_tool", "name": name})
+    if emit:
+        await emit("tool_start", {"name": name, "id": call_id})
+    started = time.monotonic()
+    # Leave the request deadline's finalize reserve untouched
+    timeout = deadline.clamp(_TOOL_TIMEOUT_SECONDS, _FINALIZE_RESERVE_SECONDS)
+    with tracing.span("tool", tool=name, call_id=call_id) as sp:
+        try:
+            result = await asyncio.wait_for(_invoke_tool(tool, args), timeout=timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "error", "message": "timeout", "timeout_seconds": round(timeout, 3)}
+        except Exception as e:
+            result = {"status": "error", "message": str(e)}
+        failed = isinstance(result, dict) and result.get("status") == "error"
+        sp.set(status="error" if failed else "ok")
+    metrics.TOOL_SECONDS.labels(name, "error" if failed else "ok").observe(time.monotonic() - started)
+    if emit:
+        await emit("tool_end", {
+            "name": name,
+            "id": call_id,
+            "status": result.get("status") if isinstance(result, dict) else None,
+            "duration_ms": int((time.monotonic() - started) * 1000),
+        })
+    try:
+        payload = json.dumps(result)
+    except Exception:
+        payload = json.dumps({"status": "error", "message": "unserializable tool result"})
+    return payload[:4000]
+
+
+async def _execute_tool_calls(tools, calls, emit: Emit = None) -> List[tuple[str, str]]:
+    parsed = [_parse_tool_call(c) for c in calls]
+    payloads: List[str] = [""] * len(parsed)
+
+    async def run(indices: List[int]) -> None:
+        for i in indices:
+            name, args, call_id = parsed[i]
+            payloads[i] = await _execute_tool(tools, name, args, call_id, emit)
+
+    serial = [i for i, (name, _, _) in enumerate(parsed) if name in _SERIAL_TOOLS]
+    final = [i for i, (name, _, _) in enumerate(parsed) if name in _FINAL_TOOLS]
+    independent = [i for i in range(len(parsed)) if i not in serial and i not in final]
+    await asyncio.gather(run(serial), *(run([i]) for i in independent))
+    await run(final)
+    return [(parsed[i][2], payloads[i]) for i in range(len(parsed))]
+
+
+# Deterministic fast path: yes/no to our own prompts, greetings and explicit
+# "close the chat" turns are answered without a model call.
+_FAST_PATH_ENABLED = env_bool("FAST_PATH_ENABLED", True)
+_FAST_PATH_HITS: Dict[str, int] = {}
+
+
+def _recent_filters(messages, locale: str) -> Dict[str, str]:
+    # Targeting from the latest user turn that carried any
+    for m in reversed(messages):
+        if m.role == 'user':
+            filters = extract_intent(m.content, locale).filters()
+            if filters:
+                return filters
+    return {}
+
+
+async def _fast_path_reply(req: ChatRequest, locale: str, emit: Emit = None) -> Optional[str]:
+    kind = classify_trivial_turn(req.messages)
+    if kind is None:
+        return None
+    tracing.current_span().set(fast_path=kind)
+    if kind == 'fetch_more':
+        filters = _recent_filters(req.messages[:-1], locale)
+        if not filters:
+            return None  # nothing to search for; let the model ask
+        payload = await _execute_tool(_make_tools(req.account_id, req.session_id, locale), "discover_leads", filters, "fast_path", emit)
+        try:
+            result = json.loads(payload)
+        except ValueError:
+            result = {}
+        if result.get("queued"):
+            reply = t('fetching_more', locale)
+        elif result.get("duplicate"):
+            reply = t('already_fetching', locale)
+        else:
+            return None  # not queued (backend down, breaker open): let the model explain
+    elif kind == 'close':
+        await _execute_tool(_make_tools(req.account_id, req.session_id, locale), "close_chat", {}, "fast_path", emit)
+        reply = t('closing', locale)
+    else:
+        reply = t('ask_start', locale)
+    _FAST_PATH_HITS[kind] = _FAST_PATH_HITS.get(kind, 0) + 1
+    return reply
+
+
+_BACKGROUND: set = set()
+
+
+async def _flush_writes_unbounded(pending: List[tuple]) -> None:
+    deadline.clear()
+    await _flush_writes(pending)
+
+
+async def _ai_orchestrate_reply(req: ChatRequest, locale: str, emit: Emit = None) -> str:
+    pending: List[tuple] = []
+    turn: Dict[str, int] = {"iterations": 0}
+    token = _turn_writes.set(pending)
+    state_token = _turn_state.set(turn)
+    try:
+        if llm is not None and _FAST_PATH_ENABLED:
+            reply = await _fast_path_reply(req, locale, emit)
+            if reply is not None:
+                return reply
+        reply = await _run_agent(req, locale, emit, turn)
+        return _with_prompt(reply, turn.get("prompt"), locale)
+    finally:
+        _turn_writes.reset(token)
+        _turn_state.reset(state_token)
+        if turn["iterations"]:
+            metrics.AGENT_ITERATIONS.observe(turn["iterations"])
+        # Before the reply is returned, so notifications land ahead of it in the chat
+        left = deadline.remaining()
+        delivered: Optional[List[tuple]] = []
+        if not pending or left is None:
+            delivered = await _flush_writes(pending)
+        else:
+            # Writes are never dropped, but the reply does not wait past the deadline for them
+            task = asyncio.ensure_future(_flush_writes_unbounded(pending))
+            _BACKGROUND.add(task)
+            task.add_done_callback(_BACKGROUND.discard)
+            done, _ = await asyncio.wait({task}, timeout=left)
+            delivered = task.result() if done and not task.exception() else None
+        _record_notifications(req, delivered)
+
+
+def _with_prompt(reply: str, key: Optional[str], locale: str) -> str:
+    """End the reply with our own prompt, worded exactly as the fast path expects.
+
+    A reply that already ends with a question of its own is left alone: a
+    yes/no to two questions at once is not ours to answer.
+    """
+    if not key:
+        return reply
+    prompt = t(key, locale)
+    if reply.rstrip().endswith((prompt, "?")):
+        return reply
+    return f"{reply.rstrip()}\n\n{prompt}" if reply.strip() else prompt
+
+
+def _record_notifications(req: ChatRequest, delivered: Optional[List[tuple]]) -> None:
+    """Keep the session history in step with the chat, which now holds our notifications."""
+    if delivered is None:
+        # Still flushing: they will land after the reply, so the stored history
+        # cannot match; the next delta turn gets a 409 and re-sends it in full
+        _SESSIONS.forget(req.session_id)
+        return
+    notes = [
+        Message(role="assistant", content=str(payload.get("content")))
+        for path, payload in delivered or []
+        if path == "/api/v1/internal/chat_notify" and payload.get("content")
     ]
+    if notes:
+        _SESSIONS.append(req.session_id, req.account_id, notes)
 
 
-def _ai_orchestrate_reply(req: ChatRequest, locale: str) -> str:
+async def _run_agent(req: ChatRequest, locale: str, emit: Emit = None, turn: Optional[Dict[str, int]] = None) -> str:
+    turn = turn if turn is not None else {}
     if llm is None:
         raise HTTPException(status_code=503, detail={"error": "llm_unavailable"})
 
@@ -328,64 +1055,64 @@ def _ai_orchestrate_reply(req: ChatRequest, locale: str) -> str:
     from langchain.schema import HumanMessage, SystemMessage, AIMessage
     from langchain_core.messages import ToolMessage
 
-    msgs = [SystemMessage(content=system_prompt(locale))]
-    for m in req.messages:
+    sys_text = system_prompt(locale)
+    summary, recent = await _WINDOW.apply(req.session_id, sys_text, req.messages, _summarize_history)
+    msgs = [SystemMessage(content=sys_text)]
+    if summary:
+        msgs.append(SystemMessage(content="Summary of the earlier conversation:\n" + summary))
+    for m in recent:
         if m.role == 'user':
             msgs.append(HumanMessage(content=m.content))
         elif m.role == 'assistant':
             msgs.append(AIMessage(content=m.content))
-        else:
-            # ignore other roles
-            pass
 
     tools = _make_tools(req.account_id, req.session_id, locale)
     # If user provided obvious targeting signals, require at least one tool call
     last_user = next((m.content for m in req.messages[::-1] if m.role == 'user'), "")
-    lower = (last_user or '').lower()
-    require_tool = any(k in lower for k in [
-        'cto', 'chief technology officer', 'vp engineering', 'role:', 'location:', 'keywords:',
-        'saas', 'ai', 'find', 'search', 'target', 'united states', 'india', 'uk'
-    ])
+    intent = extract_intent(last_user, locale)
+    require_tool = intent.require_tool
+    mode = "required" if require_tool else "auto"
     try:
-        if require_tool:
-            try:
-                model = llm.bind_tools(tools, tool_choice="required")
-            except Exception:
-                model = llm.bind_tools(tools)
-        else:
-            model = llm.bind_tools(tools)
+        model = _bound_model(mode)
     except Exception as e:
         raise HTTPException(status_code=503, detail={"error": "llm_bind_failed", "message": str(e)[:200]})
 
-    # Store last user free text as profile context
+    # Store last user free text as profile context (off the reply path when the worker runs)
     try:
         last_user = next((m.content for m in req.messages[::-1] if m.role == 'user'), "")
         if last_user:
-            _post_internal(
-                "/api/v1/internal/profile_update",
-                {"account_id": req.account_id, "profile": {"questionnaire": {"free_text": last_user}}},
-            )
+            payload = {"account_id": req.account_id, "profile": {"questionnaire": {"free_text": last_user}}}
+            if not _PROFILE_WRITES.submit(req.account_id, "/api/v1/internal/profile_update", payload):
+                await _post_write("/api/v1/internal/profile_update", payload)
     except Exception:
         pass
 
     # Agent loop (no heuristic fallbacks)
     for i in range(6):
+        left = deadline.remaining(_FINALIZE_RESERVE_SECONDS)
+        if left == 0.0:
+            # Not enough budget for another round trip: conclude with what we have
+            metrics.DEADLINE_CUTOFFS.labels("loop").inc()
+            break
+        turn["iterations"] = i + 1
         try:
-            res = model.invoke(msgs)
+            res = await asyncio.wait_for(_call_model(model, mode, msgs, locale, emit, iteration=i + 1), timeout=left)
+        except asyncio.TimeoutError:
+            if left is None:
+                raise HTTPException(status_code=503, detail={"error": "llm_invoke_failed", "message": "timeout"})
+            metrics.DEADLINE_CUTOFFS.labels("model").inc()
+            break
         except Exception as e:
             raise HTTPException(status_code=503, detail={"error": "llm_invoke_failed", "message": str(e)[:200]})
         if not getattr(res, "tool_calls", None):
             # If user supplied targeting and still no tools on first pass, run a server-side assist
             if i == 0 and require_tool:
                 # infer filters and run preview → discover → notify
-                filters = _infer_filters(last_user)
+                filters = intent.filters()
                 if not filters.get('keywords'):
                     filters['keywords'] = 'saas'
                 # preview
-                ok, _, data = _post_internal_json(
-                    "/api/v1/internal/db_preview_leads",
-                    {"account_id": req.account_id, "filters": filters, "limit": 5},
-                )
+                ok, _, data = await _db_preview(req.account_id, filters, 5)
                 if ok and isinstance(data, dict) and data.get('total') and data.get('results'):
                     # Post bullets
                     results = data.get('results')
@@ -393,86 +1120,187 @@ def _ai_orchestrate_reply(req: ChatRequest, locale: str) -> str:
                     for r in (results or [])[:5]:
                         name = ((str(r.get('first_name') or '') + ' ' + str(r.get('last_name') or '')).strip()) or '(No name)'
                         bullets.append(f"- {name} — {r.get('company') or ''} — {r.get('email') or ''}")
-                    _post_internal(
+                    await _post_write(
                         "/api/v1/internal/chat_notify",
                         {"account_id": req.account_id, "chat_session_id": req.session_id, "content": t('db_preview_intro', locale) + "\n" + "\n".join(bullets)},
                     )
+                    metrics.SERVER_ASSIST.labels("preview").inc()
                     return "Shared a quick preview above. Want me to fetch more?"
                 # discover
-                queued, duplicate, _, body = _queue_discovery_once(req.account_id, req.session_id, filters)
+                queued, duplicate, _, body = await _queue_discovery_once(req.account_id, req.session_id, filters)
                 sample = body.get('sample') if isinstance(body, dict) else None
                 if isinstance(sample, list) and sample:
                     bullets = []
                     for r in sample[:5]:
                         name = ((str(r.get('first_name') or '') + ' ' + str(r.get('last_name') or '')).strip()) or '(No name)'
                         bullets.append(f"- {name} — {r.get('company') or ''} — {r.get('email') or ''}")
-                    _post_internal(
+                    await _post_write(
                         "/api/v1/internal/chat_notify",
                         {"account_id": req.account_id, "chat_session_id": req.session_id, "content": "New leads found:\n" + "\n".join(bullets)},
                     )
+                    metrics.SERVER_ASSIST.labels("discover").inc()
                     return "I posted a few new leads above. Should I fetch more or refine?"
                 # As a last resort, directly fetch from Apollo (sync) to surface something fast
-                ok, _, body = _post_internal_json(
+                ok, _, body = await _post_internal_json(
                     "/api/v1/internal/apollo_fetch",
                     {"account_id": req.account_id, "filters": filters, "sync": True},
                 )
+                if ok:
+                    _invalidate_db_preview(req.account_id)
                 if ok and isinstance(body, dict) and isinstance(body.get('sample'), list) and body.get('sample'):
                     bullets = []
                     for r in body.get('sample')[:5]:
                         name = ((str(r.get('first_name') or '') + ' ' + str(r.get('last_name') or '')).strip()) or '(No name)'
                         bullets.append(f"- {name} — {r.get('company') or ''} — {r.get('email') or ''}")
-                    _post_internal(
+                    await _post_write(
                         "/api/v1/internal/chat_notify",
                         {"account_id": req.account_id, "chat_session_id": req.session_id, "content": "New leads found:\n" + "\n".join(bullets)},
                     )
+                    metrics.SERVER_ASSIST.labels("apollo").inc()
                     return "Shared a few Apollo leads above. Want me to keep going or refine filters?"
+                metrics.SERVER_ASSIST.labels("none").inc()
             # If tools are required and still no calls, try to force tool-choice up to twice
             if require_tool and i < 2:
                 try:
-                    model = llm.bind_tools(tools, tool_choice="required")
+                    model = _bound_model("required")
+                    mode = "required"
+                    metrics.TOOL_CHOICE_RETRIES.inc()
                     continue
                 except Exception:
                     pass
             return getattr(res, "content", "")
         # Append assistant with tool_calls
         msgs.append(res)
-        # Execute tools
-        for call in res.tool_calls:
-            # Tool call structure differs by SDK version; support dict/obj
-            name = call.get("name") if isinstance(call, dict) else getattr(call, "name", None)
-            args = call.get("args") if isinstance(call, dict) else getattr(call, "args", {})
-            call_id = call.get("id") if isinstance(call, dict) else getattr(call, "id", name or "tool")
-            tool = next((t for t in tools if getattr(t, "name", None) == name), None)
-            if not tool:
-                msgs.append(ToolMessage(content=json.dumps({"error": "unknown_tool", "name": name}), tool_call_id=call_id))
-                continue
-            try:
-                result = tool.invoke(args or {})
-            except Exception as e:
-                result = {"status": "error", "message": str(e)}
-            try:
-                payload = json.dumps(result)
-            except Exception:
-                payload = json.dumps({"status": "error", "message": "unserializable tool result"})
-            msgs.append(ToolMessage(content=payload[:4000], tool_call_id=call_id))
-    # If we reach here, model failed to conclude. Make one last plain-LLM
-    # attempt instructing it to finalize without tools.
+        # Execute tools (independent calls run concurrently; results keep call order)
+        for call_id, payload in await _execute_tool_calls(tools, res.tool_calls, emit):
+            msgs.append(ToolMessage(content=payload, tool_call_id=call_id))
+    # If we reach here, model failed to conclude (or the deadline is near). Make
+    # one last plain-LLM attempt instructing it to finalize without tools.
     try:
         from langchain.schema import SystemMessage
         finalize_msgs = msgs + [SystemMessage(content="Conclude now with a concise assistant message. Do not call tools.")]
-        res = llm.invoke(finalize_msgs)
+        with tracing.span("llm.call", stage="finalize", message_count=len(finalize_msgs)) as sp, \
+                metrics.MODEL_SECONDS.labels("finalize").time():
+            res = await asyncio.wait_for(_stream_model(llm, finalize_msgs, emit), timeout=deadline.remaining())
+            sp.set(**_usage_attrs(res))
         # If the model still tries to call tools, or returns empty content,
         # provide a minimal assistant conclusion to avoid surfacing an error.
         content = getattr(res, "content", "")
         if content and not getattr(res, "tool_calls", None):
             return content
         return "I’ll share a sample of leads here shortly."
+    except asyncio.TimeoutError:
+        metrics.DEADLINE_CUTOFFS.labels("finalize").inc()
+        return "I’ll share a sample of leads here shortly."
     except Exception:
         return "I’ll share a sample of leads here shortly."
 
 
+# Server-side session history so callers can send only new messages
+_SESSIONS = SessionStore(
+    max_sessions=env_int("CHAT_SESSION_MAX", 2000),
+    ttl=env_float("CHAT_SESSION_TTL_SECONDS", 3600.0),
+    max_messages=env_int("CHAT_HISTORY_MAX_MESSAGES", 200),
+)
+
+
+def _resolve_history(req: ChatRequest) -> ChatRequest:
+    resolved = _SESSIONS.resolve(req.session_id, req.account_id, req.messages, req.base_seq)
+    if resolved is None:
+        # Unknown or stale session state (e.g. after a restart): caller re-sends full history
+        raise HTTPException(status_code=409, detail={"error": "history_required", "session_id": req.session_id})
+    return req.model_copy(update={"messages": resolved[0]})
+
+
+def _request_span(req: ChatRequest, endpoint: str):
+    return tracing.span(
+        "chat.request", root=True, endpoint=endpoint, account_id=req.account_id,
+        session_id=req.session_id, message_count=len(req.messages), delta=req.base_seq is not None,
+    )
+
+
 @router.post("/messages", response_model=ChatResponse)
-async def chat_messages(req: ChatRequest, request: Request) -> ChatResponse:
+async def chat_messages(req: ChatRequest, request: Request, response: Response) -> ChatResponse:
     locale = normalize_locale(request.headers.get('accept-language'))
-    reply = _ai_orchestrate_reply(req, locale)
-    return ChatResponse(reply=reply, session_id=req.session_id)
+    req = _resolve_history(req)
+    budget = deadline.budget(request.headers.get(deadline.HEADER))
+    started, outcome = time.monotonic(), "error"
+    try:
+        with _request_span(req, "messages") as sp, deadline.scope(budget):
+            if sp.trace_id:
+                response.headers["X-Trace-Id"] = sp.trace_id
+            reply = await _ai_orchestrate_reply(req, locale)
+        outcome = "ok"
+    finally:
+        metrics.REQUEST_SECONDS.labels("messages", outcome).observe(time.monotonic() - started)
+    seq = _SESSIONS.record_reply(req.session_id, req.account_id, reply)
+    return ChatResponse(reply=reply, session_id=req.session_id, seq=seq)
+
+
+def _sse(event: str, data: Dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/messages/stream")
+async def chat_messages_stream(req: ChatRequest, request: Request) -> StreamingResponse:
+    """Same agent loop as /messages, streamed as Server-Sent Events.
+
+    Events: ``tool_start``/``tool_end`` around each tool call, ``token`` for
+    incremental reply text, then ``done`` with the full reply (or ``error``).
+    """
+    if llm is None:
+        raise HTTPException(status_code=503, detail={"error": "llm_unavailable"})
+    locale = normalize_locale(request.headers.get('accept-language'))
+    req = _resolve_history(req)
+    budget = deadline.budget(request.headers.get(deadline.HEADER))
+    queue: asyncio.Queue = asyncio.Queue()
+    streamed: List[str] = []
+
+    async def emit(event: str, data: Dict) -> None:
+        if event == "token":
+            streamed.append(data.get("text", ""))
+        elif event == "tool_start":
+            # Text seen before a tool call was not the final answer
+            streamed.clear()
+        await queue.put((event, data))
+
+    async def run() -> None:
+        started, outcome = time.monotonic(), "error"
+        try:
+            with _request_span(req, "stream"), deadline.scope(budget):
+                reply = await _ai_orchestrate_reply(req, locale, emit=emit)
+            outcome = "ok"
+            # Canned replies (server assist, non-streaming models) arrive whole;
+            # a prompt appended after streaming arrives as the remaining text
+            text = "".join(streamed)
+            if reply and not text:
+                await queue.put(("token", {"text": reply}))
+            elif len(reply) > len(text) and reply.startswith(text):
+                await queue.put(("token", {"text": reply[len(text):]}))
+            seq = _SESSIONS.record_reply(req.session_id, req.account_id, reply)
+            await queue.put(("done", {"reply": reply, "session_id": req.session_id, "seq": seq}))
+        except HTTPException as e:
+            await queue.put(("error", {"status": e.status_code, "detail": e.detail}))
+        except Exception as e:
+            await queue.put(("error", {"status": 500, "detail": {"error": "internal", "message": str(e)[:200]}}))
+        finally:
+            metrics.REQUEST_SECONDS.labels("stream", outcome).observe(time.monotonic() - started)
+            await queue.put(None)
+
+    async def events():
+        task = asyncio.create_task(run())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield _sse(*item)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
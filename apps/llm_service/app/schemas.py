@@ -12,9 +12,42 @@ class ChatRequest(BaseModel):
     account_id: int
     user_id: Optional[int] = None
     messages: List[Message] = Field(default_factory=list)
+    # Delta mode: messages holds only the new turns and base_seq is the seq from the previous reply
+    base_seq: Optional[int] = Field(default=None, ge=0)
 
 
 class ChatResponse(BaseModel):
     reply: str
     session_id: str
+    seq: Optional[int] = None
 
+
+
+# Tool argument schemas (shared by every request; see routes_chat._tool_registry)
+
+class Filters(BaseModel):
+    keywords: Optional[str] = Field(default=None)
+    role: Optional[str] = Field(default=None)
+    location: Optional[str] = Field(default=None)
+
+
+class PreviewInput(Filters):
+    limit: int = Field(default=5, ge=1, le=10)
+
+
+class DiscoverInput(Filters):
+    pass
+
+
+class NotifyInput(BaseModel):
+    content: str
+
+
+class ProfileInput(BaseModel):
+    free_text: str
+
+
+class PackInput(BaseModel):
+    lead_ids: Optional[List[int]] = Field(default=None, description="IDs of leads to include")
+    filters: Optional[Filters] = Field(default=None, description="Filters to select leads")
+    name: Optional[str] = Field(default=None, description="Optional pack name")
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+from .cache import TTLCache
+from .schemas import Message
+
+
+# Per-session history for delta requests ---------------------------------------
+#
+# A full request (base_seq is None) seeds the session with the messages it
+# carries. A delta request sends only the new messages plus the seq returned
+# by the previous reply; if the service no longer has that exact state
+# (restart, eviction, concurrent turn) resolve() returns None and the caller
+# re-sends the full history. Messages the service posts into the chat itself
+# (chat_notify) are appended too, since the caller's history includes them.
+
+@dataclass(frozen=True)
+class _Session:
+    account_id: int
+    seq: int
+    messages: Tuple[Message, ...]
+
+
+class SessionStore:
+    def __init__(self, max_sessions: int = 2000, ttl: float = 3600.0, max_messages: int = 200):
+        self._cache = TTLCache(maxsize=max_sessions, ttl=ttl)
+        self.max_messages = max(1, max_messages)
+
+    def _put(self, session_id: str, account_id: int, seq: int, messages: Sequence[Message]) -> None:
+        if len(messages) > self.max_messages:
+            # Trim in chunks so the retained prefix (and any summary built on it) stays stable for a while
+            messages = messages[-max(1, self.max_messages * 3 // 4):]
+        self._cache.set(session_id, _Session(account_id, seq, tuple(messages)))
+
+    def resolve(
+        self, session_id: str, account_id: int, messages: Sequence[Message], base_seq: Optional[int]
+    ) -> Optional[Tuple[List[Message], int]]:
+        current = self._cache.get(session_id)
+        if current is not None and current.account_id != account_id:
+            current = None
+        if base_seq is None:
+            history = list(messages)
+            seq = (current.seq if current else 0) + len(messages)
+        elif current is None or current.seq != base_seq:
+            return None
+        else:
+            history = [*current.messages, *messages]
+            seq = base_seq + len(messages)
+        self._put(session_id, account_id, seq, history)
+        return history, seq
+
+    def append(self, session_id: str, account_id: int, messages: Sequence[Message]) -> Optional[int]:
+        """Add messages the service itself put in the chat (notifications, the reply)."""
+        current = self._cache.get(session_id, count=False)
+        if current is None or current.account_id != account_id:
+            return None
+        seq = current.seq + len(messages)
+        self._put(session_id, account_id, seq, [*current.messages, *messages])
+        return seq
+
+    def record_reply(self, session_id: str, account_id: int, reply: str) -> Optional[int]:
+        return self.append(session_id, account_id, [Message(role="assistant", content=reply)])
+
+    def forget(self, session_id: str) -> None:
+        self._cache.pop(session_id)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        return {"max_messages": self.max_messages, **self._cache.stats()}
@@ -0,0 +1,169 @@
+import json
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from .env import env_float
+
+
+# Per-request trace spans with a local JSONL exporter --------------------------
+#
+# TRACE_EXPORT_PATH enables tracing; each finished request appends one line per
+# span (OTLP-like field names) once its root span ends, written by a background
+# thread. Child spans pick up their parent from a ContextVar, so tasks spawned
+# inside a span (concurrent tool calls) nest correctly. With tracing off, span()
+# yields a no-op.
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status", "_trace")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], trace: List["Span"], attributes: Dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+        self._trace = trace
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_ns,
+            "end_time_unix_nano": self.end_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+class JsonlExporter:
+    """Appends finished traces to ``path`` from a daemon writer thread.
+
+    ``export`` runs on the event loop when a root span ends, so it only
+    serialises and enqueues; file I/O happens off-loop. A full queue drops the
+    trace rather than stalling the request.
+    """
+
+    def __init__(self, path: str, max_pending: int = 1000):
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[str]" = queue.Queue(maxsize=max(1, max_pending))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self, spans: List[Span]) -> None:
+        lines = "".join(json.dumps(s.to_dict(), default=str) + "\n" for s in spans)
+        try:
+            self._queue.put_nowait(lines)
+        except queue.Full:
+            self.dropped += 1
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def flush(self) -> None:
+        """Block until every queued trace has been written."""
+        self._queue.join()
+
+    def _run(self) -> None:
+        while True:
+            lines = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError:
+                pass
+            finally:
+                self._queue.task_done()
+
+
+_exporter: Optional[JsonlExporter] = None
+_sample_rate = 1.0
+
+
+def configure(path: Optional[str] = None, sample_rate: Optional[float] = None) -> None:
+    global _exporter, _sample_rate
+    path = os.getenv("TRACE_EXPORT_PATH") if path is None else path
+    _exporter = JsonlExporter(path) if path else None
+    _sample_rate = env_float("TRACE_SAMPLE_RATE", 1.0) if sample_rate is None else sample_rate
+
+
+def flush() -> None:
+    """Wait for queued traces to reach disk (tests, shutdown)."""
+    if _exporter is not None:
+        _exporter.flush()
+
+
+def current_span():
+    return _current.get() or NOOP_SPAN
+
+
+@contextmanager
+def span(name: str, root: bool = False, **attributes: Any) -> Iterator[Any]:
+    """Open a span under the current one; ``root=True`` starts a new trace.
+
+    Outside a recorded trace (tracing off, sampled out, background work) this
+    is a no-op.
+    """
+    parent = _current.get()
+    if root:
+        if _exporter is None or random.random() >= _sample_rate:
+            # Mark the context so nested spans stay no-ops too
+            token = _current.set(NOOP_SPAN)
+            try:
+                yield NOOP_SPAN
+            finally:
+                _current.reset(token)
+            return
+        s = Span(name, os.urandom(16).hex(), None, [], attributes)
+        parent = None
+    elif isinstance(parent, Span):
+        s = Span(name, parent.trace_id, parent.span_id, parent._trace, attributes)
+    else:
+        yield NOOP_SPAN
+        return
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.attributes.setdefault("error", f"{type(e).__name__}: {e}"[:200])
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        s._trace.append(s)
+        exporter = _exporter
+        if parent is None and exporter is not None:
+            exporter.export(s._trace)
+
+
+configure()
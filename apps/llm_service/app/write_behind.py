@@ -0,0 +1,98 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+
+Sender = Callable[[List[tuple]], Awaitable[None]]
+
+
+class WriteBehind:
+    """Bounded, coalescing write-behind buffer drained by a background task.
+
+    ``submit(key, path, payload)`` replaces any pending write for the same key,
+    so within one flush window only the latest value per key is sent. Every
+    ``flush_interval`` seconds the pending writes go to ``send`` as a list of
+    ``(path, payload)``. ``stop()`` lets an in-flight send finish, then drains
+    what is left. When the buffer is full
+    the oldest pending write is dropped.
+    """
+
+    def __init__(self, send: Sender, max_pending: int = 1000, flush_interval: float = 1.0):
+        self._send = send
+        self.max_pending = max(1, max_pending)
+        self.flush_interval = flush_interval
+        self._pending: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self.submitted = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.errors = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def submit(self, key: Hashable, path: str, payload: Dict) -> bool:
+        # Not running (no lifespan, e.g. scripts/tests): caller sends it itself
+        if not self.running:
+            return False
+        self.submitted += 1
+        if key in self._pending:
+            self.coalesced += 1
+            del self._pending[key]
+        elif len(self._pending) >= self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._pending[key] = (path, payload)
+        return True
+
+    def discard(self, key: Hashable) -> None:
+        self._pending.pop(key, None)
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch = list(self._pending.values())
+        self._pending.clear()
+        try:
+            await self._send(batch)
+            self.flushed += len(batch)
+        except Exception:
+            self.errors += 1
+
+    async def _run(self, stopping: asyncio.Event) -> None:
+        while not stopping.is_set():
+            try:
+                await asyncio.wait_for(stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self) -> None:
+        if not self.running:
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self._run(self._stopping))
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            # Not cancelled: a batch already taken off _pending must reach _send
+            self._stopping.set()
+            try:
+                await task
+            except Exception:
+                pass
+        await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "pending": len(self._pending),
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "flushed": self.flushed,
+            "errors": self.errors,
+        }
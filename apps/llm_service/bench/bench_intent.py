@@ -0,0 +1,52 @@
+"""Micro-benchmark: substring-scan intent/filter inference vs. the compiled matcher.
+
+Run from apps/llm_service:  python -m bench.bench_intent [iterations]
+"""
+import sys
+import timeit
+
+from app.intent import IntentMatcher, extract_intent
+
+
+def legacy(text: str):
+    # The pre-matcher code: one `in` scan per keyword for filters, another for require_tool
+    t = (text or "").lower()
+    role = 'CTO' if ('cto' in t or 'chief technology officer' in t or 'vp engineering' in t) else None
+    location = 'United States' if ('united states' in t or ' us' in t or 'usa' in t) else None
+    keywords = [k for k in ['saas', 'ai', 'cloud', 'automation', 'ml', 'machine learning', 'devops', 'security', 'data']
+                if k in t]
+    require_tool = any(k in t for k in [
+        'cto', 'chief technology officer', 'vp engineering', 'role:', 'location:', 'keywords:',
+        'saas', 'ai', 'find', 'search', 'target', 'united states', 'india', 'uk'
+    ])
+    return role, location, keywords, require_tool
+
+
+MESSAGES = [
+    "yes",
+    "Find CTOs in the United States for SaaS and AI companies",
+    "He said the duke would send the data later",
+    "Could you look for VP Engineering leaders at cloud security startups in India? " * 4,
+]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    extract_intent("warm")
+    for msg in MESSAGES:
+        before = min(timeit.repeat(lambda: legacy(msg), number=n, repeat=3)) / n
+        after = min(timeit.repeat(lambda: extract_intent(msg), number=n, repeat=3)) / n
+        label = (msg[:40] + "...") if len(msg) > 40 else msg
+        print(f"{label:<44} legacy {before * 1e6:7.2f} us   matcher {after * 1e6:7.2f} us")
+
+    # Substring scans grow with the vocabulary; the matcher does not
+    terms = [f"term{i}" for i in range(300)] + ["saas", "ai", "cloud"]
+    big = IntentMatcher({"keyword": terms})
+    msg = MESSAGES[1]
+    before = min(timeit.repeat(lambda: [k for k in terms if k in msg.lower()], number=n // 10, repeat=3)) / (n // 10)
+    after = min(timeit.repeat(lambda: big.extract(msg), number=n // 10, repeat=3)) / (n // 10)
+    print(f"{'303-term vocabulary':<44} legacy {before * 1e6:7.2f} us   matcher {after * 1e6:7.2f} us")
+
+
+if __name__ == "__main__":
+    main()
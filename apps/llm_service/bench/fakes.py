@@ -0,0 +1,142 @@
+"""Offline stand-ins for the chat model and the Rails internal API.
+
+Used by bench.loadtest; nothing here touches the network beyond localhost.
+
+ScriptedChatModel replays a fixed script per user turn (tool calls, then a
+final answer) after a configurable latency, so runs are repeatable and the
+numbers measure this service rather than a vendor. fake_backend() is a small
+FastAPI app serving the /api/v1/internal/* endpoints the service calls.
+"""
+import asyncio
+import zlib
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from langchain.schema import AIMessage, HumanMessage
+
+
+# One user turn: preview the DB, queue discovery, then answer
+DEFAULT_SCRIPT: List[Dict] = [
+    {"tool_calls": [{"name": "db_preview_leads", "args": {"role": "CTO", "location": "United States", "keywords": "saas"}}]},
+    {"tool_calls": [{"name": "discover_leads", "args": {"role": "CTO", "location": "United States", "keywords": "saas"}}]},
+    {"content": "I posted a few leads above and queued more. Want me to refine the search?"},
+]
+
+
+def _approx_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+class ScriptedChatModel:
+    """Deterministic chat model: step N of the script answers the Nth model call of a turn.
+
+    ``latency`` seconds are spent per call; ``jitter`` adds up to that many
+    seconds more, derived from the conversation text so a given request always
+    waits the same time regardless of scheduling.
+    """
+
+    model_name = "scripted-bench"
+
+    def __init__(self, script: Optional[Sequence[Dict]] = None, latency: float = 0.05, jitter: float = 0.0):
+        self.script = list(script or DEFAULT_SCRIPT)
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+
+    def bind_tools(self, tools, tool_choice=None):
+        return self
+
+    def _step(self, msgs) -> int:
+        step = 0
+        for m in reversed(msgs):
+            if isinstance(m, HumanMessage):
+                break
+            if isinstance(m, AIMessage):
+                step += 1
+        return min(step, len(self.script) - 1)
+
+    def _delay(self, msgs, step: int) -> float:
+        if self.jitter <= 0:
+            return self.latency
+        seed = zlib.crc32(f"{step}:{msgs[-1].content if msgs else ''}".encode())
+        return self.latency + self.jitter * (seed % 1000) / 1000
+
+    async def ainvoke(self, msgs):
+        self.calls += 1
+        step = self._step(msgs)
+        await asyncio.sleep(self._delay(msgs, step))
+        entry = self.script[step]
+        tool_calls = [
+            {"name": c["name"], "args": dict(c.get("args") or {}), "id": f"call_{step}_{i}"}
+            for i, c in enumerate(entry.get("tool_calls") or [])
+        ]
+        content = entry.get("content", "")
+        input_tokens = sum(_approx_tokens(str(m.content)) for m in msgs)
+        output_tokens = _approx_tokens(content) + 20 * len(tool_calls)
+        return AIMessage(
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+
+# Fake Rails internal API --------------------------------------------------------
+
+_SAMPLE = [
+    {"first_name": "Ada", "last_name": "Lovelace", "company": "Analytical", "email": "ada@example.com"},
+    {"first_name": "Grace", "last_name": "Hopper", "company": "Cobol Labs", "email": "grace@example.com"},
+    {"first_name": "Alan", "last_name": "Turing", "company": "Enigma", "email": "alan@example.com"},
+]
+
+
+def fake_backend(latency: float = 0.005, token: str = "bench-token") -> FastAPI:
+    """Build the stand-in app; every endpoint waits ``latency`` seconds."""
+    app = FastAPI()
+    app.state.calls = {}
+
+    async def handle(request: Request, body: Dict):
+        if request.headers.get("X-Internal-Token") != token:
+            return JSONResponse({"error": "forbidden"}, status_code=403)
+        path = request.url.path.rsplit("/", 1)[-1]
+        app.state.calls[path] = app.state.calls.get(path, 0) + 1
+        await asyncio.sleep(latency)
+        return body
+
+    @app.get("/up")
+    async def up():
+        return {"status": "ok"}
+
+    @app.post("/api/v1/internal/db_preview_leads")
+    async def db_preview_leads(request: Request):
+        return await handle(request, {"total": len(_SAMPLE), "results": _SAMPLE})
+
+    @app.post("/api/v1/internal/discover_leads")
+    async def discover_leads(request: Request):
+        return await handle(request, {"queued": True, "sample": _SAMPLE[:2]})
+
+    @app.post("/api/v1/internal/apollo_fetch")
+    async def apollo_fetch(request: Request):
+        return await handle(request, {"sample": _SAMPLE[:2]})
+
+    @app.post("/api/v1/internal/lead_packs")
+    async def lead_packs(request: Request):
+        return await handle(request, {"lead_pack": {"id": 1, "name": "Bench pack"}})
+
+    @app.post("/api/v1/internal/batch")
+    async def batch(request: Request):
+        ops = (await request.json()).get("operations") or []
+        return await handle(request, {"results": [{"op": o.get("op"), "status": "ok"} for o in ops]})
+
+    for name in ("chat_notify", "profile_update", "close_chat"):
+        async def write(request: Request):
+            return await handle(request, {"ok": True})
+
+        app.add_api_route(f"/api/v1/internal/{name}", write, methods=["POST"], name=name)
+
+    return app
+
@@ -0,0 +1,206 @@
+"""Load test: /chat/messages at rising concurrency against offline fakes.
+
+Run from apps/llm_service:  python -m bench.loadtest [options]
+
+The service runs in-process (with its lifespan) and is driven through an ASGI
+transport; the chat model is bench.fakes.ScriptedChatModel and the Rails
+internal API is bench.fakes.fake_backend() served by uvicorn on localhost, so
+backend calls go through the real connection pool. --cassette replays recorded
+production traffic (LLM_CASSETTE_MODE=record) instead of the scripted model. Each level sends
+--requests turns with at most N in flight and reports RPS and p50/p95/p99.
+
+The run exits non-zero when any level regresses past the stored baseline by
+more than --tolerance (RPS down, p50/p95 up) or when a request fails.
+--update-baseline records the current numbers instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from typing import Dict, List
+
+_TOKEN = "bench-token"
+_BASELINE = os.path.join(os.path.dirname(__file__), "loadtest_baseline.json")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _start_backend(latency: float) -> tuple:
+    import uvicorn
+
+    from .fakes import fake_backend
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(fake_backend(latency, _TOKEN), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise SystemExit("fake backend did not start")
+        time.sleep(0.01)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def _run_level(client, concurrency: int, total: int, offset: int) -> Dict:
+    sem = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        payload = {
+            "session_id": f"bench-{offset + i}",
+            "account_id": 1 + (offset + i) % 50,
+            "messages": [{"role": "user", "content": "Find CTOs in the United States at SaaS companies"}],
+        }
+        async with sem:
+            started = time.perf_counter()
+            try:
+                r = await client.post("/chat/messages", json=payload)
+                ok = r.status_code == 200
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += 0 if ok else 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    wall = time.perf_counter() - started
+    return {
+        "requests": total,
+        "errors": errors,
+        "rps": round(total / wall, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def _run(args) -> Dict[str, Dict]:
+    import httpx
+
+    from app import routes_chat as rc
+    from app.main import app
+
+    from .fakes import ScriptedChatModel
+
+    if args.cassette:
+        from app.cassette import Cassette, CassetteModel
+
+        rc.llm = CassetteModel(None, Cassette(args.cassette), "replay", args.replay_timing)
+    else:
+        rc.llm = ScriptedChatModel(latency=args.model_latency, jitter=args.model_jitter)
+    results: Dict[str, Dict] = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://llm-service", timeout=60) as client:
+            await _run_level(client, 1, 5, -5)  # warm up pool, tool specs, tokenizer
+            offset = 0
+            for level in args.levels:
+                results[str(level)] = await _run_level(client, level, args.requests, offset)
+                offset += args.requests
+    return results
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Return one line per metric that regressed past ``tolerance`` (a fraction)."""
+    problems = []
+    for level, cur in results.items():
+        if cur.get("errors"):
+            problems.append(f"c={level}: {cur['errors']} failed requests")
+        base = baseline.get(level)
+        if not base:
+            continue
+        if cur["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"c={level}: rps {cur['rps']} < baseline {base['rps']}")
+        for key in ("p50_ms", "p95_ms"):
+            if cur[key] > base[key] * (1 + tolerance):
+                problems.append(f"c={level}: {key} {cur[key]} > baseline {base[key]}")
+    return problems
+
+
+def _print_table(results: Dict[str, Dict], baseline: Dict[str, Dict]) -> None:
+    print(f"{'conc':>5} {'reqs':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  baseline p95")
+    for level, r in results.items():
+        base = baseline.get(level, {}).get("p95_ms", "-")
+        print(f"{level:>5} {r['requests']:>6} {r['errors']:>4} {r['rps']:>9} {r['p50_ms']:>9} "
+              f"{r['p95_ms']:>9} {r['p99_ms']:>9}  {base}")
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    p.add_argument("--levels", default="1,8,32,64", help="comma-separated concurrency levels")
+    p.add_argument("--requests", type=int, default=100, help="requests per level")
+    p.add_argument("--model-latency", type=float, default=0.05, help="seconds per fake model call")
+    p.add_argument("--model-jitter", type=float, default=0.02, help="max extra seconds per fake model call")
+    p.add_argument("--cassette", help="replay this recorded cassette instead of the scripted model")
+    p.add_argument("--replay-timing", choices=("original", "zero"), default="original")
+    p.add_argument("--backend-latency", type=float, default=0.005, help="seconds per fake backend call")
+    p.add_argument("--baseline", default=_BASELINE)
+    p.add_argument("--tolerance", type=float, default=0.25, help="allowed regression as a fraction")
+    p.add_argument("--update-baseline", action="store_true")
+    p.add_argument("--json", help="also write the results to this path")
+    args = p.parse_args(argv)
+    args.levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    config = {
+        "requests": args.requests,
+        "model_latency": args.model_latency,
+        "model_jitter": args.model_jitter,
+        "backend_latency": args.backend_latency,
+    }
+    if args.cassette:
+        config.update(cassette=os.path.basename(args.cassette), replay_timing=args.replay_timing)
+
+    server, thread, base_url = _start_backend(args.backend_latency)
+    os.environ["BACKEND_INTERNAL_URL"] = base_url
+    os.environ["INTERNAL_API_TOKEN"] = _TOKEN
+    try:
+        results = asyncio.run(_run(args))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=5)
+
+    stored: Dict = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            stored = json.load(f)
+    baseline = stored.get("levels", {}) if stored.get("config") == config else {}
+    _print_table(results, baseline)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "levels": results}, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "levels": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if stored and not baseline:
+        print("baseline was recorded with different settings; not compared")
+    problems = compare(results, baseline, args.tolerance)
+    for line in problems:
+        print(f"REGRESSION {line}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,20 @@
+import pytest
+
+from app import routes_chat as rc
+
+
+@pytest.fixture(autouse=True)
+def _reset_backend_state():
+    # The resolver and caches hold per-process state; tests patch backends per case
+    rc.resolver.reset()
+    rc._GUARDS.reset()
+    rc._HEDGE.reset()
+    rc._DISCOVERY_DEDUPE.clear()
+    rc._SESSIONS.clear()
+    rc._batch_disabled_until = 0.0
+    if rc._DB_PREVIEW_CACHE is not None:
+        rc._DB_PREVIEW_CACHE.clear()
+    yield
+    rc.resolver.reset()
+    if rc._DB_PREVIEW_CACHE is not None:
+        rc._DB_PREVIEW_CACHE.clear()
@@ -0,0 +1,191 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import routes_chat as rc
+from app.breaker import CLOSED, HALF_OPEN, OPEN, AdaptiveTimeout, BackendGuards, CircuitBreaker
+from app.main import app
+
+
+def test_breaker_opens_fails_fast_and_half_opens_one_trial():
+    b = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    b.record_failure(now=0)
+    assert b.state == CLOSED and b.allow(now=0)
+    b.record_failure(now=1)
+    assert b.state == OPEN and not b.allow(now=5) and b.retry_after(now=5) == 6
+    # After the reset window exactly one trial call goes through
+    assert b.allow(now=11) and b.state == HALF_OPEN
+    assert not b.allow(now=11)
+    b.record_failure(now=12)
+    assert b.state == OPEN and b.opened == 2
+    assert b.allow(now=22)
+    b.record_success()
+    assert b.state == CLOSED and b.failures == 0 and b.allow(now=22)
+
+
+def test_adaptive_timeout_follows_p99_within_bounds():
+    t = AdaptiveTimeout(min_samples=5, factor=3.0, floor=0.5)
+    for s in (0.1, 0.1, 0.1, 0.1):
+        t.observe(s)
+    assert t.timeout(5.0) is None  # too few samples: client default applies
+    t.observe(0.4)
+    assert t.timeout(5.0) == 0.4 * 3.0
+    assert t.timeout(1.0) == 1.0
+    for _ in range(200):
+        t.observe(0.01)
+    assert t.timeout(5.0) == 0.5
+
+
+def test_open_breaker_fails_tools_fast_with_clear_status(monkeypatch):
+    posts = []
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            posts.append((url, timeout))
+            return httpx.Response(500, request=httpx.Request('POST', url))
+
+    monkeypatch.setattr(rc, '_GUARDS', BackendGuards(failure_threshold=2, reset_seconds=30, adaptive=False))
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+    rc.resolver.reset()
+    rc._tool_ctx.set(rc.ToolContext(account_id=1, session_id='s', locale='en'))
+
+    async def run():
+        first = await rc._tool_db_preview(role='CTO')
+        await rc._tool_db_preview(role='VP')
+        third = await rc._tool_db_preview(role='CEO')
+        discover = await rc._tool_discover(role='CTO')
+        return first, third, discover
+
+    first, third, discover = asyncio.run(run())
+    assert first['code'] == 500 and first['reason'] == 'backend_error' and 'retry_after_seconds' not in first
+    assert len(posts) == 3  # two failing previews + the discover call; the third preview never left
+    assert third['reason'] == 'backend_unavailable' and third['code'] == 503 and third['retry_after_seconds'] > 0
+    assert 'Do not call this tool again' in third['message']
+    assert discover['queued'] is False and discover['reason'] == 'backend_error'  # its own path is still closed
+    snap = TestClient(app).get('/health/pool').json()['breakers']
+    assert snap['/api/v1/internal/db_preview_leads']['state'] == OPEN
+    assert snap['/api/v1/internal/db_preview_leads']['rejected'] == 1
+
+
+def test_token_rejections_do_not_trip_and_timeouts_adapt(monkeypatch):
+    seen = []
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            seen.append(timeout)
+            status = 403 if headers['X-Internal-Token'] == 'bad' else 200
+            return httpx.Response(status, json={'ok': True}, request=httpx.Request('POST', url))
+
+    guards = BackendGuards(failure_threshold=1, adaptive=True, timeout_floor=0.25)
+    monkeypatch.setattr(rc, '_GUARDS', guards)
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['bad'])
+    rc.resolver.reset()
+    assert asyncio.run(rc._post_internal('/p', {})) == (False, 403)
+    assert guards.breaker('/p').state == CLOSED
+
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['good'])
+    rc.resolver.reset()
+    for _ in range(25):
+        assert asyncio.run(rc._post_internal('/p', {}))[0]
+    assert seen[1] is None  # no estimate yet
+    last = seen[-1]
+    assert isinstance(last, httpx.Timeout) and last.read == 0.25
+
+
+def test_open_batch_breaker_keeps_batching_enabled(monkeypatch):
+    sent = []
+
+    async def fake_json(path, payload):
+        return (False, 503, {})
+
+    async def fake_post(path, payload):
+        sent.append(path)
+        return (True, 200)
+
+    guards = BackendGuards(failure_threshold=1)
+    guards.breaker(rc._BATCH_PATH).record_failure()
+    monkeypatch.setattr(rc, '_GUARDS', guards)
+    monkeypatch.setattr(rc, '_post_internal_json', fake_json)
+    monkeypatch.setattr(rc, '_post_internal', fake_post)
+    asyncio.run(rc._flush_writes([
+        ('/api/v1/internal/chat_notify', {'content': 'a'}),
+        ('/api/v1/internal/close_chat', {}),
+    ]))
+    assert sent == ['/api/v1/internal/chat_notify', '/api/v1/internal/close_chat']
+    assert rc._batch_disabled_until == 0.0
+
+
+def test_timeout_recovers_after_backend_slows_down(monkeypatch):
+    state = {'delay': 0.001}
+    seen = []
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            seen.append(timeout.read if timeout is not None else None)
+            if timeout is not None and state['delay'] > timeout.read:
+                await asyncio.sleep(timeout.read)
+                raise httpx.ReadTimeout('timed out')
+            await asyncio.sleep(state['delay'])
+            return httpx.Response(200, json={}, request=httpx.Request('POST', url))
+
+    guards = BackendGuards(failure_threshold=1, reset_seconds=0.0, adaptive=True, timeout_floor=0.02)
+    monkeypatch.setattr(rc, '_GUARDS', guards)
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+
+    async def call():
+        rc.resolver.reset()
+        return await rc._post_internal('/p', {})
+
+    for _ in range(20):
+        assert asyncio.run(call())[0]
+    assert guards.timeout('/p', 5.0) == 0.02
+    state['delay'] = 0.03
+    # Times out at the learned floor and opens the breaker...
+    assert asyncio.run(call()) == (False, 504)
+    assert guards.breaker('/p').state == OPEN
+    # ...but the half-open trial runs with the client default and succeeds
+    assert asyncio.run(call()) == (True, 200)
+    assert seen[-1] is None and guards.breaker('/p').state == CLOSED
+    # The timed-out sample lifted the bound above the new latency
+    assert guards.timeout('/p', 5.0) > 0.03
+    assert all(asyncio.run(call())[0] for _ in range(5))
+
+
+def test_failure_cause_is_stated_when_breaker_is_closed(monkeypatch):
+    monkeypatch.setattr(rc, '_GUARDS', BackendGuards(failure_threshold=100))
+    assert rc._tool_error('/p', 504)['reason'] == 'backend_timeout'
+    assert rc._tool_error('/p', 502)['reason'] == 'backend_unreachable'
+    err = rc._tool_error('/p', 429)
+    assert err['reason'] == 'backend_error' and '429' in err['message']
+    assert rc._tool_error('/p', 403) == {'status': 'error', 'code': 403}
+
+
+def test_definite_client_error_is_returned_as_is(monkeypatch):
+    calls = []
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            calls.append(url)
+            if url.startswith('http://down'):
+                raise httpx.ConnectError('refused')
+            return httpx.Response(422, json={'error': 'invalid'}, request=httpx.Request('POST', url))
+
+    monkeypatch.setattr(rc, '_GUARDS', BackendGuards(failure_threshold=1))
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a', 'http://down'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+    rc.resolver.reset()
+    for _ in range(4):
+        assert asyncio.run(rc._post_internal('/api/v1/internal/lead_packs', {})) == (False, 422)
+    # The unreachable base was never tried, nothing counted against the path
+    assert calls == ['http://a/api/v1/internal/lead_packs'] * 4
+    assert rc._GUARDS.breaker('/api/v1/internal/lead_packs').state == CLOSED
+    assert not rc.resolver.is_down('http://a')
+    assert rc._tool_error('/api/v1/internal/lead_packs', 422) == {'status': 'error', 'code': 422}
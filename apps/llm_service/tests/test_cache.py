@@ -0,0 +1,40 @@
+from app.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_expiry_and_counters():
+    clock = Clock()
+    c = TTLCache(maxsize=4, ttl=10, clock=clock)
+    c.set('a', 1)
+    assert c.get('a') == 1
+    clock.now = 11
+    assert c.get('a') is None
+    stats = c.stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['expirations'] == 1
+
+
+def test_lru_eviction_prefers_least_recently_used():
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set('a', 1)
+    c.set('b', 2)
+    c.get('a')  # a becomes most recent
+    c.set('c', 3)
+    assert 'a' in c and 'c' in c and 'b' not in c
+    assert c.stats()['evictions'] == 1
+
+
+def test_sweep_and_per_entry_ttl():
+    clock = Clock()
+    c = TTLCache(maxsize=10, ttl=100, clock=clock)
+    c.set('short', 1, ttl=1)
+    c.set('long', 2)
+    clock.now = 5
+    assert c.sweep() == 1 and len(c) == 1
+    assert c.pop('long') == 2 and len(c) == 0
@@ -0,0 +1,112 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from langchain.schema import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages import ToolMessage
+
+from app import cassette as cs, routes_chat as rc
+from app.main import app
+
+
+class LLM:
+    def __init__(self):
+        self.calls = 0
+
+    def bind_tools(self, tools, tool_choice=None):
+        return self
+
+    async def ainvoke(self, msgs):
+        self.calls += 1
+        if not any(m.type == 'tool' for m in msgs):
+            return AIMessage(content='', tool_calls=[
+                {'name': 'db_preview_leads', 'args': {'role': 'CTO'}, 'id': 'call_live'}],
+                usage_metadata={'input_tokens': 40, 'output_tokens': 6, 'total_tokens': 46})
+        return AIMessage(content='Here are your CTOs.', response_metadata={'finish_reason': 'stop'},
+                         usage_metadata={'input_tokens': 90, 'output_tokens': 8, 'total_tokens': 98})
+
+
+def backend(total):
+    class Client:
+        async def post(self, url, headers=None, json=None):
+            return httpx.Response(200, json={'total': total, 'results': []}, request=httpx.Request('POST', url))
+    return Client()
+
+
+def test_record_then_replay_a_chat_turn(monkeypatch, tmp_path):
+    path = str(tmp_path / 'cassette.jsonl.gz')
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['tok'])
+    body = {'session_id': 'c1', 'account_id': 3, 'messages': [{'role': 'user', 'content': 'what can you do?'}]}
+
+    live = LLM()
+    monkeypatch.setattr(rc, 'llm', cs.CassetteModel(live, cs.Cassette(path), 'record'))
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: backend(0))
+    recorded = TestClient(app).post('/chat/messages', json=body).json()['reply']
+    assert live.calls == 2
+
+    # Replay: no model at all, and the backend now answers differently (tool results differ)
+    replay = cs.CassetteModel(None, cs.Cassette(path), 'replay', timing='zero')
+    monkeypatch.setattr(rc, 'llm', replay)
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: backend(7))
+    rc._SESSIONS.clear()
+    rc._DB_PREVIEW_CACHE.clear()
+    assert TestClient(app).post('/chat/messages', json=body).json()['reply'] == recorded == 'Here are your CTOs.'
+    assert replay.cassette.stats()['entries'] == 2
+    assert replay.cassette.hits == 1 and replay.cassette.fuzzy_hits == 1
+    assert TestClient(app).get('/health/cache').json()['llm_cassette']['misses'] == 0
+
+
+def test_replay_timing_streaming_and_misses(monkeypatch, tmp_path):
+    path = tmp_path / 'c.jsonl'
+    msgs = [SystemMessage(content='sys'), HumanMessage(content='find CTOs')]
+    key, turn = cs.request_keys('tools:auto', msgs)
+    response = {'content': '', 'tool_calls': [{'name': 'discover_leads', 'args': {'role': 'CTO'}, 'id': 'x'}],
+                'usage': {'input_tokens': 12, 'output_tokens': 3, 'total_tokens': 15}}
+    cs.Cassette(str(path)).record(key, turn, response, 0.25)
+    assert json.loads(path.read_text())['elapsed_ms'] == 250.0
+
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+    monkeypatch.setattr(cs.asyncio, 'sleep', fake_sleep)
+
+    async def run(timing):
+        bound = cs.CassetteModel(None, cs.Cassette(str(path)), 'replay', timing).bind_tools([])
+        res = await bound.ainvoke(msgs)
+        chunks = [c async for c in bound.astream(msgs)]
+        # A later step of the turn was never recorded
+        later = msgs + [AIMessage(content='', tool_calls=[{'name': 'a', 'args': {}, 'id': '1'}]),
+                        ToolMessage(content='{}', tool_call_id='1')]
+        with pytest.raises(cs.CassetteMiss):
+            await bound.ainvoke(later)
+        with pytest.raises(cs.CassetteMiss):
+            await bound.ainvoke([HumanMessage(content='something else')])
+        return res, chunks
+
+    res, chunks = asyncio.run(run('original'))
+    assert slept == [0.25, 0.25]
+    assert res.tool_calls[0]['args'] == {'role': 'CTO'} and res.usage_metadata['input_tokens'] == 12
+    assert chunks[0].tool_calls[0]['name'] == 'discover_leads'
+
+    slept.clear()
+    asyncio.run(run('zero'))
+    assert slept == []
+
+
+def test_wrap_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv('LLM_CASSETTE_MODE', raising=False)
+    sentinel = object()
+    assert cs.wrap_from_env(sentinel) is sentinel
+    monkeypatch.setenv('LLM_CASSETTE_MODE', 'record')
+    assert cs.wrap_from_env(None) is None
+    monkeypatch.setenv('LLM_CASSETTE_MODE', 'replay')
+    monkeypatch.setenv('LLM_CASSETTE_PATH', str(tmp_path / 'x.jsonl'))
+    monkeypatch.setenv('LLM_REPLAY_TIMING', 'zero')
+    wrapped = cs.wrap_from_env(None)
+    assert wrapped.mode == 'replay' and wrapped.timing == 'zero' and len(wrapped.cassette) == 0
+    with pytest.raises(ValueError):
+        cs.CassetteModel(None, wrapped.cassette, 'record')
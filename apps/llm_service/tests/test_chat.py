@@ -1,4 +1,6 @@
 import os
+import asyncio
+import json
 os.environ.pop("OPENAI_API_KEY", None)  # ensure real model is not used in tests
 
 from fastapi.testclient import TestClient
@@ -38,14 +40,14 @@ class FakeLLM:
 
 
 def _patch_internals(monkeypatch):
-    def fake_post_json(path: str, payload: dict):
+    async def fake_post_json(path: str, payload: dict):
         if path.endswith("/db_preview_leads"):
             return True, 200, {"status": "ok", "total": 0, "results": []}
         if path.endswith("/discover_leads"):
             return True, 200, {"status": "ok", "sample": [{"first_name": "Ava", "last_name": "Lee", "email": "ava@example.com", "company": "Acme"}]}
         return True, 200, {}
 
-    def fake_post(path: str, payload: dict):
+    async def fake_post(path: str, payload: dict):
         return True, 200
 
     monkeypatch.setattr(rc, "_post_internal_json", fake_post_json)
@@ -104,7 +106,7 @@ def test_chat_ai_invoke_failure(monkeypatch):
     client = TestClient(app)
     resp = client.post("/chat/messages", json={
         "session_id": "s4", "account_id": 1, "user_id": 1,
-        "messages": [{"role": "user", "content": "hi"}]
+        "messages": [{"role": "user", "content": "what can you do?"}]
     })
     assert resp.status_code == 503
 
@@ -112,13 +114,13 @@ def test_chat_ai_invoke_failure(monkeypatch):
 def test_queue_discovery_ttl(monkeypatch):
     calls = []
 
-    def fake_post_json(path: str, payload: dict):
+    async def fake_post_json(path: str, payload: dict):
         calls.append(payload)
         return True, 200, {"status": "ok"}
 
     monkeypatch.setattr(rc, "_post_internal_json", fake_post_json)
-    ok1, dup1, _, _ = rc._queue_discovery_once(1, "s1", {"role": "cto"})
-    ok2, dup2, _, _ = rc._queue_discovery_once(1, "s1", {"role": "cto"})
+    ok1, dup1, _, _ = asyncio.run(rc._queue_discovery_once(1, "s1", {"role": "cto"}))
+    ok2, dup2, _, _ = asyncio.run(rc._queue_discovery_once(1, "s1", {"role": "cto"}))
     assert ok1 is True and dup1 is False
     assert ok2 is False and dup2 is True
 
@@ -143,8 +145,14 @@ def test_unknown_tool_call(monkeypatch):
             return type("Res", (), {"tool_calls": None, "content": "Done"})()
 
     # Stub internals to be safe
-    monkeypatch.setattr(rc, "_post_internal", lambda *a, **k: (True, 200))
-    monkeypatch.setattr(rc, "_post_internal_json", lambda *a, **k: (True, 200, {}))
+    async def fake_post(*a, **k):
+        return True, 200
+
+    async def fake_post_json(*a, **k):
+        return True, 200, {}
+
+    monkeypatch.setattr(rc, "_post_internal", fake_post)
+    monkeypatch.setattr(rc, "_post_internal_json", fake_post_json)
     monkeypatch.setattr(rc, "llm", L())
     client = TestClient(app)
     resp = client.post("/chat/messages", json={
@@ -177,26 +185,26 @@ def test_post_internal_and_json_fallback(monkeypatch):
     class C:
         def __init__(self, timeout=None):
             self.timeout = timeout
-        def __enter__(self):
+        async def __aenter__(self):
             return self
-        def __exit__(self, exc_type, exc, tb):
+        async def __aexit__(self, exc_type, exc, tb):
             return False
-        def post(self, url, headers=None, json=None):
+        async def post(self, url, headers=None, json=None):
             if url.startswith("http://a"):
                 return Resp(403)  # unauthorized on first base
             return Resp(200, {"ok": True})
 
-    monkeypatch.setattr(rc.httpx, "Client", C)
-    ok, code, data = rc._post_internal_json("/path", {"x": 1})
+    monkeypatch.setattr(rc.http_pool, "get_client", lambda: C())
+    ok, code, data = asyncio.run(rc._post_internal_json("/path", {"x": 1}))
     assert ok is True and code == 200 and data == {"ok": True}
 
-    # Now both bases 500 -> expect False with 403 (since token exists)
+    # Now both bases 500 -> expect False with the backend's status
     class C2(C):
-        def post(self, url, headers=None, json=None):
+        async def post(self, url, headers=None, json=None):
             return Resp(500)
-    monkeypatch.setattr(rc.httpx, "Client", C2)
-    ok, code, data = rc._post_internal_json("/path", {"x": 1})
-    assert ok is False and code == 403
+    monkeypatch.setattr(rc.http_pool, "get_client", lambda: C2())
+    ok, code, data = asyncio.run(rc._post_internal_json("/path", {"x": 1}))
+    assert ok is False and code == 500
 
 
 def test_llm_no_conclusion(monkeypatch):
@@ -215,3 +223,124 @@ def test_llm_no_conclusion(monkeypatch):
     # Finalize path should produce a 200 with fallback finalization
     assert resp.status_code == 200
     assert resp.json()["reply"] != ""
+
+
+def _parse_sse(text: str):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_chat_stream_tool_events_and_tokens(monkeypatch):
+    from langchain_core.messages import AIMessageChunk
+
+    class StreamLLM:
+        def __init__(self):
+            self.step = 0
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def astream(self, messages):
+            self.step += 1
+            if self.step == 1:
+                yield AIMessageChunk(content="", tool_call_chunks=[
+                    {"name": "discover_leads", "args": '{"role": "CTO"}', "id": "t1", "index": 0}
+                ])
+                return
+            for piece in ["Shared ", "a few ", "leads."]:
+                yield AIMessageChunk(content=piece)
+
+    _patch_internals(monkeypatch)
+    monkeypatch.setattr(rc, "llm", StreamLLM())
+    client = TestClient(app)
+    resp = client.post("/chat/messages/stream", json={
+        "session_id": "s7", "account_id": 1, "user_id": 1,
+        "messages": [{"role": "user", "content": "what can you do?"}]
+    })
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    names = [e for e, _ in events]
+    assert names[:2] == ["tool_start", "tool_end"]
+    assert events[1][1]["name"] == "discover_leads"
+    assert [d["text"] for e, d in events if e == "token"] == ["Shared ", "a few ", "leads."]
+    # seq counts the user turn, the posted "New leads found" bullets and the reply
+    assert events[-1] == ("done", {"reply": "Shared a few leads.", "session_id": "s7", "seq": 3})
+
+
+def test_chat_stream_non_streaming_model_and_errors(monkeypatch):
+    _patch_internals(monkeypatch)
+    monkeypatch.setattr(rc, "llm", FakeLLM())
+    client = TestClient(app)
+    resp = client.post("/chat/messages/stream", json={
+        "session_id": "s8", "account_id": 1, "user_id": 1,
+        "messages": [{"role": "user", "content": "Find CTOs in US for SaaS"}]
+    })
+    events = _parse_sse(resp.text)
+    assert ("token", {"text": "Shared results."}) in events
+    assert events[-1][0] == "done"
+
+    monkeypatch.setattr(rc, "llm", InvokeFailLLM())
+    events = _parse_sse(client.post("/chat/messages/stream", json={
+        "session_id": "s9", "account_id": 1, "messages": [{"role": "user", "content": "what can you do?"}]
+    }).text)
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 503
+
+    monkeypatch.setattr(rc, "llm", None)
+    assert client.post("/chat/messages/stream", json={"session_id": "s", "account_id": 1}).status_code == 503
+
+
+def test_chat_delta_mode_uses_server_history(monkeypatch):
+    _patch_internals(monkeypatch)
+    seen = []
+
+    class EchoLLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            seen.append([m.content for m in msgs[1:]])
+            return type("Res", (), {"tool_calls": None, "content": f"reply {len(seen)}"})()
+
+    monkeypatch.setattr(rc, "llm", EchoLLM())
+    client = TestClient(app)
+    base = {"session_id": "d1", "account_id": 1}
+    r1 = client.post("/chat/messages", json={**base, "messages": [{"role": "user", "content": "what can you do?"}]})
+    assert r1.status_code == 200 and r1.json()["seq"] == 2
+    r2 = client.post("/chat/messages", json={**base, "base_seq": 2, "messages": [{"role": "user", "content": "more"}]})
+    assert r2.json() == {"reply": "reply 2", "session_id": "d1", "seq": 4}
+    assert seen[-1] == ["what can you do?", "reply 1", "more"]
+    # Stale seq or another account: caller must re-send the full history
+    stale = client.post("/chat/messages", json={**base, "base_seq": 2, "messages": [{"role": "user", "content": "x"}]})
+    assert stale.status_code == 409 and stale.json()["detail"]["error"] == "history_required"
+    other = client.post("/chat/messages", json={**base, "account_id": 2, "base_seq": 4, "messages": []})
+    assert other.status_code == 409
+    rc._SESSIONS.clear()  # service restart
+    assert client.post("/chat/messages/stream", json={**base, "base_seq": 4, "messages": []}).status_code == 409
+
+
+def test_chat_delta_history_includes_posted_notifications(monkeypatch):
+    _patch_internals(monkeypatch)
+    seen = []
+
+    class NotifyLLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            seen.append([m.content for m in msgs[1:] if getattr(m, "type", None) in ("human", "ai")])
+            if len(seen) == 1:
+                return type("Res", (), {"tool_calls": [{"name": "chat_notify", "args": {"content": "- Ava Lee — Acme"}, "id": "n1"}], "content": ""})()
+            return type("Res", (), {"tool_calls": None, "content": f"reply {len(seen)}"})()
+
+    monkeypatch.setattr(rc, "llm", NotifyLLM())
+    client = TestClient(app)
+    base = {"session_id": "d-notify", "account_id": 1}
+    r1 = client.post("/chat/messages", json={**base, "messages": [{"role": "user", "content": "what can you do?"}]})
+    # user + the posted bullets + the reply, as in the caller's chat
+    assert r1.json()["reply"] == "reply 2" and r1.json()["seq"] == 3
+    client.post("/chat/messages", json={**base, "base_seq": 3, "messages": [{"role": "user", "content": "make a pack of those"}]})
+    assert seen[-1] == ["what can you do?", "- Ava Lee — Acme", "reply 2", "make a pack of those"]
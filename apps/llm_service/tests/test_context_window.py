@@ -0,0 +1,120 @@
+import asyncio
+
+from app import routes_chat as rc
+from app.context_window import ConversationWindow, count_tokens, extractive_summary
+from app.schemas import ChatRequest, Message
+
+
+def words(text):
+    return len(text.split())
+
+
+def history(n):
+    out = []
+    for i in range(n):
+        out.append(Message(role='user', content=f'user turn {i} ' + 'pad ' * 6))
+        out.append(Message(role='assistant', content=f'assistant turn {i} ' + 'pad ' * 6))
+    return out
+
+
+class Summarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, previous, dropped):
+        self.calls.append((previous, [m.content for m in dropped]))
+        return f'summary{len(self.calls)}'
+
+
+def test_short_history_passes_through_without_summary():
+    w = ConversationWindow(budget=500, counter=words)
+    s = Summarizer()
+    summary, recent = asyncio.run(w.apply('s1', 'sys', history(3), s))
+    assert summary is None and len(recent) == 6 and s.calls == []
+
+
+def test_long_history_collapses_and_summary_is_reused():
+    w = ConversationWindow(budget=100, min_recent=2, counter=words)
+    s = Summarizer()
+    msgs = history(10)  # ~10 tokens + overhead each, well over budget
+    summary, recent = asyncio.run(w.apply('s1', 'sys prompt', msgs, s))
+    assert summary == 'summary1' and len(s.calls) == 1
+    assert recent[0].role == 'user' and recent == msgs[-len(recent):]
+    assert sum(words(m.content) + 4 for m in recent) <= 60
+    # One more exchange stays inside the budget: no new summarization
+    msgs2 = msgs + [Message(role='user', content='next')]
+    summary2, recent2 = asyncio.run(w.apply('s1', 'sys prompt', msgs2, s))
+    assert summary2 == 'summary1' and len(s.calls) == 1 and recent2[-1].content == 'next'
+    # Keep growing until the window slides again; the previous summary is folded in
+    grown = msgs2 + history(6)
+    summary3, recent3 = asyncio.run(w.apply('s1', 'sys prompt', grown, s))
+    assert summary3 == 'summary2' and s.calls[1][0] == 'summary1'
+    assert s.calls[1][1][0] == msgs[len(msgs) - len(recent)].content  # only newly dropped turns
+
+
+def test_changed_history_invalidates_cached_summary():
+    w = ConversationWindow(budget=100, min_recent=2, counter=words)
+    s = Summarizer()
+    asyncio.run(w.apply('s1', 'sys', history(10), s))
+    edited = history(10)
+    edited[0] = Message(role='user', content='something else entirely')
+    asyncio.run(w.apply('s1', 'sys', edited, s))
+    assert len(s.calls) == 2 and s.calls[1][0] is None
+
+
+def test_budget_zero_disables_windowing_and_min_recent_is_kept():
+    s = Summarizer()
+    msgs = history(10)
+    assert asyncio.run(ConversationWindow(budget=0, counter=words).apply('s', 'sys', msgs, s)) == (None, msgs)
+    summary, recent = asyncio.run(ConversationWindow(budget=5, min_recent=3, counter=words).apply('s', 'sys', msgs, s))
+    assert len(recent) == 3 and summary == 'summary1'
+
+
+def test_count_tokens_and_extractive_summary():
+    assert count_tokens('') == 0
+    assert count_tokens('find CTOs in Berlin') > 0
+    dropped = [Message(role='user', content='find   CTOs\nin Berlin'), Message(role='assistant', content='ok')]
+    assert extractive_summary('earlier', dropped) == 'earlier\nuser: find CTOs in Berlin'
+    assert len(extractive_summary(None, dropped * 100, max_chars=50)) == 50
+
+
+def test_orchestrator_sends_summary_and_recent_turns(monkeypatch):
+    seen = []
+
+    class LLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            seen.append(msgs)
+            if msgs[0].content.startswith('Summarize'):
+                raise RuntimeError('no summarizer')  # falls back to the extractive summary
+            return type('R', (), {'content': 'done', 'tool_calls': []})()
+
+    async def post(*a, **k):
+        return True, 200
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    monkeypatch.setattr(rc, '_post_internal', post)
+    monkeypatch.setattr(rc, '_WINDOW', ConversationWindow(budget=100, min_recent=2, counter=words))
+    monkeypatch.setattr(rc, 'system_prompt', lambda locale: 'sys')
+    msgs = history(10) + [Message(role='user', content='hello there')]
+    req = ChatRequest(session_id='s', account_id=1, messages=msgs)
+    assert asyncio.run(rc._ai_orchestrate_reply(req, 'en')) == 'done'
+    sent = seen[-1]
+    assert sent[1].type == 'system' and 'user turn 0' in sent[1].content
+    assert len(sent) < len(msgs) and sent[-1].content == 'hello there'
+
+
+def test_sliding_window_reuses_and_rolls_the_summary():
+    w = ConversationWindow(budget=100, min_recent=2, counter=words)
+    s = Summarizer()
+    log = history(40)
+    for turn in range(10, 40):
+        # The caller only ever sends its last 20 messages
+        summary, recent = asyncio.run(w.apply('s1', 'sys', log[:2 * turn][-20:], s))
+        assert summary is not None and recent[-1] == log[2 * turn - 1]
+    # Only newly dropped turns are summarized, always on top of the previous summary
+    assert len(s.calls) <= 15  # every other turn, not every turn
+    assert all(prev is not None for prev, _ in s.calls[1:])
+    assert all(len(dropped) == 4 for _, dropped in s.calls[1:])
@@ -0,0 +1,130 @@
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+from langchain.schema import AIMessage
+
+from app import deadline, metrics, routes_chat as rc
+from app.main import app
+
+
+def cutoffs(stage):
+    return metrics.REGISTRY.get_sample_value('llm_deadline_cutoffs_total', {'stage': stage}) or 0
+
+
+def test_budget_from_header_or_config(monkeypatch):
+    monkeypatch.delenv('CHAT_REQUEST_TIMEOUT_SECONDS', raising=False)
+    assert deadline.budget(None) is None
+    assert deadline.budget('2000') == 1.75  # minus the transit margin
+    monkeypatch.setenv('CHAT_REQUEST_TIMEOUT_SECONDS', '10')
+    assert deadline.budget('junk') == 9.75 and deadline.budget('0') == 9.75
+    assert deadline.remaining() is None and deadline.clamp(5.0) == 5.0
+    with deadline.scope(1.0):
+        assert 0.9 < deadline.remaining() <= 1.0
+        assert deadline.clamp(5.0) <= 1.0 and deadline.clamp(None, reserve=2.0) == 0.0
+        assert not deadline.expired()
+    with deadline.scope(0.0):
+        assert deadline.expired()
+
+
+def test_agent_loop_stops_and_finalizes_within_the_deadline(monkeypatch):
+    class SlowLLM:
+        def __init__(self):
+            self.calls = 0
+            self.finalized = False
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            if 'Conclude now' in msgs[-1].content:
+                self.finalized = True
+                return AIMessage(content='Wrapped up.')
+            self.calls += 1
+            await asyncio.sleep(0.15)
+            return AIMessage(content='', tool_calls=[{'name': 'chat_notify', 'args': {'content': 'x'}, 'id': str(self.calls)}])
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            return httpx.Response(200, json={}, request=httpx.Request('POST', url))
+
+    model = SlowLLM()
+    monkeypatch.setattr(rc, 'llm', model)
+    monkeypatch.setattr(rc, '_FINALIZE_RESERVE_SECONDS', 0.2)
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+    before = cutoffs('loop') + cutoffs('model')
+
+    started = time.monotonic()
+    r = TestClient(app).post('/chat/messages', headers={'X-Request-Timeout-Ms': '700'}, json={
+        'session_id': 'd1', 'account_id': 1, 'messages': [{'role': 'user', 'content': 'what can you do?'}]})
+    elapsed = time.monotonic() - started
+    assert r.status_code == 200 and r.json()['reply'] == 'Wrapped up.'
+    assert elapsed < 0.7
+    assert 1 <= model.calls < 6 and model.finalized
+    assert cutoffs('loop') + cutoffs('model') == before + 1
+
+
+def test_backend_calls_are_capped_by_the_deadline(monkeypatch):
+    seen = []
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            seen.append((url, timeout))
+            await asyncio.sleep(timeout.read)
+            raise httpx.ReadTimeout('timed out')
+
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a', 'http://b'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+    before = cutoffs('backend')
+
+    async def run(budget):
+        with deadline.scope(budget):
+            return await rc._post_internal('/p', {})
+
+    assert asyncio.run(run(0.0)) == (False, 504) and seen == []
+    started = time.monotonic()
+    assert asyncio.run(run(0.1)) == (False, 504)
+    assert time.monotonic() - started < 0.2
+    # One capped attempt; the second base is skipped once the budget is gone
+    assert [url for url, _ in seen] == ['http://a/p'] and seen[0][1].read <= 0.1
+    assert cutoffs('backend') == before + 2
+    # Our own deadline is not evidence against the backend
+    assert rc._GUARDS.breaker('/p').failures == 0 and not rc.resolver.is_down('http://a')
+
+
+def test_turn_writes_finish_in_background_after_the_deadline(monkeypatch):
+    sent = []
+
+    async def slow_flush(pending):
+        await asyncio.sleep(0.2)
+        sent.extend(path for path, _ in pending)
+
+    class LLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            if not any(m.type == 'tool' for m in msgs):
+                return AIMessage(content='', tool_calls=[
+                    {'name': 'chat_notify', 'args': {'content': 'a'}, 'id': '1'},
+                    {'name': 'close_chat', 'args': {}, 'id': '2'}])
+            return AIMessage(content='bye')
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    monkeypatch.setattr(rc, '_flush_writes', slow_flush)
+    monkeypatch.setattr(rc, '_FINALIZE_RESERVE_SECONDS', 0.0)
+    req = rc.ChatRequest(session_id='d2', account_id=1, messages=[{'role': 'user', 'content': 'what can you do?'}])
+
+    async def run():
+        started = time.monotonic()
+        with deadline.scope(0.05):
+            reply = await rc._ai_orchestrate_reply(req, 'en')
+        waited = time.monotonic() - started
+        assert reply == 'bye' and waited < 0.15 and sent == []
+        await asyncio.gather(*rc._BACKGROUND)
+    asyncio.run(run())
+    assert sent == ['/api/v1/internal/profile_update', '/api/v1/internal/chat_notify', '/api/v1/internal/close_chat']
@@ -0,0 +1,99 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+from app import routes_chat as rc
+from app.dedupe import MemoryDedupeStore, SQLiteDedupeStore, make_dedupe_store
+
+
+def test_memory_store_claim_release_and_cap():
+    store = MemoryDedupeStore(max_keys=2, sweep_interval=0)
+    assert store.claim('a', 60) is True
+    assert store.claim('a', 60) is False
+    store.release('a')
+    assert store.claim('a', 60) is True
+    store.claim('b', 60)
+    store.claim('c', 60)
+    assert store.stats()['size'] == 2  # bounded; oldest key evicted
+    assert store.claim('x', 0) is True and store.claim('x', 60) is True  # expired immediately
+
+
+def test_sqlite_store_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / 'dedupe.sqlite3')
+    worker_a = SQLiteDedupeStore(path, sweep_interval=0)
+    worker_b = SQLiteDedupeStore(path, sweep_interval=0)
+    assert worker_a.claim('k', 60) is True
+    assert worker_b.claim('k', 60) is False
+    worker_b.release('k')
+    assert worker_a.claim('k', 60) is True
+    # expired keys can be claimed again and are swept
+    assert worker_a.claim('old', -1) is True
+    assert worker_b.claim('old', 60) is True
+    worker_a.claim('gone', -1)
+    worker_b.claim('trigger-sweep', 60)
+    assert worker_b.stats()['size'] == 3
+
+
+def test_sqlite_store_size_cap(tmp_path):
+    store = SQLiteDedupeStore(str(tmp_path / 'cap.sqlite3'), max_keys=3, sweep_interval=0)
+    for i in range(6):
+        store.claim(f'k{i}', 60 + i)
+    assert store.stats()['size'] <= 4  # cap enforced on the next sweep
+
+
+def test_make_dedupe_store_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv('DISCOVERY_DEDUPE_BACKEND', 'sqlite')
+    monkeypatch.setenv('DISCOVERY_DEDUPE_PATH', str(tmp_path / 'env.sqlite3'))
+    assert isinstance(make_dedupe_store(), SQLiteDedupeStore)
+    monkeypatch.setenv('DISCOVERY_DEDUPE_PATH', str(tmp_path / 'missing' / 'dir.sqlite3'))
+    assert isinstance(make_dedupe_store(), MemoryDedupeStore)
+    assert isinstance(make_dedupe_store('memory'), MemoryDedupeStore)
+
+
+def test_failed_discovery_releases_claim(monkeypatch):
+    results = iter([(False, 500, {}), (True, 200, {})])
+
+    async def fake_post_json(path, payload):
+        return next(results)
+
+    monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
+    ok1, dup1, _, _ = asyncio.run(rc._queue_discovery_once(1, 'dd-fail', {'role': 'cto'}))
+    ok2, dup2, _, _ = asyncio.run(rc._queue_discovery_once(1, 'dd-fail', {'role': 'cto'}))
+    assert (ok1, dup1) == (False, False)
+    assert (ok2, dup2) == (True, False)
+
+
+def test_locked_sqlite_store_fails_open_quickly(tmp_path):
+    path = str(tmp_path / 'busy.sqlite3')
+    store = SQLiteDedupeStore(path, sweep_interval=0, busy_timeout=0.05)
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute('BEGIN IMMEDIATE')  # another worker holds the write lock
+    try:
+        started = time.monotonic()
+        assert store.claim('k', 60) is True
+        store.release('k')
+        assert time.monotonic() - started < 0.5 and store.stats()['busy'] == 2
+    finally:
+        other.execute('ROLLBACK')
+    assert store.claim('k', 60) is True and store.claim('k', 60) is False
+
+
+def test_discovery_uses_sqlite_store_off_the_loop(monkeypatch, tmp_path):
+    store = SQLiteDedupeStore(str(tmp_path / 'loop.sqlite3'))
+    threads = []
+    claim = store.claim
+
+    def tracking_claim(key, ttl):
+        threads.append(threading.current_thread() is threading.main_thread())
+        return claim(key, ttl)
+
+    async def fake_post_json(path, payload):
+        return True, 200, {}
+
+    monkeypatch.setattr(store, 'claim', tracking_claim)
+    monkeypatch.setattr(rc, '_DISCOVERY_DEDUPE', store)
+    monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
+    assert asyncio.run(rc._queue_discovery_once(1, 'sq', {'role': 'cto'}))[:2] == (True, False)
+    assert asyncio.run(rc._queue_discovery_once(1, 'sq', {'role': 'cto'}))[:2] == (False, True)
+    assert threads == [False, False]
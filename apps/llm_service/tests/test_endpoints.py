@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from app import routes_chat as rc
+from app.endpoints import EndpointResolver
+
+
+class Resp:
+    def __init__(self, code):
+        self.status_code = code
+
+    def json(self):
+        return {}
+
+
+def test_plan_prefers_last_success_and_skips_down_bases():
+    r = EndpointResolver(lambda: ['http://a', 'http://b'], lambda: ['t1', 't2'], min_backoff=10)
+    assert r.plan()[0] == ('http://a', 't1')
+    r.mark_success('http://b', 't2')
+    assert r.plan()[0] == ('http://b', 't2')
+    r.mark_failure('http://a')
+    assert all(base == 'http://b' for base, _ in r.plan())
+    snap = r.snapshot()
+    assert snap['preferred_base'] == 'http://b' and snap['preferred_token_index'] == 1
+    assert snap['down']['http://a']['failures'] == 1
+
+
+def test_all_bases_down_still_returns_candidates():
+    r = EndpointResolver(lambda: ['http://a'], lambda: ['t'], min_backoff=10)
+    r.mark_failure('http://a')
+    assert r.plan() == [('http://a', 't')]
+
+
+def test_backoff_grows_and_is_capped():
+    r = EndpointResolver(lambda: ['http://a'], lambda: ['t'], min_backoff=1, max_backoff=3)
+    for _ in range(4):
+        r.mark_failure('http://a')
+    failures, retry_at = r._down['http://a']
+    assert failures == 4 and retry_at - time.monotonic() <= 3
+
+
+def test_candidates_cached_until_refresh():
+    calls = []
+
+    def bases():
+        calls.append(1)
+        return ['http://a']
+
+    r = EndpointResolver(bases, lambda: ['t'], refresh_seconds=60)
+    r.plan()
+    r.plan()
+    r.tokens()
+    assert len(calls) == 1
+
+
+def test_probe_due_marks_base_healthy(monkeypatch):
+    class C:
+        async def get(self, url, timeout=None):
+            assert url == 'http://a/up'
+            return Resp(200)
+
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    r = EndpointResolver(lambda: ['http://a'], lambda: ['t'], min_backoff=0)
+    r.mark_failure('http://a')
+    asyncio.run(r.probe_due())
+    assert not r._down
+
+
+def test_unreachable_base_costs_one_attempt_after_first_failure(monkeypatch):
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://dead', 'http://ok'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t1', 't2'])
+    attempts = []
+
+    class C:
+        async def post(self, url, headers=None, json=None):
+            attempts.append(url)
+            if url.startswith('http://dead'):
+                raise RuntimeError('connect refused')
+            return Resp(200)
+
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    assert asyncio.run(rc._post_internal('/p', {})) == (True, 200)
+    # dead base tried once (not once per token), then the working base
+    assert attempts == ['http://dead/p', 'http://ok/p']
+    attempts.clear()
+    assert asyncio.run(rc._post_internal('/p', {})) == (True, 200)
+    assert attempts == ['http://ok/p']
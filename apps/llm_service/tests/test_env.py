@@ -0,0 +1,12 @@
+from app.env import env_bool, env_float, env_int
+
+
+def test_typed_settings_fall_back_on_bad_values(monkeypatch):
+    monkeypatch.setenv('X_INT', '7')
+    monkeypatch.setenv('X_FLOAT', 'oops')
+    monkeypatch.setenv('X_BOOL', 'Yes')
+    monkeypatch.setenv('X_EMPTY', '')
+    assert env_int('X_INT', 1) == 7 and env_int('X_FLOAT', 1) == 1
+    assert env_float('X_FLOAT', 2.5) == 2.5 and env_float('X_INT', 0.0) == 7.0
+    assert env_bool('X_BOOL') is True and env_bool('X_INT') is False
+    assert env_bool('X_EMPTY', True) is True and env_int('X_MISSING', 3) == 3
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+from langchain.schema import AIMessage
+
+from app import routes_chat as rc
+from app.fast_path import PHRASES, classify
+from app.i18n import RESOURCES, t
+from app.schemas import ChatRequest, Message
+
+
+def conv(*pairs):
+    return [Message(role=r, content=c) for r, c in pairs]
+
+
+def test_every_locale_has_phrases():
+    assert set(RESOURCES) <= set(PHRASES)
+
+
+@pytest.mark.parametrize('locale', sorted(RESOURCES))
+def test_yes_no_to_db_satisfied_in_each_locale(locale):
+    yes, no = PHRASES[locale]['yes'][0], PHRASES[locale]['no'][0]
+    asked = ('assistant', t('db_preview_intro', locale) + '\n- A\n\n' + t('db_satisfied', locale))
+    assert classify(conv(('user', 'find CTOs'), asked, ('user', yes.upper() + '!'))) == 'close'
+    assert classify(conv(('user', 'find CTOs'), asked, ('user', no + ', thanks'))) == 'fetch_more'
+
+
+def test_other_turns_go_to_the_model():
+    asked = ('assistant', t('db_satisfied', 'en'))
+    assert classify(conv(('user', 'x'), asked, ('user', 'yes, but only in Europe'))) is None
+    assert classify(conv(('user', 'x'), ('assistant', 'Anything else?'), ('user', 'yes'))) is None
+    assert classify(conv(('user', 'find CTOs'), ('assistant', 'ok'), ('user', 'hello'))) is None  # not an opener
+    assert classify(conv(('user', 'Hola'))) == 'greeting'
+    assert classify(conv(('user', 'Merci, c’est tout.'))) == 'close'
+    assert classify(conv(('user', 'x'), ('assistant', t('db_empty_offer_external', 'es')), ('user', 'sí'))) == 'fetch_more'
+    assert classify(conv(('assistant', 'hi'))) is None
+    assert classify([]) is None
+
+
+class NoModel:
+    def bind_tools(self, tools, tool_choice=None):
+        raise AssertionError('model must not be used')
+
+
+def _run(monkeypatch, messages, locale='en'):
+    calls = []
+
+    async def post(path, payload):
+        calls.append((path.rsplit('/', 1)[-1], payload))
+        return True, 200
+
+    async def post_json(path, payload):
+        calls.append((path.rsplit('/', 1)[-1], payload))
+        return True, 200, {}
+
+    monkeypatch.setattr(rc, 'llm', NoModel())
+    monkeypatch.setattr(rc, '_post_internal', post)
+    monkeypatch.setattr(rc, '_post_internal_json', post_json)
+    req = ChatRequest(session_id='9', account_id=4, messages=messages)
+    return asyncio.run(rc._ai_orchestrate_reply(req, locale)), calls
+
+
+def test_close_and_fetch_more_run_tools_without_the_model(monkeypatch):
+    asked = ('assistant', t('db_satisfied', 'fr'))
+    reply, calls = _run(monkeypatch, conv(('user', 'Trouver des CTO en Inde'), asked, ('user', 'oui')), 'fr')
+    assert reply == t('closing', 'fr')
+    assert calls == [('close_chat', {'account_id': 4, 'chat_session_id': '9'})]
+
+    reply, calls = _run(monkeypatch, conv(('user', 'Find CTOs in India'), ('assistant', t('db_satisfied', 'en')), ('user', 'no')))
+    assert reply == t('fetching_more', 'en')
+    assert calls[0][0] == 'discover_leads' and calls[0][1]['filters'] == {'role': 'CTO', 'location': 'India'}
+    assert rc._FAST_PATH_HITS['close'] >= 1 and rc._FAST_PATH_HITS['fetch_more'] >= 1
+
+
+def test_fetch_more_reports_what_discovery_actually_did(monkeypatch):
+    history = conv(('user', 'Find CTOs in India'), ('assistant', t('db_satisfied', 'en')), ('user', 'no'))
+    assert _run(monkeypatch, history)[0] == t('fetching_more', 'en')
+    reply, calls = _run(monkeypatch, history)  # same search again within the dedupe window
+    assert reply == t('already_fetching', 'en') and calls == []
+
+    async def down(path, payload):
+        return False, 503, {}
+
+    rc._DISCOVERY_DEDUPE.clear()
+    monkeypatch.setattr(rc, '_post_internal_json', down)
+    monkeypatch.setattr(rc, 'llm', NoModel())
+    req = ChatRequest(session_id='9', account_id=4, messages=history)
+    # Not queued: no "fetching" claim, the model gets the turn instead
+    with pytest.raises(rc.HTTPException, match='model must not be used'):
+        asyncio.run(rc._ai_orchestrate_reply(req, 'en'))
+
+
+def test_greeting_and_untargeted_fetch(monkeypatch):
+    reply, calls = _run(monkeypatch, conv(('user', 'Bonjour')), 'fr')
+    assert reply == t('ask_start', 'fr') and calls == []
+    # "no" with no targeting anywhere in history falls through to the model
+    with pytest.raises(rc.HTTPException, match='model must not be used'):
+        _run(monkeypatch, conv(('user', 'hmm'), ('assistant', t('db_satisfied', 'en')), ('user', 'no')))
+
+
+def test_preview_turn_ends_with_the_prompt_the_fast_path_answers(monkeypatch):
+    class PreviewLLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            if not any(m.type == 'tool' for m in msgs):
+                return AIMessage(content='', tool_calls=[{'name': 'db_preview_leads', 'args': {'role': 'CTO'}, 'id': 'p1'}])
+            return AIMessage(content='Here is what I found.')
+
+    async def preview(account_id, filters, limit):
+        return True, 200, {'total': 1, 'results': [{'first_name': 'Ava', 'company': 'Acme'}]}
+
+    async def post(path, payload):
+        return True, 200
+
+    monkeypatch.setattr(rc, 'llm', PreviewLLM())
+    monkeypatch.setattr(rc, '_db_preview', preview)
+    monkeypatch.setattr(rc, '_post_internal', post)
+    history = conv(('user', 'find CTOs in India'))
+    reply = asyncio.run(rc._ai_orchestrate_reply(ChatRequest(session_id='fp', account_id=4, messages=history), 'es'))
+    assert reply == 'Here is what I found.\n\n' + t('db_satisfied', 'es')
+    assert classify(history + conv(('assistant', reply), ('user', 'sí'))) == 'close'
+    assert rc._with_prompt(reply, 'db_satisfied', 'es') == reply and rc._with_prompt('', 'db_satisfied', 'en') == t('db_satisfied', 'en')
+
+
+def test_prompt_only_when_the_preview_is_the_last_question(monkeypatch):
+    class LLM:
+        def __init__(self, calls, final):
+            self.calls, self.final = calls, final
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            done = sum(m.type == 'tool' for m in msgs)
+            if done < len(self.calls):
+                name, args = self.calls[done]
+                return AIMessage(content='', tool_calls=[{'name': name, 'args': args, 'id': f'c{done}'}])
+            return AIMessage(content=self.final)
+
+    async def preview(account_id, filters, limit):
+        return True, 200, {'total': 1, 'results': [{'first_name': 'Ava', 'company': 'Acme'}]}
+
+    async def post(path, payload):
+        return True, 200
+
+    monkeypatch.setattr(rc, '_db_preview', preview)
+    monkeypatch.setattr(rc, '_post_internal', post)
+    history = conv(('user', 'find CTOs in India'))
+
+    def turn(calls, final):
+        monkeypatch.setattr(rc, 'llm', LLM(calls, final))
+        return asyncio.run(rc._ai_orchestrate_reply(ChatRequest(session_id='pq', account_id=4, messages=history), 'en'))
+
+    # Discovery ran after the preview: its question no longer applies
+    preview_then_discover = [('db_preview_leads', {'role': 'CTO'}), ('discover_leads', {'role': 'CTO'})]
+    assert turn(preview_then_discover, 'Searching external sources too.') == 'Searching external sources too.'
+    # The reply asks its own question: a bare yes/no would be ambiguous
+    reply = turn([('db_preview_leads', {'role': 'CTO'})], 'Should I narrow it to fintech?')
+    assert reply == 'Should I narrow it to fintech?'
+    assert classify(history + conv(('assistant', reply), ('user', 'yes'))) is None
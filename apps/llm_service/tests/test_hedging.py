@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+
+from app import routes_chat as rc
+from app.breaker import AdaptiveTimeout
+from app.hedging import HedgePolicy
+
+PREVIEW = '/api/v1/internal/db_preview_leads'
+
+
+def setup(monkeypatch, delays, statuses=None, **policy):
+    calls, cancelled = [], []
+    statuses = statuses or {}
+
+    class Client:
+        async def post(self, url, headers=None, json=None, timeout=None):
+            base = url.split('/api/')[0]
+            calls.append(base)
+            try:
+                await asyncio.sleep(delays[base])
+            except asyncio.CancelledError:
+                cancelled.append(base)
+                raise
+            return httpx.Response(statuses.get(base, 200), json={'from': base}, request=httpx.Request('POST', url))
+
+    hedge = HedgePolicy(enabled=True, min_delay=0.01, default_delay=0.02, **policy)
+    monkeypatch.setattr(rc, '_HEDGE', hedge)
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: list(delays))
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
+    rc.resolver.reset()
+    return hedge, calls, cancelled
+
+
+def test_slow_primary_is_hedged_and_loser_cancelled(monkeypatch):
+    hedge, calls, cancelled = setup(monkeypatch, {'http://a': 0.5, 'http://b': 0.0})
+    ok, status, body = asyncio.run(rc._post_internal_json(PREVIEW, {}))
+    assert ok and body == {'from': 'http://b'}
+    assert calls == ['http://a', 'http://b'] and cancelled == ['http://a']
+    assert hedge.stats()['sent'] == 1 and hedge.won == 1
+    # 'a' was only slow: it stays the preferred base for other paths
+    assert rc.resolver.plan()[0] == ('http://a', 't')
+
+    # Fast answers are never hedged; non-idempotent paths never are
+    rc.resolver.reset()
+    calls.clear()
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://b', 'http://a'])
+    assert asyncio.run(rc._post_internal_json(PREVIEW, {}))[2] == {'from': 'http://b'}
+    rc.resolver.reset()
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a', 'http://b'])
+    assert asyncio.run(rc._post_internal_json('/api/v1/internal/discover_leads', {}))[2] == {'from': 'http://a'}
+    assert calls == ['http://b', 'http://a'] and hedge.sent == 1
+
+
+def test_budget_caps_extra_requests(monkeypatch):
+    hedge, calls, _ = setup(monkeypatch, {'http://a': 0.05, 'http://b': 0.0}, ratio=0.0, burst=1.0)
+
+    async def run():
+        for _ in range(3):
+            rc.resolver.reset()  # keep 'a' as primary
+            await rc._post_internal_json(PREVIEW, {})
+    asyncio.run(run())
+    assert hedge.sent == 1 and hedge.over_budget == 2
+    assert calls == ['http://a', 'http://b', 'http://a', 'http://a']
+
+
+def test_failed_hedge_round_falls_back_to_remaining_pairs(monkeypatch):
+    _, calls, _ = setup(monkeypatch, {'http://a': 0.05, 'http://b': 0.0, 'http://c': 0.0},
+                        statuses={'http://a': 500, 'http://b': 500})
+    ok, _, body = asyncio.run(rc._post_internal_json(PREVIEW, {}))
+    assert ok and body == {'from': 'http://c'}
+    assert calls == ['http://a', 'http://b', 'http://c']
+
+
+def test_delay_tracks_p95():
+    policy = HedgePolicy(enabled=True, min_delay=0.05, default_delay=0.25)
+    latency = AdaptiveTimeout(min_samples=10)
+    assert policy.delay(latency) == 0.25
+    for i in range(100):
+        latency.observe(0.01 * i)
+    assert round(policy.delay(latency), 3) == 0.95
+    assert not HedgePolicy(enabled=False).applies(PREVIEW) and policy.applies(PREVIEW)
+
+
+def test_hedge_win_after_primary_failure_moves_preference(monkeypatch):
+    # The primary fails while the hedge is still running; the hedge then wins
+    setup(monkeypatch, {'http://a': 0.05, 'http://b': 0.1}, statuses={'http://a': 500})
+    ok, _, body = asyncio.run(rc._post_internal_json(PREVIEW, {}))
+    assert ok and body == {'from': 'http://b'}
+    assert rc.resolver.plan()[0] == ('http://b', 't')
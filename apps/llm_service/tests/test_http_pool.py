@@ -0,0 +1,43 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import http_pool
+from app.main import app
+
+
+def test_lifespan_creates_and_closes_shared_client():
+    with TestClient(app) as client:
+        assert http_pool._client is not None and not http_pool._client.is_closed
+        stats = client.get('/health/pool').json()
+        assert stats['active'] is True
+        assert 'connections' in stats and 'max_connections' in stats
+    assert http_pool._client is None
+
+
+def test_pool_config_from_env(monkeypatch):
+    monkeypatch.setenv('BACKEND_POOL_MAX_CONNECTIONS', '7')
+    monkeypatch.setenv('BACKEND_POOL_MAX_KEEPALIVE', 'bad')
+    monkeypatch.setenv('BACKEND_HTTP2', 'true')
+    monkeypatch.setattr(http_pool, '_http2_available', lambda: False)
+    cfg = http_pool.config()
+    assert cfg['max_connections'] == 7
+    assert cfg['max_keepalive_connections'] == 20  # invalid value falls back to default
+    assert cfg['http2'] is False  # requested but h2 not installed
+
+
+def test_get_client_reused_within_loop_and_rebuilt_across_loops():
+    async def grab():
+        return http_pool.get_client(), http_pool.get_client()
+
+    a1, a2 = asyncio.run(grab())
+    assert a1 is a2
+    async def grab_and_settle():
+        pair = await grab()
+        await asyncio.sleep(0)  # let the retired client's aclose() run
+        return pair
+
+    b1, _ = asyncio.run(grab_and_settle())
+    assert b1 is not a1 and a1.is_closed  # the stale client is closed, not leaked
+    asyncio.run(http_pool.shutdown())
+    assert http_pool.pool_stats()['active'] is False
@@ -0,0 +1,53 @@
+import json
+
+from app import intent
+from app.intent import IntentMatcher, extract_intent
+
+
+def test_extracts_role_location_keywords_in_one_pass():
+    i = extract_intent('Find CTOs in the  United\nStates for SaaS, machine learning and AI')
+    assert i.role == 'CTO' and i.location == 'United States'
+    assert i.keywords == ('saas', 'machine learning', 'ai')
+    assert i.require_tool is True
+    assert i.filters() == {'role': 'CTO', 'location': 'United States', 'keywords': 'saas machine learning ai'}
+
+
+def test_word_boundaries_avoid_substring_misfires():
+    i = extract_intent('He said the duke of Dataland focused on automations')
+    assert i.keywords == () and i.location is None and i.require_tool is False
+    assert extract_intent('role:cto').require_tool is True
+    assert extract_intent('thanks, that is all').filters() == {}
+    assert extract_intent('') == intent.Intent()
+
+
+def test_locale_vocabulary_extends_english():
+    es = extract_intent('Busca directores de tecnología en Estados Unidos con foco en seguridad y SaaS', 'es')
+    assert es.location == 'United States' and es.keywords == ('seguridad', 'saas') and es.require_tool
+    assert extract_intent('Trouver un directeur technique au Royaume-Uni', 'fr').filters() == {
+        'role': 'CTO', 'location': 'United Kingdom'}
+    # Spanish-only phrases are not active for English
+    assert extract_intent('estados unidos', 'en').location is None
+
+
+def test_vocabulary_overrides_from_file(tmp_path, monkeypatch):
+    path = tmp_path / 'vocab.json'
+    path.write_text(json.dumps({'en': {'location': {'germany': 'Germany'}, 'keyword': ['fintech']}}))
+    monkeypatch.setenv('INTENT_VOCABULARY_FILE', str(path))
+    intent.matcher_for.cache_clear()
+    try:
+        i = extract_intent('fintech in Germany')
+        assert i.location == 'Germany' and i.keywords == ('fintech',)
+    finally:
+        monkeypatch.delenv('INTENT_VOCABULARY_FILE')
+        intent.matcher_for.cache_clear()
+    assert IntentMatcher({}).extract('anything') == intent.Intent()
+
+
+def test_us_pronoun_is_not_a_location():
+    for text in ('Tell us more', 'Let us know', 'Can you help us?'):
+        assert extract_intent(text) == intent.Intent()
+    # The abbreviation, or "us" in a targeting slot, still maps
+    assert extract_intent('CTOs in the US').filters() == {'role': 'CTO', 'location': 'United States'}
+    i = extract_intent('leads in us please')
+    assert i.location == 'United States' and i.require_tool is False
+    assert extract_intent('location: us').location == 'United States'
@@ -0,0 +1,87 @@
+import asyncio
+import types
+
+import httpx
+from fastapi.testclient import TestClient
+
+from app import metrics, routes_chat as rc
+from app.main import app
+
+
+def value(name, **labels):
+    return metrics.REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_chat_turn_records_stage_metrics(monkeypatch):
+    class LLM:
+        def __init__(self):
+            self.step = 0
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            self.step += 1
+            if self.step <= 2:
+                return types.SimpleNamespace(content='', tool_calls=[])  # no tools: assist, then two forced retries
+            if self.step == 3:
+                return types.SimpleNamespace(content='', tool_calls=[
+                    {'name': 'discover_leads', 'args': {'role': 'CTO', 'location': 'United States', 'keywords': 'saas'}, 'id': 'd1'}])
+            return types.SimpleNamespace(content='done', tool_calls=[])
+
+    async def post_json(path, payload):
+        if path.endswith('/db_preview_leads'):
+            return True, 200, {'total': 0, 'results': []}
+        return True, 200, {}
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    monkeypatch.setattr(rc, '_post_internal_json', post_json)
+    monkeypatch.setattr(rc, '_post_internal', lambda *a: asyncio.sleep(0, (True, 200)))
+    before = {
+        'req': value('llm_chat_request_seconds_count', endpoint='messages', outcome='ok'),
+        'model': value('llm_model_call_seconds_count', stage='agent'),
+        'tool': value('llm_tool_seconds_count', tool='discover_leads', status='ok'),
+        'iters': value('llm_agent_iterations_sum'),
+        'assist': value('llm_server_assist_total', outcome='none'),
+        'retry': value('llm_tool_choice_required_retries_total'),
+        'dup': value('llm_discovery_dedupe_total', result='duplicate'),
+    }
+    client = TestClient(app)
+    r = client.post('/chat/messages', json={'session_id': 'm', 'account_id': 1, 'messages': [
+        {'role': 'user', 'content': 'find CTOs in the US'}]})
+    assert r.json()['reply'] == 'done'
+    assert value('llm_chat_request_seconds_count', endpoint='messages', outcome='ok') == before['req'] + 1
+    assert value('llm_model_call_seconds_count', stage='agent') == before['model'] + 4
+    assert value('llm_tool_seconds_count', tool='discover_leads', status='ok') == before['tool'] + 1
+    assert value('llm_agent_iterations_sum') == before['iters'] + 4
+    assert value('llm_server_assist_total', outcome='none') == before['assist'] + 1
+    assert value('llm_tool_choice_required_retries_total') == before['retry'] + 2
+    # the assist already claimed the same discovery key
+    assert value('llm_discovery_dedupe_total', result='duplicate') == before['dup'] + 1
+
+    body = client.get('/metrics')
+    assert body.status_code == 200 and body.headers['content-type'].startswith('text/plain')
+    assert 'llm_chat_request_seconds_bucket' in body.text
+
+
+def test_backend_attempts_timed_by_path_and_status(monkeypatch):
+    class Client:
+        def __init__(self):
+            self.n = 0
+
+        async def post(self, url, headers=None, json=None):
+            self.n += 1
+            if self.n == 1:
+                raise httpx.ConnectError('down')
+            return httpx.Response(403 if self.n == 2 else 200, request=httpx.Request('POST', url))
+
+    client = Client()
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: client)
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a', 'http://b'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t1', 't2'])
+    rc.resolver.reset()
+    path = '/api/v1/internal/ping'
+    before = [value('llm_backend_request_seconds_count', path=path, status=s) for s in ('error', '403', '200')]
+    assert asyncio.run(rc._post_internal(path, {}))[0] is True
+    after = [value('llm_backend_request_seconds_count', path=path, status=s) for s in ('error', '403', '200')]
+    assert [a - b for a, b in zip(after, before)] == [1, 1, 1]
@@ -1,15 +1,22 @@
 import os
+import asyncio
 import importlib
 import types
 
 import pytest
 
 
+def _async_return(value):
+    async def _fn(*a, **k):
+        return value
+    return _fn
+
+
 def test_infer_filters_and_prompt(monkeypatch):
     from app import routes_chat as rc
     p = rc.system_prompt('en')
     assert 'tools' in p.lower()
-    f = rc._infer_filters('Find CTOs in US for SaaS and AI')
+    f = rc.extract_intent('Find CTOs in US for SaaS and AI').filters()
     assert f['role'] == 'CTO'
     assert f['location'] == 'United States'
     assert 'saas' in f['keywords'] and 'ai' in f['keywords']
@@ -18,7 +25,7 @@ def test_infer_filters_and_prompt(monkeypatch):
 def test_post_internal_no_tokens(monkeypatch):
     from app import routes_chat as rc
     monkeypatch.setattr(rc, '_candidate_tokens', lambda: [''])
-    ok, code = rc._post_internal('/x', {})
+    ok, code = asyncio.run(rc._post_internal('/x', {}))
     assert ok is False and code == 0
 
 
@@ -30,19 +37,19 @@ def test_post_internal_all_fail(monkeypatch):
     class C:
         def __init__(self, timeout=None):
             pass
-        def __enter__(self):
+        async def __aenter__(self):
             return self
-        def __exit__(self, *a):
+        async def __aexit__(self, *a):
             return False
         class R:
             def __init__(self):
                 self.status_code = 500
-        def post(self, *a, **k):
+        async def post(self, *a, **k):
             return self.R()
 
-    monkeypatch.setattr(rc.httpx, 'Client', C)
-    ok, code = rc._post_internal('/x', {})
-    assert ok is False and code == 403
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    ok, code = asyncio.run(rc._post_internal('/x', {}))
+    assert ok is False and code == 500
 
 
 def test_post_internal_json_jsonerror(monkeypatch):
@@ -53,19 +60,19 @@ def test_post_internal_json_jsonerror(monkeypatch):
     class C:
         def __init__(self, timeout=None):
             pass
-        def __enter__(self):
+        async def __aenter__(self):
             return self
-        def __exit__(self, *a):
+        async def __aexit__(self, *a):
             return False
         class R:
             status_code = 200
             def json(self):
                 raise ValueError('bad')
-        def post(self, *a, **k):
+        async def post(self, *a, **k):
             return self.R()
 
-    monkeypatch.setattr(rc.httpx, 'Client', C)
-    ok, code, data = rc._post_internal_json('/x', {})
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    ok, code, data = asyncio.run(rc._post_internal_json('/x', {}))
     assert ok is True and code == 200 and data == {}
 
 
@@ -128,7 +135,7 @@ def test_make_tools_and_call_tool_functions(monkeypatch):
 
     # Capture posted notifications and json posts
     posted = []
-    def fake_post_json(path, payload):
+    async def fake_post_json(path, payload):
         posted.append(('json', path, payload))
         if path.endswith('/db_preview_leads'):
             return True, 200, {'total': 2, 'results': [
@@ -138,7 +145,7 @@ def test_make_tools_and_call_tool_functions(monkeypatch):
         if path.endswith('/lead_packs'):
             return True, 200, {'lead_pack': {'id': 1, 'name': 'P1'}}
         return True, 200, {}
-    def fake_post(path, payload):
+    async def fake_post(path, payload):
         posted.append(('post', path, payload))
         return True, 200
     monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
@@ -146,27 +153,23 @@ def test_make_tools_and_call_tool_functions(monkeypatch):
 
     tools = rc._make_tools(1, 's1', 'en')
     by_name = {getattr(t, 'name'): t for t in tools}
-    # db_preview_leads (call underlying func with args_schema instance)
-    P = by_name['db_preview_leads'].args_schema
-    res = by_name['db_preview_leads'].func(P(keywords='saas', role='CTO', limit=5))
+    # db_preview_leads (invoked through the tool so args are schema-validated)
+    res = asyncio.run(by_name['db_preview_leads'].ainvoke({'keywords': 'saas', 'role': 'CTO', 'limit': 5}))
     assert res['status'] == 'ok' and res['total'] == 2
     # chat_notify
-    N = by_name['chat_notify'].args_schema
-    out = by_name['chat_notify'].func(N(content='Hi'))
+    out = asyncio.run(by_name['chat_notify'].ainvoke({'content': 'Hi'}))
     assert out['status'] == 'ok'
     # close_chat
-    out = by_name['close_chat'].invoke({})
+    out = asyncio.run(by_name['close_chat'].ainvoke({}))
     assert out['status'] == 'ok'
     # profile_update
-    PF = by_name['profile_update'].args_schema
-    out = by_name['profile_update'].func(PF(free_text='hello'))
+    out = asyncio.run(by_name['profile_update'].ainvoke({'free_text': 'hello'}))
     assert out['status'] == 'ok'
     # create_lead_pack
-    PK = by_name['create_lead_pack'].args_schema
-    out = by_name['create_lead_pack'].func(PK(lead_ids=[1,2,3], name='P1'))
+    out = asyncio.run(by_name['create_lead_pack'].ainvoke({'lead_ids': [1, 2, 3], 'name': 'P1'}))
     assert out['status'] == 'ok' and 'pack' in out
     # error path when neither lead_ids nor filters provided
-    err = by_name['create_lead_pack'].func(PK())
+    err = asyncio.run(by_name['create_lead_pack'].ainvoke({}))
     assert err['status'] == 'error' and err['code'] == 400
 
 
@@ -187,57 +190,59 @@ def test_post_internal_success_and_exception(monkeypatch):
     class C:
         def __init__(self, timeout=None):
             pass
-        def __enter__(self):
+        async def __aenter__(self):
             return self
-        def __exit__(self, *a):
+        async def __aexit__(self, *a):
             return False
         class R:
             def __init__(self, code):
                 self.status_code = code
-        def post(self, url, headers=None, json=None):
+        async def post(self, url, headers=None, json=None):
             if url.startswith('http://err403'):
                 return self.R(403)
             if url.startswith('http://ok'):
                 return self.R(200)
             raise RuntimeError('boom')
 
-    monkeypatch.setattr(rc.httpx, 'Client', C)
-    ok, code = rc._post_internal('/p', {})
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    ok, code = asyncio.run(rc._post_internal('/p', {}))
     assert ok is True and code == 200
     # exception path should be swallowed and continue
-    ok2, code2 = rc._post_internal('/p', {})
+    ok2, code2 = asyncio.run(rc._post_internal('/p', {}))
     assert ok2 is True and code2 == 200
 
 
 def test_tool_discover_direct(monkeypatch):
     from app import routes_chat as rc
     monkeypatch.setattr(rc, 'llm', object())
-    monkeypatch.setattr(rc, '_queue_discovery_once', lambda *a, **k: (True, False, 200, {'sample': [{'first_name': 'A'}]}))
+    monkeypatch.setattr(rc, '_queue_discovery_once', _async_return((True, False, 200, {'sample': [{'first_name': 'A'}]})))
     posted = []
-    monkeypatch.setattr(rc, '_post_internal', lambda *a, **k: posted.append(a) or (True, 200))
+    async def fake_post(*a, **k):
+        posted.append(a)
+        return True, 200
+    monkeypatch.setattr(rc, '_post_internal', fake_post)
     tools = rc._make_tools(1, 's', 'en')
     D = {t.name: t for t in tools}['discover_leads']
-    args = D.args_schema()
-    out = D.func(args)
+    out = asyncio.run(D.ainvoke({}))
     assert out['queued'] is True and posted
 
 
 def test_create_lead_pack_with_filters(monkeypatch):
     from app import routes_chat as rc
     monkeypatch.setattr(rc, 'llm', object())
-    monkeypatch.setattr(rc, '_post_internal_json', lambda *a, **k: (True, 200, {'lead_pack': {'id': 2}}))
+    monkeypatch.setattr(rc, '_post_internal_json', _async_return((True, 200, {'lead_pack': {'id': 2}})))
     tools = rc._make_tools(1, 's', 'en')
-    # Call func directly with a duck-typed object exposing filters.model_dump
-    func = {t.name: t for t in tools}['create_lead_pack'].func
-    class F: 
-        def model_dump(self, exclude_none=True):
-            return {'keywords': 'ai'}
-    class Inp:
-        lead_ids = None
-        filters = F()
-        name = None
-    out = func(Inp())
-    assert out['status'] == 'ok'
+    posted = []
+    async def fake_post_json(path, payload):
+        posted.append(payload)
+        return True, 200, {'lead_pack': {'id': 2}}
+    monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
+    pack = {t.name: t for t in tools}['create_lead_pack']
+    out = asyncio.run(pack.ainvoke({'filters': {'keywords': 'ai'}}))
+    assert out['status'] == 'ok' and posted[0]['filters'] == {'keywords': 'ai'}
+    # plain dict filters (direct coroutine call) are accepted too
+    out = asyncio.run(pack.coroutine(filters={'role': 'CTO', 'location': None}))
+    assert out['status'] == 'ok' and posted[1]['filters'] == {'role': 'CTO'}
 
 
 def test_finalize_success_content(monkeypatch):
@@ -264,23 +269,24 @@ def test_post_internal_json_tokens_none_and_exception(monkeypatch):
     from app import routes_chat as rc
     # no tokens
     monkeypatch.setattr(rc, '_candidate_tokens', lambda: [''])
-    ok, code, data = rc._post_internal_json('/x', {})
+    ok, code, data = asyncio.run(rc._post_internal_json('/x', {}))
     assert (ok, code, data) == (False, 0, {})
-    # exception path in httpx
+    # exception path in httpx (resolver caches candidates, so reload them)
     monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['t'])
     monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    rc.resolver.reset()
     class C:
         def __init__(self, timeout=None):
             pass
-        def __enter__(self):
+        async def __aenter__(self):
             return self
-        def __exit__(self, *a):
+        async def __aexit__(self, *a):
             return False
-        def post(self, *a, **k):
+        async def post(self, *a, **k):
             raise RuntimeError('err')
-    monkeypatch.setattr(rc.httpx, 'Client', C)
-    ok, code, data = rc._post_internal_json('/y', {})
-    assert ok is False and code == 403
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: C())
+    ok, code, data = asyncio.run(rc._post_internal_json('/y', {}))
+    assert ok is False and code == 502
 
 
 def test_make_tools_llm_none_returns_empty(monkeypatch):
@@ -292,10 +298,9 @@ def test_make_tools_llm_none_returns_empty(monkeypatch):
 def test_tool_db_preview_error(monkeypatch):
     from app import routes_chat as rc
     monkeypatch.setattr(rc, 'llm', object())
-    monkeypatch.setattr(rc, '_post_internal_json', lambda *a, **k: (False, 500, {}))
+    monkeypatch.setattr(rc, '_post_internal_json', _async_return((False, 500, {})))
     tools = rc._make_tools(1, 's', 'en')
-    P = {t.name: t for t in tools}['db_preview_leads'].args_schema
-    res = {t.name: t for t in tools}['db_preview_leads'].func(P())
+    res = asyncio.run({t.name: t for t in tools}['db_preview_leads'].ainvoke({}))
     assert res['status'] == 'error'
 
 
@@ -326,11 +331,13 @@ def test_profile_update_exception_swallowed(monkeypatch):
         def invoke(self, messages):
             return types.SimpleNamespace(tool_calls=None, content='ok')
     monkeypatch.setattr(rc, 'llm', LLM())
-    monkeypatch.setattr(rc, '_post_internal', lambda *a, **k: (_ for _ in ()).throw(RuntimeError('fail')))
+    async def failing_post(*a, **k):
+        raise RuntimeError('fail')
+    monkeypatch.setattr(rc, '_post_internal', failing_post)
     from fastapi.testclient import TestClient
     from app.main import app
     client = TestClient(app)
-    r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'hello'}]})
+    r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'what can you do?'}]})
     assert r.status_code == 200 and r.json()['reply'] == 'ok'
 
 
@@ -407,13 +414,13 @@ def test_server_assist_preview_discover_apollo(monkeypatch):
 
     # preview with results
     calls = []
-    def post_json_preview(path, payload):
+    async def post_json_preview(path, payload):
         calls.append(('json', path))
         if path.endswith('/db_preview_leads'):
             return True, 200, {'total': 1, 'results': [{'first_name': 'A', 'last_name': 'B', 'company': 'C', 'email': 'e@x'}]}
         return True, 200, {}
     monkeypatch.setattr(rc, '_post_internal_json', post_json_preview)
-    monkeypatch.setattr(rc, '_post_internal', lambda *a, **k: (True, 200))
+    monkeypatch.setattr(rc, '_post_internal', _async_return((True, 200)))
     monkeypatch.setattr(rc, 'llm', LLM())
     from fastapi.testclient import TestClient
     from app.main import app
@@ -421,8 +428,9 @@ def test_server_assist_preview_discover_apollo(monkeypatch):
     r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'find cto in us for saas'}]})
     assert r.status_code == 200 and 'preview' in r.json()['reply'].lower()
 
-    # preview empty -> discover sample
-    def post_json_discover(path, payload):
+    # preview empty -> discover sample (fresh backend state, so drop cached previews)
+    rc._DB_PREVIEW_CACHE.clear()
+    async def post_json_discover(path, payload):
         calls.append(('json', path))
         if path.endswith('/db_preview_leads'):
             return True, 200, {'total': 0, 'results': []}
@@ -430,12 +438,12 @@ def test_server_assist_preview_discover_apollo(monkeypatch):
             return True, 200, {}
         return True, 200, {}
     monkeypatch.setattr(rc, '_post_internal_json', post_json_discover)
-    monkeypatch.setattr(rc, '_queue_discovery_once', lambda a, s, f: (True, False, 200, {'sample': [{'first_name': 'X'}]}))
+    monkeypatch.setattr(rc, '_queue_discovery_once', _async_return((True, False, 200, {'sample': [{'first_name': 'X'}]})))
     r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'find cto us'}]})
     assert r.status_code == 200 and 'posted' in r.json()['reply'].lower()
 
     # preview empty -> discover empty -> apollo sample
-    def post_json_apollo(path, payload):
+    async def post_json_apollo(path, payload):
         calls.append(('json', path))
         if path.endswith('/db_preview_leads'):
             return True, 200, {'total': 0, 'results': []}
@@ -443,7 +451,7 @@ def test_server_assist_preview_discover_apollo(monkeypatch):
             return True, 200, {'sample': [{'first_name': 'Y'}]}
         return True, 200, {}
     monkeypatch.setattr(rc, '_post_internal_json', post_json_apollo)
-    monkeypatch.setattr(rc, '_queue_discovery_once', lambda a, s, f: (False, False, 500, {}))
+    monkeypatch.setattr(rc, '_queue_discovery_once', _async_return((False, False, 500, {})))
     r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'find cto in us'}]})
     assert r.status_code == 200 and 'apollo' in r.json()['reply'].lower()
 
@@ -452,22 +460,266 @@ def test_second_bind_required_branch(monkeypatch):
     import app.routes_chat as rc
     class LLM:
         def __init__(self):
-            self.calls = 0
+            self.binds = []
+            self.invokes = 0
         def bind_tools(self, tools, tool_choice=None):
-            # Count how many times required binding is attempted
-            if tool_choice == 'required':
-                self.calls += 1
+            self.binds.append(tool_choice)
             return self
         def invoke(self, messages):
-            # first iterations produce no tool_calls; finalize returns content
-            if self.calls < 2:
+            # first iterations produce no tool_calls even though tools are required
+            self.invokes += 1
+            if self.invokes < 3:
                 return types.SimpleNamespace(tool_calls=None)
             return types.SimpleNamespace(tool_calls=None, content='final')
-    monkeypatch.setattr(rc, 'llm', LLM())
-    monkeypatch.setattr(rc, '_post_internal', lambda *a, **k: (True, 200))
-    monkeypatch.setattr(rc, '_post_internal_json', lambda *a, **k: (True, 200, {}))
+    fake = LLM()
+    monkeypatch.setattr(rc, 'llm', fake)
+    monkeypatch.setattr(rc, '_post_internal', _async_return((True, 200)))
+    monkeypatch.setattr(rc, '_post_internal_json', _async_return((True, 200, {})))
     from fastapi.testclient import TestClient
     from app.main import app
     client = TestClient(app)
     r = client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'find cto us saas'}]})
     assert r.status_code == 200 and r.json()['reply'] == 'final'
+    # the required-mode runnable is bound once and reused for the retries and later requests
+    fake.invokes = 0
+    client.post('/chat/messages', json={'session_id': 's', 'account_id': 1, 'user_id': 1, 'messages': [{'role': 'user', 'content': 'find cto us saas'}]})
+    assert fake.binds == ['required']
+
+
+def test_tool_calls_run_concurrently_in_order_with_timeout(monkeypatch):
+    import time
+    import app.routes_chat as rc
+
+    events = []
+
+    class SlowTool:
+        def __init__(self, name, delay):
+            self.name = name
+            self.delay = delay
+        async def ainvoke(self, args):
+            events.append(('start', self.name))
+            await asyncio.sleep(self.delay)
+            events.append(('end', self.name))
+            return {'tool': self.name}
+
+    tools = [SlowTool('db_preview_leads', 0.2), SlowTool('profile_update', 0.2),
+             SlowTool('close_chat', 0.0), SlowTool('discover_leads', 5)]
+    calls = [
+        {'name': 'close_chat', 'args': {}, 'id': 'c'},
+        {'name': 'db_preview_leads', 'args': {}, 'id': 'a'},
+        {'name': 'profile_update', 'args': {}, 'id': 'b'},
+        {'name': 'discover_leads', 'args': {}, 'id': 'd'},
+    ]
+    monkeypatch.setattr(rc, '_TOOL_TIMEOUT_SECONDS', 0.5)
+    started = time.monotonic()
+    out = asyncio.run(rc._execute_tool_calls(tools, calls))
+    elapsed = time.monotonic() - started
+    # preview + profile overlap; the slow discover call is cut at the timeout
+    assert elapsed < 1.0
+    assert [cid for cid, _ in out] == ['c', 'a', 'b', 'd']
+    assert '"timeout"' in out[3][1]
+    # close_chat waits for the rest of the turn
+    assert events[-2:] == [('start', 'close_chat'), ('end', 'close_chat')]
+
+
+def test_tool_registry_built_once_and_context_bound_per_request(monkeypatch):
+    import app.routes_chat as rc
+    monkeypatch.setattr(rc, 'llm', object())
+    seen = []
+    async def fake_post(path, payload):
+        seen.append(payload['chat_session_id'])
+        return True, 200
+    monkeypatch.setattr(rc, '_post_internal', fake_post)
+
+    async def turn(session_id):
+        tools = rc._make_tools(1, session_id, 'en')
+        notify = {t.name: t for t in tools}['chat_notify']
+        await asyncio.sleep(0)
+        await notify.ainvoke({'content': 'hi'})
+        return tools
+
+    async def two_requests():
+        # Each request runs in its own task, like Starlette does
+        return await asyncio.gather(asyncio.create_task(turn('a')), asyncio.create_task(turn('b')))
+
+    t1, t2 = asyncio.run(two_requests())
+    assert t1 is t2 and [x.args_schema for x in t1] == [x.args_schema for x in t2]
+    assert sorted(seen) == ['a', 'b']
+
+
+def test_llm_response_cache_hits_only_tool_free_turns(monkeypatch):
+    import app.routes_chat as rc
+    from app.cache import TTLCache
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    class LLM:
+        model_name = 'fake-model'
+        def __init__(self):
+            self.invokes = 0
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+        def invoke(self, messages):
+            self.invokes += 1
+            if any(getattr(m, 'type', '') == 'tool' for m in messages):
+                return types.SimpleNamespace(tool_calls=None, content='after tools')
+            if 'tools please' in messages[-1].content:
+                return types.SimpleNamespace(tool_calls=[{'name': 'nonexistent', 'args': {}, 'id': 'x'}])
+            return types.SimpleNamespace(tool_calls=None, content='hello back')
+
+    fake = LLM()
+    monkeypatch.setattr(rc, 'llm', fake)
+    monkeypatch.setattr(rc, '_LLM_CACHE', TTLCache(maxsize=8, ttl=60))
+    monkeypatch.setattr(rc, '_post_internal', _async_return((True, 200)))
+    client = TestClient(app)
+    body = {'session_id': 's', 'account_id': 1, 'messages': [{'role': 'user', 'content': 'tell me  more'}]}
+    assert client.post('/chat/messages', json=body).json()['reply'] == 'hello back'
+    # whitespace-normalized repeat is served from cache
+    body['messages'][0]['content'] = 'tell me more '
+    assert client.post('/chat/messages', json=body).json()['reply'] == 'hello back'
+    assert fake.invokes == 1
+    # the post-tool turn is never cached: second request re-invokes it
+    body['messages'][0]['content'] = 'tools please'
+    client.post('/chat/messages', json=body)
+    client.post('/chat/messages', json=body)
+    assert fake.invokes == 1 + 2 + 1
+    stats = client.get('/health/cache').json()['llm']
+    assert stats['hits'] == 2 and stats['misses'] == 2
+
+
+def test_db_preview_cache_hits_and_invalidates_on_discovery(monkeypatch):
+    import app.routes_chat as rc
+    calls = []
+    async def fake_post_json(path, payload):
+        calls.append(path)
+        if path.endswith('/db_preview_leads'):
+            return True, 200, {'total': 1, 'results': [{'first_name': 'A'}]}
+        return True, 200, {}
+    monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
+
+    async def scenario():
+        await rc._db_preview(1, {'role': 'CTO', 'keywords': 'SaaS'}, 5)
+        # same filters modulo case/whitespace/order and limit-in-filters -> cached
+        await rc._db_preview(1, {'keywords': ' saas ', 'role': 'cto', 'limit': 5}, 5)
+        # different account or limit -> separate entries
+        await rc._db_preview(2, {'role': 'CTO', 'keywords': 'SaaS'}, 5)
+        await rc._db_preview(1, {'role': 'CTO', 'keywords': 'SaaS'}, 10)
+        assert len(calls) == 3
+        # a successful discovery for account 1 invalidates only account 1
+        await rc._queue_discovery_once(1, 'inv', {'role': 'x'})
+        await rc._db_preview(1, {'role': 'CTO', 'keywords': 'SaaS'}, 5)
+        await rc._db_preview(2, {'role': 'CTO', 'keywords': 'SaaS'}, 5)
+
+    asyncio.run(scenario())
+    assert calls.count('/api/v1/internal/db_preview_leads') == 4
+
+
+def test_prompt_prefix_is_byte_identical_across_requests(monkeypatch):
+    import json
+    from langchain_openai import ChatOpenAI
+    from app import routes_chat as rc
+
+    assert rc.system_prompt('en') is rc.system_prompt('en')
+    assert rc.system_prompt('es') != rc.system_prompt('en')
+    monkeypatch.setattr(rc, 'llm', ChatOpenAI(model='gpt-4o-mini', api_key='sk-test'))
+    first = json.dumps(rc._bound_model('auto').kwargs['tools'], sort_keys=False)
+    rc._BOUND_MODELS.clear()
+    second = json.dumps(rc._bound_model('auto').kwargs['tools'], sort_keys=False)
+    assert first == second
+    names = [t['function']['name'] for t in rc._bound_model('required').kwargs['tools']]
+    assert names == [t.name for t in rc._tool_registry()]
+
+
+def test_cached_prompt_tokens_are_counted(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app import routes_chat as rc
+    for k in rc._PROMPT_USAGE:
+        monkeypatch.setitem(rc._PROMPT_USAGE, k, 0)
+
+    class M:
+        async def ainvoke(self, msgs):
+            return type('R', (), {'content': 'x', 'tool_calls': [], 'usage_metadata': {
+                'input_tokens': 1200, 'output_tokens': 30, 'input_token_details': {'cache_read': 1024}}})()
+
+    asyncio.run(rc._call_model(M(), 'auto', [], 'en'))
+    rc._record_usage(object())  # no usage reported: ignored
+    stats = rc.prompt_usage_stats()
+    assert stats['calls'] == 1 and stats['cached_input_tokens'] == 1024
+    assert stats['cached_ratio'] == round(1024 / 1200, 4)
+    assert TestClient(app).get('/health/cache').json()['prompt_cache']['output_tokens'] == 30
+
+
+def test_turn_writes_flush_as_one_batch_or_fall_back(monkeypatch):
+    from app import routes_chat as rc
+    from app.schemas import ChatRequest, Message
+
+    calls = []
+    batch = {'status': 200}
+
+    async def post(path, payload):
+        calls.append(('single', path.rsplit('/', 1)[-1]))
+        return True, 200
+
+    async def post_json(path, payload):
+        calls.append(('batch', [op['op'] for op in payload['operations']]))
+        return batch['status'] == 200, batch['status'], {}
+
+    class LLM:
+        def __init__(self):
+            self.step = 0
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            self.step += 1
+            if self.step == 1:
+                return types.SimpleNamespace(content='', tool_calls=[
+                    {'name': 'chat_notify', 'args': {'content': 'one'}, 'id': 'a'},
+                    {'name': 'close_chat', 'args': {}, 'id': 'b'},
+                ])
+            return types.SimpleNamespace(content='bye', tool_calls=[])
+
+    monkeypatch.setattr(rc, '_post_internal', post)
+    monkeypatch.setattr(rc, '_post_internal_json', post_json)
+    req = ChatRequest(session_id='s', account_id=1, messages=[Message(role='user', content='thanks')])
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    assert asyncio.run(rc._ai_orchestrate_reply(req, 'en')) == 'bye'
+    assert calls == [('batch', ['profile_update', 'chat_notify', 'close_chat'])]
+
+    # Overloaded batch endpoint: individual calls this time, batching stays on
+    calls.clear()
+    batch['status'] = 503
+    monkeypatch.setattr(rc, 'llm', LLM())
+    asyncio.run(rc._ai_orchestrate_reply(req, 'en'))
+    assert calls[0][0] == 'batch' and [c[1] for c in calls[1:]] == ['profile_update', 'chat_notify', 'close_chat']
+    assert rc._batch_disabled_until == 0.0
+
+    # Backend without the batch endpoint: individual calls, then skip batching for a while
+    calls.clear()
+    batch['status'] = 404
+    monkeypatch.setattr(rc, 'llm', LLM())
+    asyncio.run(rc._ai_orchestrate_reply(req, 'en'))
+    assert calls[0][0] == 'batch' and [c[1] for c in calls[1:]] == ['profile_update', 'chat_notify', 'close_chat']
+    calls.clear()
+    monkeypatch.setattr(rc, 'llm', LLM())
+    asyncio.run(rc._ai_orchestrate_reply(req, 'en'))
+    assert all(kind == 'single' for kind, _ in calls)
+
+    # Per-op results: only the operations the backend applied count as delivered
+    rc._batch_disabled_until = 0.0
+
+    async def partial(path, payload):
+        return True, 200, {'status': 'ok', 'results': [
+            {'op': 'chat_notify', 'status': 'error', 'error': 'record_not_found'}, {'op': 'close_chat', 'status': 'ok'}]}
+
+    monkeypatch.setattr(rc, '_post_internal_json', partial)
+    ops = [('/api/v1/internal/chat_notify', {'content': 'x'}), ('/api/v1/internal/close_chat', {})]
+    assert asyncio.run(rc._flush_writes(list(ops))) == ops[1:]
+
+    # Outside a turn writes go straight through
+    calls.clear()
+    assert asyncio.run(rc._post_write('/api/v1/internal/chat_notify', {})) == (True, 200)
+    assert calls == [('single', 'chat_notify')]
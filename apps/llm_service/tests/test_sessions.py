@@ -0,0 +1,47 @@
+from app.schemas import Message
+from app.sessions import SessionStore
+
+
+def msg(role, content):
+    return Message(role=role, content=content)
+
+
+def test_full_request_seeds_and_delta_appends():
+    s = SessionStore()
+    history, seq = s.resolve('a', 1, [msg('user', 'hi')], None)
+    assert [m.content for m in history] == ['hi'] and seq == 1
+    assert s.record_reply('a', 1, 'hello') == 2
+    history, seq = s.resolve('a', 1, [msg('user', 'next')], 2)
+    assert [m.content for m in history] == ['hi', 'hello', 'next'] and seq == 3
+    assert s.resolve('a', 1, [msg('user', 'again')], 2) is None  # stale seq
+    # A full re-send keeps seq monotonic so old deltas cannot match by accident
+    assert s.resolve('a', 1, [msg('user', 'hi')], None)[1] == 4
+
+
+def test_account_mismatch_and_unknown_session():
+    s = SessionStore()
+    s.resolve('a', 1, [msg('user', 'hi')], None)
+    assert s.resolve('a', 2, [], 1) is None
+    assert s.record_reply('a', 2, 'x') is None
+    assert s.resolve('missing', 1, [], 0) is None
+    assert s.record_reply('missing', 1, 'x') is None
+
+
+def test_history_and_session_count_are_bounded():
+    s = SessionStore(max_sessions=2, max_messages=8)
+    s.resolve('a', 1, [msg('user', str(i)) for i in range(9)], None)
+    history, seq = s.resolve('a', 1, [msg('user', 'x')], 9)
+    assert len(history) == 7 and seq == 10 and history[-1].content == 'x'
+    s.resolve('b', 1, [], None)
+    s.resolve('c', 1, [], None)
+    stats = s.stats()
+    assert stats['size'] == 2 and stats['evictions'] == 1 and stats['max_messages'] == 8
+
+
+def test_append_and_forget():
+    s = SessionStore()
+    s.resolve('a', 1, [msg('user', 'hi')], None)
+    assert s.append('a', 1, [msg('assistant', 'n1'), msg('assistant', 'n2')]) == 3
+    assert [m.content for m in s.resolve('a', 1, [], 3)[0]] == ['hi', 'n1', 'n2']
+    s.forget('a')
+    assert s.resolve('a', 1, [], 3) is None
@@ -0,0 +1,71 @@
+import asyncio
+
+from app import routes_chat as rc
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    sf = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'v'
+
+    async def scenario():
+        results = await asyncio.gather(*(sf.do('k', work) for _ in range(5)))
+        # once settled, the next call runs again
+        again = await sf.do('k', work)
+        return results, again
+
+    results, again = asyncio.run(scenario())
+    assert results == ['v'] * 5 and again == 'v'
+    assert len(calls) == 2
+    assert sf.stats() == {'in_flight': 0, 'coalesced': 4}
+
+
+def test_errors_propagate_to_all_callers_and_cancelled_caller_does_not_cancel_call():
+    sf = SingleFlight()
+
+    async def boom():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('x')
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'ok'
+
+    async def scenario():
+        errs = await asyncio.gather(sf.do('e', boom), sf.do('e', boom), return_exceptions=True)
+        assert all(isinstance(e, RuntimeError) for e in errs)
+        leader = asyncio.ensure_future(sf.do('s', slow))
+        follower = asyncio.ensure_future(sf.do('s', slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == 'ok'
+
+
+def test_double_submit_discovery_hits_backend_once(monkeypatch):
+    calls = []
+
+    async def fake_post_json(path, payload):
+        calls.append(path)
+        await asyncio.sleep(0.02)
+        return True, 200, {'sample': [{'first_name': 'A'}]}
+
+    monkeypatch.setattr(rc, '_post_internal_json', fake_post_json)
+
+    async def scenario():
+        return await asyncio.gather(
+            rc._queue_discovery_once(1, 'sf-race', {'role': 'cto'}),
+            rc._queue_discovery_once(1, 'sf-race', {'role': 'CTO'}),
+        )
+
+    first, second = asyncio.run(scenario())
+    assert calls == ['/api/v1/internal/discover_leads']
+    assert first[0] is True and first[1] is False and first[3]['sample']
+    # the coalesced caller is reported as a duplicate without re-sharing the sample
+    assert second == (False, True, 200, {})
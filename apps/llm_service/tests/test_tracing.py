@@ -0,0 +1,96 @@
+import json
+import types
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app import routes_chat as rc, tracing
+from app.main import app
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / 'traces.jsonl'
+    tracing.configure(str(path), sample_rate=1.0)
+    yield path
+    tracing.configure('', sample_rate=1.0)
+
+
+def read(path):
+    tracing.flush()
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_request_is_traced_as_a_span_tree(monkeypatch, trace_file):
+    class LLM:
+        def __init__(self):
+            self.step = 0
+
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            self.step += 1
+            if self.step == 1:
+                return types.SimpleNamespace(content='', tool_calls=[
+                    {'name': 'db_preview_leads', 'args': {'role': 'CTO'}, 'id': 'p1'}],
+                    usage_metadata={'input_tokens': 50, 'output_tokens': 5})
+            return types.SimpleNamespace(content='done', tool_calls=[])
+
+    class Client:
+        async def post(self, url, headers=None, json=None):
+            status = 403 if headers['X-Internal-Token'] == 'bad' else 200
+            return httpx.Response(status, json={'total': 0, 'results': []}, request=httpx.Request('POST', url))
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    monkeypatch.setattr(rc.http_pool, 'get_client', lambda: Client())
+    monkeypatch.setattr(rc, '_backend_bases', lambda: ['http://a'])
+    monkeypatch.setattr(rc, '_candidate_tokens', lambda: ['bad', 'good'])
+    rc.resolver.reset()
+    r = TestClient(app).post('/chat/messages', json={'session_id': 't', 'account_id': 5, 'messages': [
+        {'role': 'user', 'content': 'what can you do?'}]})
+    assert r.status_code == 200
+
+    spans = read(trace_file)
+    by_id = {s['span_id']: s for s in spans}
+    root = next(s for s in spans if s['parent_span_id'] is None)
+    assert root['name'] == 'chat.request' and r.headers['X-Trace-Id'] == root['trace_id']
+    assert root['attributes']['account_id'] == 5 and root['attributes']['message_count'] == 1
+    assert {s['trace_id'] for s in spans} == {root['trace_id']}
+
+    calls = [s for s in spans if s['name'] == 'llm.call']
+    assert [c['attributes']['iteration'] for c in calls] == [1, 2]
+    assert calls[0]['attributes']['input_tokens'] == 50 and calls[0]['attributes']['tool_calls'] == 1
+    tool = next(s for s in spans if s['name'] == 'tool')
+    assert tool['parent_span_id'] == root['span_id'] and tool['attributes']['tool'] == 'db_preview_leads'
+    attempts = [s for s in spans if s['name'] == 'backend.attempt' and by_id[s['parent_span_id']]['name'] == 'tool']
+    assert [(a['attributes']['token_index'], a['attributes']['status']) for a in attempts] == [(0, 403), (1, 200)]
+
+
+def test_errors_mark_spans_and_sampling_or_disabled_is_noop(tmp_path, trace_file):
+    with pytest.raises(ValueError):
+        with tracing.span('root', root=True):
+            with tracing.span('child'):
+                raise ValueError('boom')
+    spans = read(trace_file)
+    assert [s['name'] for s in spans] == ['child', 'root']
+    assert all(s['status'] == 'error' for s in spans) and 'boom' in spans[0]['attributes']['error']
+
+    tracing.configure(str(trace_file), sample_rate=0.0)
+    with tracing.span('root', root=True) as sp:
+        with tracing.span('child') as child:
+            assert sp is tracing.NOOP_SPAN and child is tracing.NOOP_SPAN
+    with tracing.span('orphan') as sp:  # no root: background work is not traced
+        assert sp is tracing.NOOP_SPAN
+    assert len(read(trace_file)) == 2
+
+
+def test_export_is_queued_and_unwritable_path_is_ignored(tmp_path):
+    tracing.configure(str(tmp_path / 'missing' / 'traces.jsonl'), sample_rate=1.0)
+    try:
+        with tracing.span('root', root=True):
+            pass
+        tracing.flush()  # the writer thread swallowed the OSError and kept going
+    finally:
+        tracing.configure('', sample_rate=1.0)
@@ -0,0 +1,103 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app import routes_chat as rc
+from app.main import app
+from app.write_behind import WriteBehind
+
+
+def test_submit_requires_running_worker():
+    async def send(batch):
+        pass
+
+    wb = WriteBehind(send)
+    assert wb.submit(1, '/p', {}) is False
+    assert wb.stats()['pending'] == 0
+
+
+def test_latest_per_key_bounded_and_drained_on_stop():
+    sent = []
+
+    async def send(batch):
+        sent.append(batch)
+
+    async def scenario():
+        wb = WriteBehind(send, max_pending=2, flush_interval=60)
+        wb.start()
+        assert wb.submit(1, '/p', {'v': 'a'})
+        wb.submit(1, '/p', {'v': 'b'})  # replaces a
+        wb.submit(2, '/p', {'v': 'c'})
+        wb.submit(3, '/p', {'v': 'd'})  # full: drops the oldest (account 1)
+        wb.discard(2)
+        await wb.stop()
+        return wb.stats()
+
+    stats = asyncio.run(scenario())
+    assert sent == [[('/p', {'v': 'd'})]]
+    assert stats['coalesced'] == 1 and stats['dropped'] == 1 and stats['flushed'] == 1
+    assert stats['running'] is False and stats['pending'] == 0
+
+
+def test_background_flush_and_send_errors_counted():
+    calls = []
+
+    async def send(batch):
+        calls.append(batch)
+        raise RuntimeError('backend down')
+
+    async def scenario():
+        wb = WriteBehind(send, flush_interval=0.01)
+        wb.start()
+        wb.submit(1, '/p', {})
+        await asyncio.sleep(0.05)
+        await wb.stop()
+        return wb.stats()
+
+    stats = asyncio.run(scenario())
+    assert len(calls) == 1 and stats['errors'] == 1 and stats['flushed'] == 0
+
+
+def test_lifespan_runs_profile_writes_off_the_reply_path(monkeypatch):
+    posted = []
+
+    async def flush(batch):
+        posted.extend(batch)
+
+    monkeypatch.setattr(rc, '_PROFILE_WRITES', WriteBehind(flush, flush_interval=60))
+
+    class LLM:
+        def bind_tools(self, tools, tool_choice=None):
+            return self
+
+        async def ainvoke(self, msgs):
+            return type('R', (), {'content': 'hi', 'tool_calls': []})()
+
+    monkeypatch.setattr(rc, 'llm', LLM())
+    with TestClient(app) as client:
+        r = client.post('/chat/messages', json={'session_id': 'w', 'account_id': 3, 'messages': [{'role': 'user', 'content': 'what can you do?'}]})
+        assert r.status_code == 200
+        assert posted == []  # queued, not sent inline
+        assert client.get('/health/cache').json()['profile_writes']['pending'] == 1
+    assert posted == [('/api/v1/internal/profile_update', {'account_id': 3, 'profile': {'questionnaire': {'free_text': 'what can you do?'}}})]
+
+
+def test_stop_waits_for_an_in_flight_flush():
+    sent = []
+
+    async def slow_send(batch):
+        await asyncio.sleep(0.05)
+        sent.extend(batch)
+
+    async def scenario():
+        wb = WriteBehind(slow_send, flush_interval=0.01)
+        wb.start()
+        wb.submit(1, '/p', {'v': 'a'})
+        await asyncio.sleep(0.02)  # the worker is now inside send
+        wb.submit(2, '/p', {'v': 'b'})
+        await wb.stop()
+        return wb.stats()
+
+    stats = asyncio.run(scenario())
+    assert sent == [('/p', {'v': 'a'}), ('/p', {'v': 'b'})]
+    assert stats['flushed'] == 2 and stats['errors'] == 0